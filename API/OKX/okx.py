@@ -5,11 +5,37 @@ import hashlib
 import base64
 import json
 import random
+import time
+from collections import Counter
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timezone
 from urllib.parse import urlencode
 from b_context import BotContext
 from c_log import ErrorHandler
+from a_config import (
+    REQUEST_DEFAULT_BUDGET, REQUEST_ATTEMPT_TIMEOUT, REQUEST_BACKOFF_BASE, REQUEST_BACKOFF_CAP,
+    BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT, WS_REQUEST_TIMEOUT,
+    PNL_LOOKUP_ATTEMPTS, PNL_LEDGER_BACKFILL
+)
+from c_limits import CircuitBreaker, backoff_delay
+from API.OKX.okx_limits import OkxRateLimiter
+from API.OKX.okx_ws import OkxPrivateWs
+from API.OKX.okx_leverage import LeverageCache
+from API.OKX.okx_ledger import PositionsLedger
+
+# Коды OKX "сервис недоступен / перегружен" — считаются отказом для предохранителя
+OKX_DEGRADED_CODES = {"50001", "50004", "50013", "50026"}
+# sCode "Duplicated clOrdId": ордер с таким clOrdId уже принят
+OKX_DUPLICATE_CL_ORD_ID = "51016"
+
+
+def client_order_id(*parts: Any) -> str:
+    """
+    Детерминированный clOrdId из ключа сигнала (msg_key, символ, сторона...).
+    OKX: до 32 латинских букв/цифр — 'b' + 31 hex-символ sha1.
+    """
+    raw = "|".join(str(p) for p in parts)
+    return "b" + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:31]
 
 
 class OkxFuturesClient:
@@ -27,17 +53,25 @@ class OkxFuturesClient:
         info_handler: ErrorHandler,
         base_url: str = "https://www.okx.com",
         recv_window: int = 5000,
+        rate_limiter: Optional[OkxRateLimiter] = None,
     ):
         self.api_key = api_key
         self.api_secret = api_secret
         self.api_passphrase = api_passphrase
         self.base_url = base_url.rstrip("/")
         self.recv_window = recv_window
+        # ключ аккаунта для лимитера (не светим api_key в логах/статистике)
+        self.account_tag = hashlib.sha1(str(api_key).encode("utf-8")).hexdigest()[:8]
+        self.rate_limiter = rate_limiter or OkxRateLimiter()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.metrics: Counter = Counter()
+        self.ws_trade: Optional[OkxPrivateWs] = None  # залогиненный приватный WS для торговых op-ов
+        self.leverage = LeverageCache()
+        self.ledger = PositionsLedger()
    
         info_handler.wrap_foreign_methods(self)
         self.info_handler = info_handler
-        self.stop_bot = context.stop_bot
-        self.stop_bot_iteration = context.stop_bot_iteration
+        self.context = context
 
     # # --- helpers ---
     def _utc_iso(self) -> str:
@@ -61,8 +95,18 @@ class OkxFuturesClient:
         params: Optional[Dict[str, Any]] = None,
         data: Optional[Dict[str, Any]] = None,
         private: bool = False,
-        spec_marker: str = None
+        spec_marker: str = None,
+        priority: Optional[int] = None,
+        deadline: Optional[float] = None,
+        budget: Optional[float] = None
     ) -> Dict[str, Any]:
+        """
+        priority — приоритет в очереди лимитера (см. c_limits), по умолчанию из таблицы endpoint-ов.
+        Ответы "rate limit" (429 / 50011 и т.п.) замедляют bucket и запрос уходит повторно.
+        deadline — unix-время (сек), после которого запрос не имеет смысла; budget — то же в секундах от текущего момента.
+        Без них действует REQUEST_DEFAULT_BUDGET. Ретраи — экспоненциальный backoff с джиттером в пределах
+        оставшегося бюджета. По исчерпании бюджета или при открытом предохранителе endpoint-а возвращает None.
+        """
 
         method_up = method.upper()
         query = ""
@@ -71,72 +115,193 @@ class OkxFuturesClient:
         request_path = path + query
         body_str = "" if method_up == "GET" else json.dumps(data or {}, separators=(",", ":"), ensure_ascii=False)
         url = self.base_url + request_path
-
-        headers = {"Content-Type": "application/json"}
-        if private:
-            ts = self._utc_iso()
-            signature = self._sign(ts, method_up, request_path, body_str)
-            headers.update({
-                "OK-ACCESS-KEY": self.api_key,
-                "OK-ACCESS-SIGN": signature,
-                "OK-ACCESS-TIMESTAMP": ts,
-                "OK-ACCESS-PASSPHRASE": self.api_passphrase,
-            })
-
-        async def send_request(sess: aiohttp.ClientSession):
+        limiter_account = self.account_tag if private else None
+
+        def build_headers() -> Dict[str, str]:
+            headers = {"Content-Type": "application/json"}
+            if private:
+                ts = self._utc_iso()
+                signature = self._sign(ts, method_up, request_path, body_str)
+                headers.update({
+                    "OK-ACCESS-KEY": self.api_key,
+                    "OK-ACCESS-SIGN": signature,
+                    "OK-ACCESS-TIMESTAMP": ts,
+                    "OK-ACCESS-PASSPHRASE": self.api_passphrase,
+                })
+            return headers
+
+        async def send_request(sess: aiohttp.ClientSession, timeout: aiohttp.ClientTimeout):
+            # подписываем непосредственно перед отправкой: ожидание в лимитере не должно протухать timestamp
+            headers = build_headers()
             if method_up == "GET":
-                return await sess.get(url, headers=headers)
+                return await sess.get(url, headers=headers, timeout=timeout)
             elif method_up == "POST":
-                return await sess.post(url, headers=headers, data=body_str.encode("utf-8"))
+                return await sess.post(url, headers=headers, data=body_str.encode("utf-8"), timeout=timeout)
             else:
                 self.info_handler.debug_error_notes(f"Unsupported HTTP method: {method}", is_print=True)
                 return {}
             
+        if deadline is None:
+            deadline = time.time() + (budget if budget is not None else REQUEST_DEFAULT_BUDGET)
+        elif budget is not None:
+            deadline = min(deadline, time.time() + budget)
+
+        breaker = self._breaker(path)
         attempt_counter = 0
 
         use_session = None
-        while not self.stop_bot and not self.stop_bot_iteration:
+        while not self.context.stop_bot and not self.context.stop_bot_iteration:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                self.metrics["deadline_exceeded"] += 1
+                self.info_handler.debug_error_notes(
+                    f"[OKX] {method_up} {path}: deadline exceeded after {attempt_counter} attempt(s)", is_print=True
+                )
+                return None
+
+            if not breaker.allow():
+                self.metrics["breaker_rejected"] += 1
+                self.info_handler.debug_error_notes(f"[OKX] {method_up} {path}: circuit open, fail fast", is_print=True)
+                return None
+
             attempt_counter += 1
+            if attempt_counter > 1:
+                self.metrics["retries"] += 1
+                self.metrics[f"retries:{path}"] += 1
+
+            failed = False
             try:
+                try:
+                    await asyncio.wait_for(self.rate_limiter.acquire(limiter_account, path, priority), timeout=remaining)
+                except asyncio.TimeoutError:
+                    # дедлайн истёк в очереди локального лимитера — до сети не дошли, endpoint не виноват
+                    breaker.release()
+                    self.metrics["deadline_exceeded"] += 1
+                    self.info_handler.debug_error_notes(
+                        f"[OKX] {method_up} {path}: deadline exceeded waiting for rate limiter", is_print=True
+                    )
+                    return None
+                request_timeout = aiohttp.ClientTimeout(total=min(REQUEST_ATTEMPT_TIMEOUT, max(deadline - time.time(), 0.001)))
+
                 if session and not session.closed:
                     use_session = session
                     is_temp = False
                 else:
-                    use_session = aiohttp.ClientSession()
+                    use_session = aiohttp.ClientSession(timeout=request_timeout)
                     is_temp = True
 
                 if is_temp:
                     async with use_session:
-                        resp = await send_request(use_session)
+                        resp = await send_request(use_session, request_timeout)
+                        text = await resp.text()
                 else:
-                    resp = await send_request(use_session)
+                    resp = await send_request(use_session, request_timeout)
+                    text = await resp.text()
 
-                text = await resp.text()
                 try:
                     j = json.loads(text)
                 except Exception:
                     self.info_handler.debug_error_notes(f"Non-JSON response: {resp.status} {text}", is_print=True)
                     j = {}
 
-                if resp.status >= 400:
-                    self.info_handler.debug_error_notes(f"HTTP {resp.status}: {j}", is_print=True)
-
                 code = j.get("code")
-                if code is not None and str(code) != "0":
-                    self.info_handler.debug_info_notes(f"OKX DEBUG code {code}: {j.get('msg')} | full: {j}", is_print=True)
+                if self.rate_limiter.is_rate_limited(resp.status, code):
+                    breaker.record_success()
+                    self.rate_limiter.on_rate_limited(limiter_account, path)
+                    self.info_handler.debug_info_notes(
+                        f"[OKX RATE LIMIT] {path} code={code or resp.status}. Slowing down, attempt {attempt_counter}", is_print=True
+                    )
+                    continue
+
+                if resp.status >= 500 or (code is not None and str(code) in OKX_DEGRADED_CODES):
+                    failed = True
+                    self.info_handler.debug_error_notes(f"[OKX] {path} degraded: HTTP {resp.status}, code {code}", is_print=True)
+                else:
+                    breaker.record_success()
+
+                    if resp.status >= 400:
+                        self.info_handler.debug_error_notes(f"HTTP {resp.status}: {j}", is_print=True)
 
-                return j
+                    if code is not None and str(code) != "0":
+                        self.info_handler.debug_info_notes(f"OKX DEBUG code {code}: {j.get('msg')} | full: {j}", is_print=True)
+
+                    return j
 
             except asyncio.CancelledError:
-                return
+                # отменённая попытка (в т.ч. пробная в half-open) ничего не говорит о здоровье endpoint-а
+                breaker.release()
+                raise
             except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                failed = True
                 # if spec_marker != "non_session" or attempt_counter > 1:
                 #     self.info_handler.debug_error_notes(f"[Request error] {e}. Attempt== {attempt_counter}. Retry in 1s", is_print=True)
-                await asyncio.sleep(1)
             except Exception as e:
+                failed = True
                 # if spec_marker != "non_session" or attempt_counter > 1:
                 #     self.info_handler.debug_error_notes(f"[Unexpected error] {e}. Attempt== {attempt_counter}. Retry in 1s", is_print=True)
-                await asyncio.sleep(1)
+
+            if failed:
+                if breaker.record_failure():
+                    self.metrics["breaker_trips"] += 1
+                    self.metrics[f"breaker_trips:{path}"] += 1
+                    self.info_handler.debug_error_notes(
+                        f"[OKX] {path}: circuit opened after {breaker.failures} failures", is_print=True
+                    )
+                delay = backoff_delay(attempt_counter, REQUEST_BACKOFF_BASE, REQUEST_BACKOFF_CAP)
+                await asyncio.sleep(max(0.0, min(delay, deadline - time.time())))
+
+    async def _trade_request(
+        self,
+        session: Optional[aiohttp.ClientSession],
+        op: str,
+        path: str,
+        data: Dict[str, Any] | List[Dict[str, Any]],
+        deadline: Optional[float] = None,
+        via_ws: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Торговый запрос: через приватный WS (op), если сокет жив, иначе / при отказе — REST path.
+        Формат ответа WS совпадает с REST ({"code", "msg", "data": [...]}).
+        via_ws=False — сразу REST по переданной session (хедж-копия не должна идти тем же сокетом).
+        """
+        ws = self.ws_trade if via_ws else None
+        if ws is not None:
+            timeout = WS_REQUEST_TIMEOUT
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.time())
+            if ws.is_alive() and timeout > 0:
+                started = time.time()
+                try:
+                    await asyncio.wait_for(self.rate_limiter.acquire(self.account_tag, path), timeout=timeout)
+                except asyncio.TimeoutError:
+                    # токена не дождались — REST-путь сам решит по дедлайну, ждать ли дальше
+                    self.metrics["ws_trade_limiter_timeout"] += 1
+                    return await self._request(session, "POST", path, data=data, private=True, deadline=deadline)
+                timeout -= time.time() - started
+                r = await ws.request(op, data if isinstance(data, list) else [data], timeout=max(timeout, 0.001))
+                if r is not None:
+                    code = r.get("code")
+                    if not self.rate_limiter.is_rate_limited(0, code):
+                        self.metrics["ws_trade"] += 1
+                        return r
+                    self.rate_limiter.on_rate_limited(self.account_tag, path)
+            self.metrics["ws_trade_fallback"] += 1
+
+        return await self._request(session, "POST", path, data=data, private=True, deadline=deadline)
+
+    def _breaker(self, path: str) -> CircuitBreaker:
+        breaker = self._breakers.get(path)
+        if breaker is None:
+            breaker = self._breakers[path] = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+        return breaker
+
+    def request_stats(self) -> Dict[str, Any]:
+        """Счётчики ретраев / срабатываний предохранителей + состояние лимитера."""
+        return {
+            "counters": dict(self.metrics),
+            "breakers": {path: b.state for path, b in self._breakers.items()},
+            "limiter": self.rate_limiter.stats(),
+        }
 
     # --- Public endpoints ---
     async def get_instruments(
@@ -281,7 +446,8 @@ class OkxFuturesClient:
         lever: int | float | str = None,
         mgnMode: str | None = None,
         posSide: str | None = None,
-        ccy: str | None = None
+        ccy: str | None = None,
+        deadline: Optional[float] = None
     ) -> dict:
         """
         POST /api/v5/account/set-leverage
@@ -309,16 +475,65 @@ class OkxFuturesClient:
         if ccy is not None:
             body["ccy"] = str(ccy)
 
-        r = await self._request(
-            session,
-            "POST",
-            "/api/v5/account/set-leverage",
-            data=body,
-            private=True
-        )
-        if r is None:
+        try:
+            r = await self._request(
+                session,
+                "POST",
+                "/api/v5/account/set-leverage",
+                data=body,
+                private=True,
+                deadline=deadline
+            )
+        except BaseException:
+            # запрос мог дойти до биржи (отмена, обрыв) — кэшу больше не верим
+            if instId is not None:
+                self.leverage.discard(instId, mgnMode, posSide)
+            raise
+        if r is None or str(r.get("code")) != "0":
+            # состояние на бирже неизвестно — в следующий раз ставим заново
+            if instId is not None:
+                self.leverage.discard(instId, mgnMode, posSide)
             return  
-        return r.get("data", [])
+        data = r.get("data", [])
+        self.leverage.observe(data)
+        return data
+
+    async def get_leverage_info(
+        self,
+        session: aiohttp.ClientSession,
+        inst_ids: List[str],
+        mgnMode: str
+    ) -> List[Dict[str, Any]]:
+        """
+        GET /api/v5/account/leverage-info — плечо по списку инструментов
+        (до 20 instId в запросе, пачки идут параллельно в пределах лимита endpoint-а).
+        """
+        chunks = [inst_ids[i:i + 20] for i in range(0, len(inst_ids), 20)]
+
+        async def fetch_chunk(chunk: List[str]) -> List[Dict[str, Any]]:
+            r = await self._request(
+                session,
+                "GET",
+                "/api/v5/account/leverage-info",
+                params={"instId": ",".join(chunk), "mgnMode": str(mgnMode).lower()},
+                private=True
+            )
+            if not r or str(r.get("code")) != "0":
+                return []
+            return r.get("data", [])
+
+        results = await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks))
+        return [item for chunk_data in results for item in chunk_data]
+
+    async def seed_leverage(
+        self,
+        session: aiohttp.ClientSession,
+        inst_ids: List[str],
+        mgnMode: str
+    ) -> int:
+        """Пачкой наполняет кэш плеча. Возвращает число записей."""
+        data = await self.get_leverage_info(session, inst_ids, mgnMode)
+        return self.leverage.observe(data)
 
     async def place_order(
         self,
@@ -339,11 +554,15 @@ class OkxFuturesClient:
         px: Optional[float | int | str] = None,  # цена (только для limit)
         client_ord_id: Optional[str] = None,
         tag: Optional[str] = None,
+        deadline: Optional[float] = None,
+        via_ws: bool = True,
     ) -> Dict[str, Any]:
         """
         Размещает ордер с автоматическим Take Profit и Stop Loss.
         - Для limit ордера: ordType="limit", px обязателен
         - Для market ордера: ordType="market", px не используется
+        - deadline: unix-время (сек), после которого ретраи прекращаются
+        - via_ws=False: только REST по session (хедж-отправка)
         """
 
         body: Dict[str, Any] = {
@@ -383,12 +602,13 @@ class OkxFuturesClient:
             f"[DEBUG: place_order request body] {body}", is_print=True
         )
 
-        r = await self._request(
+        r = await self._trade_request(
             session,
-            "POST",
+            "order",
             "/api/v5/trade/order",
             data=body,
-            private=True
+            deadline=deadline,
+            via_ws=via_ws
         )
 
         if r is None:
@@ -396,6 +616,106 @@ class OkxFuturesClient:
 
         return r.get("data", [])
 
+    async def get_order(
+        self,
+        session: aiohttp.ClientSession,
+        instId: str,
+        ordId: Optional[str] = None,
+        clOrdId: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        GET /api/v5/trade/order — детали ордера по ordId или clOrdId.
+        """
+        params: Dict[str, Any] = {"instId": instId}
+        if ordId:
+            params["ordId"] = ordId
+        if clOrdId:
+            params["clOrdId"] = clOrdId
+
+        r = await self._request(session, "GET", "/api/v5/trade/order", params=params, private=True)
+        if r is None:
+            return
+        return r.get("data", [])
+
+    async def _recover_order_ack(
+        self,
+        session: aiohttp.ClientSession,
+        instId: str,
+        clOrdId: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Ордер с этим clOrdId уже на бирже (ретрай / хедж-дубль) — собираем ack из деталей ордера.
+        """
+        data = await self.get_order(session=session, instId=instId, clOrdId=clOrdId) or []
+        if not data or not data[0].get("ordId"):
+            return []
+        order = data[0]
+        return [{
+            "ordId": order.get("ordId"),
+            "clOrdId": clOrdId,
+            "sCode": "0",
+            "sMsg": "recovered by clOrdId",
+            "ts": order.get("cTime"),
+        }]
+
+    async def place_order_idempotent(
+        self,
+        sessions: List[aiohttp.ClientSession],
+        client_ord_id: str,
+        hedge_delay: Optional[float] = None,
+        **order_kwargs
+    ) -> List[Dict[str, Any]]:
+        """
+        Идемпотентное размещение: ордер всегда уходит с client_ord_id, поэтому повтор не создаёт дубль.
+        hedge_delay (сек): если за это время нет ack, тот же ордер отправляется повторно по REST второй сессии
+        (отдельный пул соединений, мимо приватного WS, которым ушёл основной) — берём первый пришедший ack. Дубль биржа отклонит по clOrdId (51016).
+        Ответ с 51016 означает, что ордер уже принят — ack восстанавливается через get_order.
+        """
+        inst_id = order_kwargs["instId"]
+        sessions = [s for s in sessions if s is not None] or [None]
+
+        def is_duplicate(data) -> bool:
+            return bool(data) and str(data[0].get("sCode")) == OKX_DUPLICATE_CL_ORD_ID
+
+        def send(session, via_ws: bool = True):
+            return asyncio.create_task(
+                self.place_order(session=session, client_ord_id=client_ord_id, via_ws=via_ws, **order_kwargs)
+            )
+
+        tasks = [send(sessions[0])]
+        if hedge_delay and len(sessions) > 1:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done:
+                self.metrics["hedged_orders"] += 1
+                self.info_handler.debug_info_notes(
+                    f"[place_order] no ack in {hedge_delay * 1000:.0f} ms for {client_ord_id}, sending hedge", is_print=True
+                )
+                tasks.append(send(sessions[1], via_ws=False))
+
+        result = None
+        duplicate = False
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    data = task.result()
+                    if is_duplicate(data):
+                        duplicate = True
+                        continue
+                    if data and str(data[0].get("sCode")) == "0":
+                        return data
+                    result = result or data
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if duplicate:
+            recovered = await self._recover_order_ack(sessions[0], inst_id, client_ord_id)
+            if recovered:
+                return recovered
+        return result
+
     async def cancel_order(
             self,
             session: aiohttp.ClientSession,
@@ -413,11 +733,29 @@ class OkxFuturesClient:
         if clOrdId:
             body["clOrdId"] = clOrdId
 
-        r = await self._request(session, "POST", "/api/v5/trade/cancel-order", data=body, private=True)
+        r = await self._trade_request(session, "cancel-order", "/api/v5/trade/cancel-order", data=body)
         if r is None:
             return  
         return r.get("data", [])    
     
+    async def cancel_batch_orders(
+        self,
+        session: aiohttp.ClientSession,
+        orders: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Пакетная отмена: POST /api/v5/trade/cancel-batch-orders (WS op batch-cancel-orders).
+        orders: [{"instId": ..., "ordId" | "clOrdId": ...}], OKX принимает до 20 штук за запрос — режем сами.
+        """
+        results: List[Dict[str, Any]] = []
+        for i in range(0, len(orders), 20):
+            chunk = orders[i:i + 20]
+            r = await self._trade_request(session, "batch-cancel-orders", "/api/v5/trade/cancel-batch-orders", data=chunk)
+            if r is None:
+                continue
+            results.extend(r.get("data", []))
+        return results
+
     # /////
     async def get_historical_orders_report(
         self,
@@ -425,9 +763,11 @@ class OkxFuturesClient:
         start_time: Optional[int] = None,
         end_time: Optional[int] = None,
         session: Optional[aiohttp.ClientSession] = None,
+        limit: Optional[int] = None,
     ) -> Dict[str, Any]:
         """
         Получить историю позиций (positions-history) из OKX.
+        start_time -> after (строки старше uTime), end_time -> before (новее uTime). Сортировка — от свежих.
         """
         params: Dict[str, Any] = {}
         if symbol:
@@ -436,6 +776,8 @@ class OkxFuturesClient:
             params["after"] = str(start_time)
         if end_time:
             params["before"] = str(end_time)
+        if limit:
+            params["limit"] = str(limit)
 
         return await self._request(
             session=session,
@@ -445,110 +787,128 @@ class OkxFuturesClient:
             private=True
         )
     
+    async def sync_positions_history(
+        self,
+        inst_id: Optional[str] = None,
+        since_ms: Optional[int] = None,
+        max_pages: int = 10,
+        page_size: int = 100
+    ) -> int:
+        """
+        Догружает в журнал только новые строки positions-history.
+        Журнал пуст — первичная загрузка от свежих к старым (after=uTime) до since_ms
+        (по умолчанию PNL_LEDGER_BACKFILL назад). Иначе — только строки новее курсора журнала
+        (before=курсор, дальше before=самый свежий uTime страницы), без повторной выкачки старых.
+        Курсор двигается только для фильтра запроса: выборка по inst_id не знает о других
+        инструментах и общий курсор не трогает (для inst_id берётся max(общий, свой)).
+        Возвращает число новых строк. При ошибке запроса курсор не двигается.
+        """
+        cursor = self.ledger.cursor(inst_id)
+        backfill = not cursor
+        stop_at = (since_ms if since_ms is not None else int((time.time() - PNL_LEDGER_BACKFILL) * 1000)) if backfill else cursor
+
+        added = 0
+        newest = 0
+        after = None
+        before = None if backfill else cursor
+        for _ in range(max_pages):
+            r = await self.get_historical_orders_report(
+                symbol=inst_id,
+                start_time=after,
+                end_time=before,
+                session=self.context.session,
+                limit=page_size
+            )
+            if not r or str(r.get("code")) != "0":
+                return added
+            rows = r.get("data", [])
+            if not rows:
+                break
+            added += self.ledger.add_rows(rows)
+            u_times = [int(row.get("uTime") or 0) for row in rows]
+            newest = max(newest, max(u_times))
+            if len(rows) < page_size:
+                break
+            if backfill:
+                oldest = min(u_times)
+                if oldest <= stop_at:
+                    break
+                after = oldest
+            else:
+                before = max(u_times)
+
+        if newest:
+            self.ledger.advance(inst_id, newest)
+        return added
+
     async def get_realized_pnl(
         self,
         symbol: str,
         start_time: Optional[int],
         end_time: Optional[int],
-        direction: Optional[int] = None  # 1=LONG, 2=SHORT
+        direction: Optional[str] = None,  # "LONG" / "SHORT"
+        pos_id: Optional[str] = None
     ) -> dict:
         """
-        Считает реализованный PnL за период по символу (OKX).
+        Реализованный PnL закрытой позиции по журналу positions-history.
+        С pos_id — O(1) поиск закрытия (posId, cTime=start_time), без него — сумма закрытий
+        symbol/direction с uTime >= start_time.
         Возвращает словарь:
             {"pnl_usdt": float, "pnl_pct": float}
         """
-        try:
-            rows = await self.get_futures_statement(symbol=symbol)
-            # print(f"rows: {rows}")
-            if not rows:
-                print(f"not get_realized_pnl")
-                return {"pnl_usdt": 0.0, "pnl_pct": 0.0}
-        except Exception as e:
-            self.info_handler.debug_error_notes(
-                f"[get_realized_pnl][OKX] error fetching data: {e}", is_print=True
-            )
-            return {"pnl_usdt": 0.0, "pnl_pct": 0.0}
-
-        pnl_usdt = 0.0
-        pnl_pct = 0.0
-
-        for row in rows:
-            try:
-                ts = int(row.get("uTime", 0))  # время обновления
-                if start_time and ts < start_time:
-                    continue
-
-                # фильтр по направлению
-                pos_side = row.get("posSide", "").upper()  # "LONG"/"SHORT"
-                if direction != pos_side:
-                    continue
-
-                # PnL в долларах
-                # pnl_usdt += float(row.get("realizedPnl", 0.0))
-                # print("ROW:")
-                # print(row)
-                pnl_usdt += float(row.get("realizedPnl", 0.0))
-                if pnl_usdt == 0.0:
-                    pnl_usdt += float(row.get("fee", 0.0)) + float(row.get("fundingFee", 0.0))
-                # pnl_usdt += (
-                #     float(row.get("realizedPnl", 0.0)) +
-                #     float(row.get("fee", 0.0)) +
-                #     float(row.get("fundingFee", 0.0))
-                # )
-                # PnL в %
-                pnl_pct += (float(row.get("pnlRatio", 0.0))) * 100
-
-            except Exception:
-                continue
-
-        return {
-            "pnl_usdt": round(pnl_usdt, 4),
-            "pnl_pct": round(pnl_pct, 4),
-        }
-
-    async def get_futures_statement(
-        self,
-        symbol: Optional[str] = None,
-        session: Optional[aiohttp.ClientSession] = None,
-    ) -> List[Dict[str, Any]]:
+        results = await self.get_realized_pnl_many([{
+            "symbol": symbol,
+            "direction": direction,
+            "start_time": start_time,
+            "pos_id": pos_id,
+        }])
+        return results[0]
+
+    def _ledger_closes(self, close: Dict[str, Any]) -> list:
+        pos_id = close.get("pos_id")
+        start_time = close.get("start_time")
+        if pos_id:
+            rec = self.ledger.get(pos_id, start_time) or self.ledger.get(pos_id)
+            return [rec] if rec is not None and rec.u_time >= (start_time or 0) else []
+        return self.ledger.window(start_time, None, inst_id=close.get("symbol"), pos_side=close.get("direction"))
+
+    async def get_realized_pnl_many(self, closes: List[Dict[str, Any]]) -> List[Dict[str, float]]:
         """
-        Получение истории позиций (OKX) с retry до 7 попыток.
+        PnL пачки закрытий (symbol, direction, start_time, pos_id) одним проходом по истории:
+        на каждую попытку — одна догрузка журнала на все закрытия. Догрузка всегда без фильтра instId:
+        у журнала один общий курсор, первичная загрузка — одна на аккаунт, дальше — только новые строки.
+        Строки появляются в истории с задержкой, поэтому догрузка повторяется до PNL_LOOKUP_ATTEMPTS раз
+        только для ещё не найденных. Порядок результатов совпадает с closes.
         """
-        max_retries = 7
-        rows: List[Dict[str, Any]] = []
+        found: Dict[int, list] = {}
+        for attempt in range(1, PNL_LOOKUP_ATTEMPTS + 1):
+            await self.sync_positions_history()
+
+            for idx, close in enumerate(closes):
+                if idx not in found:
+                    rows = self._ledger_closes(close)
+                    if rows:
+                        found[idx] = rows
+            if len(found) == len(closes):
+                break
+
+            if attempt < PNL_LOOKUP_ATTEMPTS:
+                await asyncio.sleep(random.uniform(1, 2))
 
-        for attempt in range(1, max_retries + 1):
-            try:
-                resp = await self.get_historical_orders_report(symbol=symbol, session=session)
-                if resp and resp.get("code") == "0":
-                    rows = resp.get("data", [])
-                    break
-                else:
-                    self.info_handler.debug_error_notes(
-                        f"[get_futures_statement][OKX] invalid response code={resp.get('code') if resp else 'None'}, "
-                        f"attempt {attempt}/{max_retries}", is_print=True
-                    )
-            except Exception as e:
+        results = []
+        for idx, close in enumerate(closes):
+            rows = found.get(idx)
+            if not rows:
                 self.info_handler.debug_error_notes(
-                    f"[get_futures_statement][OKX] exception {e}, attempt {attempt}/{max_retries}",
-                    is_print=True
+                    f"[PNL] not get_realized_pnl: {close.get('symbol')} {close.get('direction')}", is_print=True
                 )
-
-            if attempt < max_retries:
-                await asyncio.sleep(random.uniform(1, 2))
-
-        return rows
-
-    # async def get_futures_statement(
-    #     self,
-    #     symbol: Optional[str] = None,
-    #     session: Optional[aiohttp.ClientSession] = None,
-    # ):
-    #     resp = await self.get_historical_orders_report(symbol=symbol, session=session)
-    #     if resp and resp.get("code") == "0":
-    #         return resp.get("data", [])
-    #     return []
-
+                results.append({"pnl_usdt": 0.0, "pnl_pct": 0.0})
+                continue
+            results.append({
+                "pnl_usdt": round(sum(rec.pnl_usdt for rec in rows), 4),
+                "pnl_pct": round(sum(rec.pnl_ratio for rec in rows) * 100, 4),
+            })
+        return results
 
 
 class ApiResponseValidator:
@@ -0,0 +1,138 @@
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _to_int(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class ClosedPosition:
+    """Строка positions-history в компактном виде."""
+
+    __slots__ = ("pos_id", "inst_id", "pos_side", "c_time", "u_time", "realized_pnl", "pnl_ratio", "fee", "funding_fee")
+
+    def __init__(self, row: Dict[str, Any]):
+        self.pos_id = str(row.get("posId") or "")
+        self.inst_id = str(row.get("instId") or "").upper()
+        self.pos_side = str(row.get("posSide") or "").upper()
+        self.c_time = _to_int(row.get("cTime"))
+        self.u_time = _to_int(row.get("uTime"))
+        self.realized_pnl = _to_float(row.get("realizedPnl"))
+        self.pnl_ratio = _to_float(row.get("pnlRatio"))
+        self.fee = _to_float(row.get("fee"))
+        self.funding_fee = _to_float(row.get("fundingFee"))
+
+    @property
+    def pnl_usdt(self) -> float:
+        # realizedPnl уже включает комиссии и фандинг; 0 — закрытие без движения цены, остаются только они
+        return self.realized_pnl if self.realized_pnl else self.fee + self.funding_fee
+
+    def __repr__(self) -> str:
+        return f"ClosedPosition({self.pos_id}, {self.inst_id}, {self.pos_side}, pnl={self.realized_pnl})"
+
+
+class PositionsLedger:
+    """
+    Локальный журнал закрытых позиций (positions-history).
+    - posId -> {cTime -> запись}: OKX переиспользует posId для той же стороны инструмента,
+      поэтому конкретное закрытие адресуется парой (posId, cTime). Поиск — O(1).
+    - хронология по uTime для выборок за окно (дневные сводки) — bisect.
+    - курсоры: самый свежий uTime, уже загруженный (общий и по instId) — догружаются только новые строки.
+    """
+
+    __slots__ = ("_by_pos", "_timeline", "_cursors")
+
+    def __init__(self):
+        self._by_pos: Dict[str, Dict[int, ClosedPosition]] = {}
+        self._timeline: List[Tuple[int, str, int]] = []  # (u_time, pos_id, c_time)
+        self._cursors: Dict[Optional[str], int] = {}
+
+    def cursor(self, inst_id: Optional[str] = None) -> int:
+        """uTime, новее которого строк в журнале может не быть (для instId учитывается и общий курсор)."""
+        overall = self._cursors.get(None, 0)
+        if inst_id is None:
+            return overall
+        return max(overall, self._cursors.get(inst_id.upper(), 0))
+
+    def advance(self, inst_id: Optional[str], u_time: int) -> None:
+        key = inst_id.upper() if inst_id else None
+        if u_time > self._cursors.get(key, 0):
+            self._cursors[key] = u_time
+
+    def add_rows(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Добавляет строки API, дубликаты пропускает. Возвращает число новых."""
+        added = 0
+        for row in rows or []:
+            rec = ClosedPosition(row)
+            if not rec.pos_id:
+                continue
+            closes = self._by_pos.setdefault(rec.pos_id, {})
+            old = closes.get(rec.c_time)
+            if old is not None:
+                if old.u_time == rec.u_time:
+                    continue
+                # строка обновилась (частичные закрытия) — переставляем в хронологии
+                idx = bisect_left(self._timeline, (old.u_time, old.pos_id, old.c_time))
+                if idx < len(self._timeline) and self._timeline[idx] == (old.u_time, old.pos_id, old.c_time):
+                    del self._timeline[idx]
+            else:
+                added += 1
+            closes[rec.c_time] = rec
+            insort(self._timeline, (rec.u_time, rec.pos_id, rec.c_time))
+        return added
+
+    def get(self, pos_id: str, c_time: Optional[int] = None) -> Optional[ClosedPosition]:
+        """Закрытие позиции posId, открытой в c_time (без c_time — последнее по posId)."""
+        closes = self._by_pos.get(str(pos_id))
+        if not closes:
+            return None
+        if c_time is not None:
+            return closes.get(int(c_time))
+        return max(closes.values(), key=lambda rec: rec.u_time)
+
+    def window(
+        self,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+        inst_id: Optional[str] = None,
+        pos_side: Optional[str] = None
+    ) -> List[ClosedPosition]:
+        """Закрытия с uTime в [start_ms, end_ms], опционально по инструменту / стороне."""
+        timeline = self._timeline
+        lo = bisect_left(timeline, (start_ms or 0,))
+        inst_id = inst_id.upper() if inst_id else None
+        pos_side = pos_side.upper() if pos_side else None
+        result = []
+        for u_time, pos_id, c_time in timeline[lo:]:
+            if end_ms is not None and u_time > end_ms:
+                break
+            rec = self._by_pos[pos_id][c_time]
+            if inst_id and rec.inst_id != inst_id:
+                continue
+            if pos_side and rec.pos_side != pos_side:
+                continue
+            result.append(rec)
+        return result
+
+    def summary(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None, inst_id: Optional[str] = None) -> Dict[str, Any]:
+        """Сводка за окно: сумма PnL, комиссий, фандинга и число закрытий."""
+        rows = self.window(start_ms, end_ms, inst_id)
+        return {
+            "count": len(rows),
+            "pnl_usdt": round(sum(rec.pnl_usdt for rec in rows), 4),
+            "fee": round(sum(rec.fee for rec in rows), 4),
+            "funding_fee": round(sum(rec.funding_fee for rec in rows), 4),
+        }
+
+    def __len__(self) -> int:
+        return len(self._timeline)
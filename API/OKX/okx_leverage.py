@@ -0,0 +1,65 @@
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+def leverage_key(inst_id: str, mgn_mode: str, pos_side: Optional[str]) -> Tuple[str, str, str]:
+    """
+    Ключ плеча OKX. В cross плечо общее для long/short, поэтому posSide в ключ не входит;
+    в isolated (long/short mode) — своё на каждую сторону.
+    """
+    mgn_mode = str(mgn_mode or "").lower()
+    side = str(pos_side or "").lower() if mgn_mode == "isolated" else ""
+    return str(inst_id).upper(), mgn_mode, side
+
+
+class LeverageCache:
+    """
+    Известное плечо аккаунта по (instId, mgnMode, posSide).
+    Наполняется пачкой из /account/leverage-info, ответами set-leverage и пушами positions.
+    """
+
+    __slots__ = ("_levers", "hits", "misses")
+
+    def __init__(self):
+        self._levers: Dict[Tuple[str, str, str], int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, inst_id: str, mgn_mode: str, pos_side: Optional[str]) -> Optional[int]:
+        return self._levers.get(leverage_key(inst_id, mgn_mode, pos_side))
+
+    def is_set(self, inst_id: str, mgn_mode: str, pos_side: Optional[str], lever: Any) -> bool:
+        """Плечо уже такое — set-leverage можно не звать."""
+        try:
+            target = int(float(lever))
+        except (TypeError, ValueError):
+            return False
+        if self.get(inst_id, mgn_mode, pos_side) == target:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def put(self, inst_id: str, mgn_mode: str, pos_side: Optional[str], lever: Any) -> None:
+        try:
+            self._levers[leverage_key(inst_id, mgn_mode, pos_side)] = int(float(lever))
+        except (TypeError, ValueError):
+            pass
+
+    def discard(self, inst_id: str, mgn_mode: str, pos_side: Optional[str]) -> None:
+        self._levers.pop(leverage_key(inst_id, mgn_mode, pos_side), None)
+
+    def observe(self, items: Iterable[Dict[str, Any]]) -> int:
+        """Записи OKX с instId / mgnMode / posSide / lever (leverage-info, set-leverage, positions)."""
+        count = 0
+        for item in items or []:
+            if not item or not item.get("instId") or not item.get("mgnMode") or not item.get("lever"):
+                continue
+            self.put(item["instId"], item["mgnMode"], item.get("posSide"), item["lever"])
+            count += 1
+        return count
+
+    def __len__(self) -> int:
+        return len(self._levers)
+
+    def clear(self) -> None:
+        self._levers.clear()
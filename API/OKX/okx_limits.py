@@ -0,0 +1,71 @@
+from typing import Dict, Optional, Tuple
+from c_limits import TokenBucket, PRIORITY_ORDER, PRIORITY_DEFAULT, PRIORITY_BACKGROUND
+
+
+# path -> (запросов, за секунд, приоритет по умолчанию). Лимиты из документации OKX v5.
+OKX_ENDPOINT_LIMITS: Dict[str, Tuple[int, float, int]] = {
+    "/api/v5/trade/order":                  (60, 2, PRIORITY_ORDER),
+    "/api/v5/trade/cancel-order":           (60, 2, PRIORITY_ORDER),
+    "/api/v5/trade/batch-orders":           (300, 2, PRIORITY_ORDER),
+    "/api/v5/trade/cancel-batch-orders":    (300, 2, PRIORITY_ORDER),
+    "/api/v5/account/set-leverage":         (20, 2, PRIORITY_ORDER),
+    "/api/v5/account/leverage-info":        (20, 2, PRIORITY_BACKGROUND),
+    "/api/v5/account/set-position-mode":    (5, 2, PRIORITY_DEFAULT),
+    "/api/v5/account/positions":            (10, 2, PRIORITY_BACKGROUND),
+    "/api/v5/account/positions-history":    (10, 2, PRIORITY_BACKGROUND),
+    "/api/v5/public/instruments":           (20, 2, PRIORITY_BACKGROUND),
+    "/api/v5/market/tickers":               (20, 2, PRIORITY_BACKGROUND),
+    "/api/v5/market/ticker":                (20, 2, PRIORITY_DEFAULT),
+}
+OKX_DEFAULT_LIMIT: Tuple[int, float, int] = (10, 2, PRIORITY_DEFAULT)
+
+# Коды ответов OKX, означающие троттлинг
+OKX_RATE_LIMIT_CODES = {"50011", "50040", "50061"}
+
+
+class OkxRateLimiter:
+    """
+    Планировщик запросов к OKX: отдельный token bucket на пару (аккаунт, endpoint).
+    Публичные endpoint-ы лимитируются по IP — для них общий ключ "public".
+    Один экземпляр можно разделить между несколькими клиентами.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[int, float, int]]] = None):
+        self.limits = dict(OKX_ENDPOINT_LIMITS if limits is None else limits)
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def _limit(self, path: str) -> Tuple[int, float, int]:
+        return self.limits.get(path, OKX_DEFAULT_LIMIT)
+
+    def default_priority(self, path: str) -> int:
+        return self._limit(path)[2]
+
+    def bucket(self, account: Optional[str], path: str) -> TokenBucket:
+        key = (account or "public", path)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            count, period, _ = self._limit(path)
+            bucket = self._buckets[key] = TokenBucket(rate=count / period, capacity=count)
+        return bucket
+
+    async def acquire(self, account: Optional[str], path: str, priority: Optional[int] = None) -> None:
+        if priority is None:
+            priority = self.default_priority(path)
+        await self.bucket(account, path).acquire(priority)
+
+    def on_rate_limited(self, account: Optional[str], path: str) -> None:
+        self.bucket(account, path).penalize()
+
+    @staticmethod
+    def is_rate_limited(status: int, code: Optional[str]) -> bool:
+        return status == 429 or (code is not None and str(code) in OKX_RATE_LIMIT_CODES)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            f"{account}:{path}": {
+                "rate": round(b.rate, 3),
+                "queued": b.queued,
+                "throttled": b.throttled,
+            }
+            for (account, path), b in self._buckets.items()
+        }
@@ -0,0 +1,364 @@
+import aiohttp
+import asyncio
+import hmac
+import hashlib
+import base64
+import json
+import time
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+import itertools
+from a_config import WS_PING_INTERVAL, WS_RECONNECT_DELAY, WS_RECONNECT_MAX_DELAY, WS_SUBSCRIBE_BATCH, WS_REQUEST_TIMEOUT
+from b_context import BotContext
+from c_log import ErrorHandler
+
+
+class OkxWsBase:
+    """
+    Базовый async WebSocket-клиент OKX v5: коннект, heartbeat ("ping"/"pong"),
+    автоматический реконнект с экспоненциальной задержкой и повторной подпиской.
+    URL передаётся снаружи — можно подменить на локальный тестовый сервер.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        context: BotContext,
+        info_handler: ErrorHandler,
+        name: str = "OKX WS",
+        ping_interval: float = WS_PING_INTERVAL,
+        reconnect_delay: float = WS_RECONNECT_DELAY,
+        reconnect_max_delay: float = WS_RECONNECT_MAX_DELAY,
+    ):
+        info_handler.wrap_foreign_methods(self)
+        self.info_handler = info_handler
+        self.context = context
+        self.url = url
+        self.name = name
+        self.ping_interval = ping_interval
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max_delay = reconnect_max_delay
+
+        self._subscriptions: List[Dict[str, Any]] = []
+        self._handlers: Dict[str, List[Callable[[Dict[str, Any], List[Dict[str, Any]]], Awaitable]]] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.connected = asyncio.Event()
+        self.reconnects = 0
+        self.last_msg_time: float = 0.0
+
+    # --- public ---
+    def is_alive(self) -> bool:
+        return self.connected.is_set() and self._ws is not None and not self._ws.closed
+
+    def add_handler(self, channel: str, handler: Callable[[Dict[str, Any], List[Dict[str, Any]]], Awaitable]):
+        """handler(arg, data) вызывается на каждый push канала channel."""
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def subscribe(self, args: List[Dict[str, Any]]):
+        """Запоминает подписку (для реконнекта) и отправляет её, если сокет жив."""
+        new_args = [a for a in args if a not in self._subscriptions]
+        self._subscriptions.extend(new_args)
+        if new_args and self.is_alive():
+            await self._send_subscribe(new_args)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._closing = True
+        self.connected.clear()
+        if self._ws is not None and not self._ws.closed:
+            try:
+                await self._ws.close()
+            except Exception:
+                pass
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    # --- hooks ---
+    async def _on_open(self, ws: aiohttp.ClientWebSocketResponse) -> bool:
+        """Вызывается сразу после коннекта, до подписок. False — переподключиться."""
+        return True
+
+    async def _on_message(self, msg: Dict[str, Any]) -> None:
+        """Сообщения без "arg"/"data" (ответы на op и т.п.)."""
+        event = msg.get("event")
+        if event == "error":
+            self.info_handler.debug_error_notes(f"[{self.name}] error event: {msg}", is_print=True)
+
+    # --- internals ---
+    def _should_run(self) -> bool:
+        return not self._closing and not self.context.stop_bot and not self.context.stop_bot_iteration
+
+    async def _send_json(self, payload: Dict[str, Any]) -> None:
+        await self._ws.send_str(json.dumps(payload, separators=(",", ":")))
+
+    async def _send_subscribe(self, args: List[Dict[str, Any]]) -> None:
+        # OKX ограничивает размер одного запроса — шлём подписки пачками
+        for i in range(0, len(args), WS_SUBSCRIBE_BATCH):
+            await self._send_json({"op": "subscribe", "args": args[i:i + WS_SUBSCRIBE_BATCH]})
+
+    async def _recv_json(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Читает одно JSON-сообщение (pong пропускает). None — таймаут или закрытый сокет."""
+        while True:
+            try:
+                raw = await self._ws.receive(timeout=timeout)
+            except asyncio.TimeoutError:
+                return None
+            if raw.type != aiohttp.WSMsgType.TEXT:
+                return None
+            self.last_msg_time = time.monotonic()
+            if raw.data == "pong":
+                continue
+            try:
+                return json.loads(raw.data)
+            except ValueError:
+                continue
+
+    async def _dispatch(self, msg: Dict[str, Any]) -> None:
+        arg = msg.get("arg")
+        data = msg.get("data")
+        if arg is not None and data is not None and "event" not in msg:
+            for handler in self._handlers.get(arg.get("channel"), []):
+                try:
+                    await handler(arg, data)
+                except Exception as e:
+                    self.info_handler.debug_error_notes(f"[{self.name}] handler error: {e}", is_print=True)
+            return
+        await self._on_message(msg)
+
+    async def _read_loop(self) -> str:
+        """Читает сокет до разрыва. Возвращает причину выхода."""
+        ping_sent_at: Optional[float] = None
+        while self._should_run():
+            try:
+                raw = await self._ws.receive(timeout=self.ping_interval)
+            except asyncio.TimeoutError:
+                if ping_sent_at is not None:
+                    return "heartbeat timeout"
+                await self._ws.send_str("ping")
+                ping_sent_at = time.monotonic()
+                continue
+
+            if raw.type != aiohttp.WSMsgType.TEXT:
+                return f"socket closed: {raw.type}"
+
+            self.last_msg_time = time.monotonic()
+            ping_sent_at = None
+            if raw.data == "pong":
+                continue
+            try:
+                msg = json.loads(raw.data)
+            except ValueError:
+                continue
+            await self._dispatch(msg)
+        return "stopped"
+
+    async def _connect_once(self) -> str:
+        """Одна сессия сокета: коннект, логин, подписки, чтение. Возвращает причину разрыва."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        try:
+            self._ws = await self._session.ws_connect(self.url, heartbeat=None, autoping=True)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            return f"connect error: {e}"
+        try:
+            if not await self._on_open(self._ws):
+                return "handshake rejected"
+            if self._subscriptions:
+                await self._send_subscribe(list(self._subscriptions))
+            self.connected.set()
+            self.info_handler.debug_info_notes(f"[{self.name}] connected, subscriptions: {len(self._subscriptions)}")
+            return await self._read_loop()
+        except (aiohttp.ClientError, ConnectionError, RuntimeError) as e:
+            return f"socket error: {e}"
+        finally:
+            self.connected.clear()
+            if not self._ws.closed:
+                await self._ws.close()
+
+    async def _run(self) -> None:
+        delay = self.reconnect_delay
+        while self._should_run():
+            started = time.monotonic()
+            reason = await self._connect_once()
+            if not self._should_run():
+                break
+            # соединение жило достаточно долго — сбрасываем backoff
+            if time.monotonic() - started > self.reconnect_max_delay:
+                delay = self.reconnect_delay
+            self.info_handler.debug_error_notes(f"[{self.name}] connection lost: {reason}. Reconnect in {delay:.1f}s", is_print=True)
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.reconnect_max_delay)
+
+
+class OkxPrivateWs(OkxWsBase):
+    """
+    Приватный WebSocket OKX (логин по API-ключу). Каналы: positions и т.д.
+    Плюс торговые op-ы (order, cancel-order, batch-orders...) через request():
+    ответ сопоставляется с запросом по id.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        api_secret: str,
+        api_passphrase: str,
+        url: str,
+        context: BotContext,
+        info_handler: ErrorHandler,
+        name: str = "OKX WS private",
+        **kwargs
+    ):
+        super().__init__(url, context, info_handler, name=name, **kwargs)
+        info_handler.wrap_foreign_methods(self)
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.api_passphrase = api_passphrase
+        self._req_ids = itertools.count(1)
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    async def request(
+        self,
+        op: str,
+        args: List[Dict[str, Any]],
+        timeout: float = WS_REQUEST_TIMEOUT
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Отправляет торговый op и ждёт ответ с тем же id.
+        None — сокет не залогинен, разорван или ответ не пришёл за timeout (вызывающий уходит в REST).
+        """
+        if not self.is_alive():
+            return None
+        req_id = str(next(self._req_ids))
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = fut
+        try:
+            await self._send_json({"id": req_id, "op": op, "args": args})
+            return await asyncio.wait_for(fut, timeout=timeout)
+        except (asyncio.TimeoutError, ConnectionError, RuntimeError, aiohttp.ClientError):
+            return None
+        finally:
+            self._pending.pop(req_id, None)
+
+    async def _on_message(self, msg: Dict[str, Any]) -> None:
+        req_id = msg.get("id")
+        if req_id is not None and "op" in msg:
+            fut = self._pending.get(str(req_id))
+            if fut is not None and not fut.done():
+                fut.set_result(msg)
+            return
+        await super()._on_message(msg)
+
+    async def _connect_once(self) -> str:
+        try:
+            return await super()._connect_once()
+        finally:
+            # ответы на запросы разорванного сокета уже не придут
+            for fut in self._pending.values():
+                if not fut.done():
+                    fut.set_result(None)
+
+    def _login_args(self) -> Dict[str, str]:
+        """
+        sign = Base64( HMAC-SHA256( secret, timestamp + 'GET' + '/users/self/verify' ) ), timestamp в секундах.
+        """
+        ts = str(int(time.time()))
+        prehash = f"{ts}GET/users/self/verify"
+        digest = hmac.new(self.api_secret.encode("utf-8"), prehash.encode("utf-8"), hashlib.sha256).digest()
+        return {
+            "apiKey": self.api_key,
+            "passphrase": self.api_passphrase,
+            "timestamp": ts,
+            "sign": base64.b64encode(digest).decode(),
+        }
+
+    async def _on_open(self, ws: aiohttp.ClientWebSocketResponse) -> bool:
+        await self._send_json({"op": "login", "args": [self._login_args()]})
+        while True:
+            msg = await self._recv_json(timeout=self.ping_interval)
+            if msg is None:
+                self.info_handler.debug_error_notes(f"[{self.name}] login timeout", is_print=True)
+                return False
+            if msg.get("event") == "login":
+                ok = str(msg.get("code")) == "0"
+                if not ok:
+                    self.info_handler.debug_error_notes(f"[{self.name}] login failed: {msg}", is_print=True)
+                return ok
+            if msg.get("event") == "error":
+                self.info_handler.debug_error_notes(f"[{self.name}] login error: {msg}", is_print=True)
+                return False
+
+
+class OkxTickerStream(OkxWsBase):
+    """
+    Публичный WS канал tickers: обновляет общую таблицу цен context.prices на месте
+    и ведёт время последнего апдейта по каждому символу (context.prices_ts).
+    """
+
+    def __init__(
+        self,
+        url: str,
+        context: BotContext,
+        info_handler: ErrorHandler,
+        name: str = "OKX WS tickers",
+        **kwargs
+    ):
+        super().__init__(url, context, info_handler, name=name, **kwargs)
+        info_handler.wrap_foreign_methods(self)
+        self.add_handler("tickers", self._on_tickers)
+
+    async def track(self, inst_ids: List[str]) -> None:
+        """Подписка на тикеры списка инструментов (пачками, см. _send_subscribe)."""
+        await self.subscribe([{"channel": "tickers", "instId": inst_id} for inst_id in inst_ids])
+
+    async def _on_tickers(self, arg: Dict[str, Any], data: List[Dict[str, Any]]) -> None:
+        prices = self.context.prices
+        prices_ts = self.context.prices_ts
+        now = time.time()
+        for item in data:
+            inst_id = item.get("instId")
+            last = item.get("last")
+            if not inst_id or not last:
+                continue
+            try:
+                prices[inst_id] = float(last)
+            except ValueError:
+                continue
+            prices_ts[inst_id] = now
+
+    def age(self, inst_id: str) -> Optional[float]:
+        """Возраст цены в секундах. None — цены нет."""
+        ts = self.context.prices_ts.get(inst_id)
+        return None if ts is None else time.time() - ts
+
+    def get_price(self, inst_id: str, max_age: float) -> Optional[float]:
+        """Цена, если она не старше max_age секунд, иначе None."""
+        age = self.age(inst_id)
+        if age is None or age > max_age:
+            return None
+        return self.context.prices.get(inst_id)
+
+    def stale_symbols(self, max_age: float) -> List[str]:
+        """Символы, по которым цена устарела или ни разу не приходила."""
+        stale = []
+        for arg in self._subscriptions:
+            if arg.get("channel") != "tickers":
+                continue
+            age = self.age(arg["instId"])
+            if age is None or age > max_age:
+                stale.append(arg["instId"])
+        return stale
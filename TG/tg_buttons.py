@@ -166,12 +166,7 @@ class TelegramUserInterface:
         self.ensure_user_config(chat_id)
 
         async with self.bot_iteration_lock:
-            if self.context.start_bot_iteration or any(
-                pos.get("in_position", False)
-                for symbol_data in self.context.position_vars.values()
-                for side, pos in symbol_data.items()
-                if side != "spec"
-            ):
+            if self.context.start_bot_iteration or self.context.any_in_position():
                 await message.answer("Торговля уже запущена или есть открытые позиции.", reply_markup=self.main_menu)
                 return
 
@@ -188,12 +183,7 @@ class TelegramUserInterface:
         self.ensure_user_config(chat_id)
 
         async with self.bot_iteration_lock:
-            if any(
-                pos.get("in_position", False)
-                for symbol_data in self.context.position_vars.values()
-                for side, pos in symbol_data.items()
-                if side != "spec"
-            ):
+            if self.context.any_in_position():
                 await message.answer("Сперва закройте все позиции.", reply_markup=self.main_menu)
                 return
 
@@ -367,12 +357,7 @@ class TelegramUserInterface:
             await callback.message.answer("❗ Сначала настройте конфиг полностью", reply_markup=self.main_menu)
 
     async def stop_button(self, callback: types.CallbackQuery):
-        if any(
-            pos.get("in_position", False)
-            for symbol_data in self.context.position_vars.values()
-            for side, pos in symbol_data.items()
-            if side != "spec"
-        ):
+        if self.context.any_in_position():
             await callback.message.answer("Сперва закройте все позиции.", reply_markup=self.main_menu)
             return
         user_id = callback.from_user.id
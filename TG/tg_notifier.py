@@ -1,6 +1,5 @@
 import asyncio
 from aiogram import Bot
-import asyncio, random
 from aiogram.exceptions import (
     TelegramAPIError,
     TelegramRetryAfter,
@@ -10,9 +9,10 @@ from aiogram.exceptions import (
 from a_config import *
 from b_context import BotContext
 from c_log import ErrorHandler
+from c_limits import TokenBucket, backoff_delay
 from c_utils import milliseconds_to_datetime, to_human_digit
 from typing import *
-import random
+import time
 import traceback
 
 
@@ -22,6 +22,10 @@ class MessageFormatter:
         self.context = context
         self.info_handler = info_handler
 
+    def enqueue(self, chat_id: Any, *texts: str) -> None:
+        """Готовые тексты в очередь чата. Синхронно и без ожидания — вызывается с торгового пути."""
+        self.context.queues_msg.setdefault(chat_id, []).extend(texts)
+
     # // utils method:
     def format_message(
         self,
@@ -148,9 +152,9 @@ class MessageFormatter:
             else:
                 print(f"Неизвестный тип сообщения в format_message. Marker: {marker}")
 
-            self.context.queues_msg[chat_id].append(msg)
+            self.enqueue(chat_id, msg)
             if is_print:
-                print(msg)
+                self.info_handler.debug_info_notes(msg)
 
         except Exception as e:
             err_msg = f"[ERROR] preform_message: {e}\n"
@@ -159,49 +163,166 @@ class MessageFormatter:
 
 
 # === Основной TelegramNotifier ===
+SEND_OK = "ok"
+SEND_RETRY = "retry"
+SEND_DROP = "drop"
+
+
+class _ChatSender:
+    """Состояние отправки одного чата: свой лимит, сигнал «есть что слать» и задача-отправитель."""
+
+    __slots__ = ("bucket", "wake", "task", "dropped", "cut")
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.wake = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.cut = False  # голова очереди — хвост разрезанного сообщения (досылается простым текстом)
+
+
 class TelegramNotifier(MessageFormatter):
+    """
+    Отправка в Telegram вынесена из главного цикла: на каждый чат — своя задача, которая ждёт
+    токен (лимит чата и общий лимит бота), склеивает накопленную очередь в одно сообщение
+    до TG_MESSAGE_LIMIT символов и переживает RetryAfter / сетевые ошибки сама.
+    Торговый путь только кладёт текст в очередь (enqueue) и никогда не ждёт Telegram.
+    """
+
+    SEPARATOR = "\n\n"
+
     def __init__(self, bot: Bot, context: BotContext, info_handler: ErrorHandler):
         super().__init__(context, info_handler)
         self.bot = bot
+        self.global_bucket = TokenBucket(rate=TG_GLOBAL_RATE, capacity=TG_GLOBAL_RATE)
+        self._senders: Dict[Any, _ChatSender] = {}
 
-    async def send_report_batches(self, chat_id: int, batch_size: int = 1):
-        queue = self.context.queues_msg[chat_id]
-        while queue:
-            batch = queue[:batch_size]
-            text_block = "\n\n".join(batch)
-            await self._send_message(chat_id, text_block)
-            del queue[:len(batch)]
-            await asyncio.sleep(0.25)
-
-    async def _send_message(self, chat_id: int, text: str):
-        while not self.context.stop_bot and not self.context.stop_bot_iteration:
-            try:
-                msg = await self.bot.send_message(chat_id, text, parse_mode="HTML")
-                return msg
-            except TelegramNetworkError as e:
-                wait = random.uniform(1, 3)
+    def enqueue(self, chat_id: Any, *texts: str) -> None:
+        queue = self.context.queues_msg.setdefault(chat_id, [])
+        queue.extend(text for text in texts if text)
+        sender = self._senders.get(chat_id)
+        if sender is None:
+            sender = self._senders[chat_id] = _ChatSender(TokenBucket(rate=TG_CHAT_RATE, capacity=TG_CHAT_BURST))
+        overflow = len(queue) - TG_CHAT_QUEUE_LIMIT
+        if overflow > 0:
+            # Telegram не успевает — теряем старое, а не память и не торговый путь
+            del queue[:overflow]
+            sender.dropped += overflow
+        if sender.task is None or sender.task.done():
+            sender.task = asyncio.create_task(self._sender_loop(chat_id, sender))
+        sender.wake.set()
+
+    @classmethod
+    def coalesce(cls, queue: List[str], limit: int = TG_MESSAGE_LIMIT) -> Tuple[str, int]:
+        """
+        Склеивает голову очереди в один текст не длиннее limit. Возвращает (текст, сколько элементов
+        снять с очереди). Слишком длинное одиночное сообщение режется по последнему переводу строки
+        (нет его — ровно по limit): 0 — отправлена только его часть.
+        """
+        first = queue[0]
+        if len(first) > limit:
+            return first[:first.rfind("\n", 1, limit) + 1 or limit], 0
+        parts = [first]
+        size = len(first)
+        for text in queue[1:]:
+            size += len(cls.SEPARATOR) + len(text)
+            if size > limit:
+                break
+            parts.append(text)
+        return cls.SEPARATOR.join(parts), len(parts)
+
+    async def _sender_loop(self, chat_id: Any, sender: _ChatSender):
+        while True:
+            await sender.wake.wait()
+            sender.wake.clear()
+            queue = self.context.queues_msg.get(chat_id)
+            while queue:
+                await sender.bucket.acquire()
+                await self.global_bucket.acquire()
+                # HTML-теги не переживают разрез: разрезанное сообщение уходит целиком простым текстом
+                plain = sender.cut or len(queue[0]) > TG_MESSAGE_LIMIT
+                text, count = self.coalesce(queue[:1] if plain else queue)
+                status = await self._send_message(chat_id, text, sender, parse_mode=None if plain else "HTML")
+                if status == SEND_RETRY:
+                    continue
+                if status == SEND_DROP and queue:
+                    sender.dropped += max(count, 1)
+                # пока ждали Telegram, в хвост могли докинуть новое — снимаем только отправленное
+                if count:
+                    del queue[:count]
+                elif queue:
+                    queue[0] = queue[0][len(text):]
+                sender.cut = not count and bool(queue)
+            if sender.dropped:
                 self.info_handler.debug_error_notes(
-                    f"[TG SEND][{chat_id}] Network error: {e}. Retrying in {wait:.1f}s", is_print=True
+                    f"[TG SEND][{chat_id}] {sender.dropped} messages dropped (queue overflow / send errors)", is_print=True
                 )
-                await asyncio.sleep(wait)
+                sender.dropped = 0
+
+    async def send_report_batches(self, chat_id: Any, batch_size: int = 1):
+        """Совместимость: очередь чата и так разбирает его задача-отправитель — только будим её."""
+        if self.context.queues_msg.get(chat_id):
+            self.enqueue(chat_id)
+
+    async def _send_message(self, chat_id: Any, text: str, sender: _ChatSender, parse_mode: Optional[str] = "HTML") -> str:
+        """Одна попытка отправки (сетевые ошибки — до TG_SEND_RETRIES с backoff). SEND_RETRY — повторить после RetryAfter."""
+        for attempt in range(1, TG_SEND_RETRIES + 1):
+            try:
+                await self.bot.send_message(chat_id, text, parse_mode=parse_mode)
+                return SEND_OK
             except TelegramRetryAfter as e:
-                wait = int(getattr(e, "retry_after", 5))
+                wait = float(getattr(e, "retry_after", 5) or 5)
+                self.info_handler.debug_error_notes(
+                    f"[TG SEND][{chat_id}] Rate limit. Waiting {wait:.0f}s", is_print=True
+                )
+                sender.bucket.penalize()
+                await asyncio.sleep(wait)  # ждёт только этот чат
+                return SEND_RETRY
+            except TelegramNetworkError as e:
+                if attempt == TG_SEND_RETRIES:
+                    break
+                wait = backoff_delay(attempt, 1.0, 10.0)
                 self.info_handler.debug_error_notes(
-                    f"[TG SEND][{chat_id}] Rate limit. Waiting {wait}s", is_print=True
+                    f"[TG SEND][{chat_id}] Network error: {e}. Retry {attempt}/{TG_SEND_RETRIES} in {wait:.1f}s", is_print=True
                 )
                 await asyncio.sleep(wait)
             except TelegramForbiddenError:
                 self.info_handler.debug_error_notes(
-                    f"[TG SEND][{chat_id}] Bot is blocked by user. Stopping sending.", is_print=True
+                    f"[TG SEND][{chat_id}] Bot is blocked by user. Dropping queue.", is_print=True
                 )
-                return None
+                queue = self.context.queues_msg.get(chat_id)
+                if queue:
+                    sender.dropped += len(queue)
+                    queue.clear()
+                return SEND_DROP
             except TelegramAPIError as e:
                 self.info_handler.debug_error_notes(
-                    f"[TG SEND][{chat_id}] API error: {e}. Exit loop.", is_print=True
+                    f"[TG SEND][{chat_id}] API error: {e}. Message dropped.", is_print=True
                 )
-                return None
+                return SEND_DROP
             except Exception as e:
                 self.info_handler.debug_error_notes(
-                    f"[TG SEND][{chat_id}] Unexpected error: {e}. Exit loop.", is_print=True
+                    f"[TG SEND][{chat_id}] Unexpected error: {e}. Message dropped.", is_print=True
                 )
-                return None
\ No newline at end of file
+                return SEND_DROP
+        self.info_handler.debug_error_notes(
+            f"[TG SEND][{chat_id}] Network error persists after {TG_SEND_RETRIES} attempts. Message dropped.", is_print=True
+        )
+        return SEND_DROP
+
+    def pending(self) -> int:
+        return sum(len(self.context.queues_msg.get(chat_id) or ()) for chat_id in self._senders)
+
+    async def stop(self, timeout: float = TG_STOP_TIMEOUT):
+        """Даёт отправителям дослать очереди (не дольше timeout) и гасит задачи."""
+        deadline = time.monotonic() + timeout
+        while self.pending() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for sender in self._senders.values():
+            if sender.task:
+                sender.task.cancel()
+                try:
+                    await sender.task
+                except asyncio.CancelledError:
+                    pass
+                sender.task = None
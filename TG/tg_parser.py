@@ -1,9 +1,10 @@
 from a_config import *
 from b_context import BotContext
 from c_log import ErrorHandler, log_time
+from c_cache import TTLCache
 from typing import *
 import re
-from typing import Optional, Tuple, Set
+from typing import Optional, Tuple
 from aiogram import Dispatcher, types
 
 
@@ -122,7 +123,10 @@ class TgBotWatcherAiogram(TgParser):
         self.channel_id = channel_id
         self.message_cache = context.message_cache
         self.stop_bot = context.stop_bot
-        self._seen_messages: Set[int] = set()
+        self._seen_messages = TTLCache(maxsize=SIGNAL_CACHE_MAXSIZE, ttl=SIGNAL_CACHE_TTL)
+        # приёмник сообщений конвейера сигналов: async on_message((text, ts_ms)).
+        # Пока не задан — сообщения копятся в message_cache
+        self.on_message: Optional[Callable[[Tuple[str, int]], Awaitable]] = None
 
     def register_handler(self, tag: str, max_cache: int = 20):
         """
@@ -153,12 +157,14 @@ class TgBotWatcherAiogram(TgParser):
                     return
 
                 self._seen_messages.add(ts_ms)
+                if self.on_message is not None:
+                    await self.on_message((message.text, ts_ms))
+                    return
                 self.message_cache.append((message.text, ts_ms))
 
-                # Обрезаем кэш
+                # Обрезаем кэш (на месте — список общий с context.message_cache)
                 if len(self.message_cache) > max_cache:
-                    self.message_cache = self.message_cache[-max_cache:]
-                    self._seen_messages.clear()
+                    del self.message_cache[:-max_cache]
 
                 # print(f"[WATCHER] Новое сообщение с тегом {tag}: {message.text}")
 
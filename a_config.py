@@ -19,10 +19,74 @@ PING_INTERVAL: float = 10 # sec
 
 # --- SYSTEM ---
 TG_UPDATE_FREQUENCY: float = 1 # sec ---- частота запросов к тг при парсинге
+TG_CHAT_RATE: float = 1 # msg/sec --- лимит Telegram на один чат
+TG_CHAT_BURST: float = 3 # ------------- всплеск сообщений в один чат
+TG_GLOBAL_RATE: float = 25 # msg/sec --- общий лимит бота (у Telegram ~30/сек, держим запас)
+TG_MESSAGE_LIMIT: int = 4096 # --------- символов в одном сообщении (очередь склеивается до этого размера)
+TG_SEND_RETRIES: int = 3 # ------------- попыток при сетевой ошибке, дальше сообщение отбрасывается
+TG_CHAT_QUEUE_LIMIT: int = 500 # -------- сообщений в очереди чата, сверх — старые отбрасываются
+TG_STOP_TIMEOUT: float = 5 # sec --- дослать очереди при остановке
 POSITIONS_UPDATE_FREQUENCY: float = 1 # sec --- частота обновления данных позиции
 MAIN_CYCLE_FREQUENCY: float = 1 # sec  ---- частота главного цикла
 SIGNAL_PROCESSING_LIMIT: int = 10 # --------- ограничивает количество одновременной обработки сигналов
+SIGNAL_CACHE_TTL: float = 3600 # sec --- сколько помним ключи сигналов (дедуп, замки), должно быть > order_timeout
+SIGNAL_CACHE_MAXSIZE: int = 10000 # ------ жесткий потолок записей в кэшах сигналов
+PIPELINE_QUEUE_SIZE: int = 100 # ------------ емкость очереди каждой стадии конвейера сигналов
+ACCOUNT_SIGNAL_WORKERS: int = 4 # ---------- одновременных сигналов на один аккаунт
+ACCOUNT_SIGNAL_QUEUE_SIZE: int = 100 # ------ очередь сигналов аккаунта (переполнена — сигнал аккаунту не уходит)
+SIGNAL_STARTUP_TIMEOUT: float = 30 # sec --- сколько сигнал ждёт старта (инструменты, первая сверка позиций), потом отбрасывается
+SHARD_WORKERS: int = 0 # ------------------ процессов под аккаунты (0 -- все аккаунты в главном процессе)
+SHARD_HEALTH_INTERVAL: float = 5 # sec --- как часто шард шлёт отчёт о здоровье
+SHARD_REPORT_INTERVAL: float = 60 # sec --- как часто родитель печатает сводку по шардам
+SHARD_STOP_TIMEOUT: float = 10 # sec --- ждём завершения шарда, дальше terminate
 PING_UPDATE_INTERVAL: int = 10 # sec --- через сколько обновляем сессию
+POSITIONS_RECONCILE_FREQUENCY: float = 30 # sec --- REST-сверка позиций, пока жив приватный WS
+PNL_LOOKUP_ATTEMPTS: int = 7 # ----------- сколько раз догружаем историю позиций, пока не появится закрытие
+PNL_LEDGER_BACKFILL: float = 86400 # sec --- глубина первичной загрузки журнала закрытых позиций
+PNL_FILLS_WAIT: float = 2 # sec --- ждём закрывающие fill-ы после пуша о закрытии позиции
+PNL_RECONCILE_DELAY: float = 60 # sec --- через сколько сверяем PnL из fill-ов с историей позиций
+CLOSE_REPORT_WORKERS: int = 4 # ---------- параллельных отчётов о закрытии (вне цикла синхронизации)
+CLOSE_REPORT_QUEUE_SIZE: int = 1000 # ------ очередь отчётов о закрытии
+INSTRUMENTS_REFRESH_FREQUENCY: float = 300 # sec --- фоновое обновление листинга инструментов
+MARKET_SNAPSHOT_PATH: str = "market_snapshot.json" # --- снимок инструментов и цен для быстрого старта
+MARKET_SNAPSHOT_TTL: float = 86400 # sec --- старше — снимок игнорируется, грузим с биржи
+MARKET_HUB_NAME: str = "" # ---------------- сегмент общей памяти хаба рыночных данных (python c_market_hub.py); "" -- без хаба
+MARKET_HUB_CAPACITY: int = 4096 # --------- слотов инструментов в сегменте
+MARKET_HUB_HEARTBEAT: float = 1 # sec --- как часто хаб отмечается в сегменте
+MARKET_HUB_MAX_SILENCE: float = 10 # sec --- хаб молчит дольше — бот берёт цены по REST
+MARKET_HUB_POLL_INTERVAL: float = 10 # sec --- как часто бот сверяет реестр инструментов с хабом
+MARKET_HUB_REATTACH_INTERVAL: float = 5 # sec --- хаб молчит — как часто пробуем переподключиться к (пересозданному) сегменту
+
+# --- LOGS ---
+LOG_LEVEL: str = "INFO" # ------------------ DEBUG | INFO | WARNING | ERROR -- ниже уровня не пишем
+LOG_DIR: str = "logs" # -------------------- каталог файлов лога (JSON lines, по файлу на процесс)
+LOG_MAX_BYTES: int = 10 * 1024 * 1024 # ---- размер файла, после которого ротация
+LOG_BACKUPS: int = 5 # --------------------- сколько старых файлов хранить
+LOG_RING_SIZE: int = 20000 # --------------- записей в кольцевом буфере (переполнен -- старые теряются, горячий путь не ждёт)
+LOG_FLUSH_INTERVAL: float = 0.2 # sec --- как часто фоновый поток разбирает буфер
+LOG_CONSOLE: bool = True # ----------------- дублировать записи в консоль (тоже из фонового потока)
+LOG_SAMPLING: dict = {} # ------------------ категория -> доля сохраняемых записей 0..1, напр. {"DEBUG": 0.1}; ошибки не сэмплируются
+
+# --- REST RETRY POLICY ---
+REQUEST_DEFAULT_BUDGET: float = 30 # sec --- бюджет запроса с ретраями, если не задан deadline
+REQUEST_ATTEMPT_TIMEOUT: float = 10 # sec --- таймаут одной попытки
+REQUEST_BACKOFF_BASE: float = 0.2 # sec --- база экспоненциальной задержки
+REQUEST_BACKOFF_CAP: float = 5 # sec --- потолок задержки между попытками
+BREAKER_FAILURE_THRESHOLD: int = 5 # ------ ошибок подряд до размыкания предохранителя endpoint-а
+BREAKER_RESET_TIMEOUT: float = 10 # sec --- через сколько пробуем снова
+ORDER_TIMER_TICK: float = 0.1 # sec --- шаг колеса таймаутов ордеров
+ORDER_TIMER_SLOTS: int = 1024 # --------- слотов в колесе (tick * slots — один оборот)
+HEDGE_ORDER_DELAY_MS: int = 0 # ms --- нет ack за это время — дублируем ордер по второй сессии (0 -- выкл)
+
+# --- WEBSOCKET ---
+OKX_WS_PUBLIC_URL: str = "wss://ws.okx.com:8443/ws/v5/public"
+OKX_WS_PRIVATE_URL: str = "wss://ws.okx.com:8443/ws/v5/private"
+WS_PING_INTERVAL: float = 20 # sec --- OKX рвет соединение после 30 сек тишины
+WS_RECONNECT_DELAY: float = 1 # sec --- стартовая задержка реконнекта
+WS_RECONNECT_MAX_DELAY: float = 30 # sec --- потолок задержки реконнекта
+WS_SUBSCRIBE_BATCH: int = 100 # --------- сколько каналов в одном запросе subscribe
+WS_REQUEST_TIMEOUT: float = 2 # sec --- ждем ответ на торговый op по WS, дальше fallback в REST
+PRICE_MAX_AGE: float = 5 # sec --- цена старше считается устаревшей (идем в REST)
 
 # --- STYLES ---
 HEAD_WIDTH: int = 35
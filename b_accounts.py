@@ -0,0 +1,175 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from a_config import (
+    OKX_WS_PRIVATE_URL, POSITIONS_UPDATE_FREQUENCY, POSITIONS_RECONCILE_FREQUENCY,
+    ACCOUNT_SIGNAL_WORKERS, ACCOUNT_SIGNAL_QUEUE_SIZE
+)
+from b_context import BotContext, AccountContext
+from b_constructor import PositionVarsSetup
+from b_network import NetworkManager
+from c_log import ErrorHandler
+from c_events import OrderEventBus
+from c_pipeline import SignalPipeline
+from c_sync import Synchronizer
+from API.OKX.okx import OkxFuturesClient
+from API.OKX.okx_ws import OkxPrivateWs
+from API.OKX.okx_limits import OkxRateLimiter
+
+
+class TradingAccount:
+    """
+    Контекст исполнения одного аккаунта: свой пул сессий, REST-клиент (кэш плеча, журнал PnL),
+    приватный WS, позиции, синхронизатор и очередь сигналов с ограниченным числом воркеров.
+    Аккаунты не делят между собой ничего, кроме общего лимитера (публичные лимиты считаются по IP).
+    """
+
+    def __init__(
+        self,
+        root: BotContext,
+        info_handler: ErrorHandler,
+        chat_id: Any,
+        rate_limiter: OkxRateLimiter,
+        pnl_report: Callable,
+        format_message: Callable,
+        on_order_event: Callable[[Any, Any], None],
+        execute: Callable[[dict], Awaitable],
+    ):
+        info_handler.wrap_foreign_methods(self)
+        self.info_handler = info_handler
+        self.chat_id = chat_id
+        self.context = AccountContext(root, chat_id)
+
+        okx_cfg = root.users_configs[chat_id].get("config", {}).get("OKX", {})
+
+        self.connector = NetworkManager(context=self.context, info_handler=info_handler)
+        self.okx_client = OkxFuturesClient(
+            api_key=okx_cfg.get("api_key"),
+            api_secret=okx_cfg.get("api_secret"),
+            api_passphrase=okx_cfg.get("api_passphrase"),
+            context=self.context,
+            info_handler=info_handler,
+            rate_limiter=rate_limiter
+        )
+        self.private_ws = OkxPrivateWs(
+            api_key=okx_cfg.get("api_key"),
+            api_secret=okx_cfg.get("api_secret"),
+            api_passphrase=okx_cfg.get("api_passphrase"),
+            url=OKX_WS_PRIVATE_URL,
+            context=self.context,
+            info_handler=info_handler
+        )
+        # ордера и отмены идут через этот же залогиненный сокет (fallback — REST)
+        self.okx_client.ws_trade = self.private_ws
+
+        self.pos_setup = PositionVarsSetup(context=self.context, info_handler=info_handler)
+
+        self.order_events = OrderEventBus()
+        self.order_events.subscribe(lambda event: on_order_event(chat_id, event))
+
+        self.sync = Synchronizer(
+            context=self.context,
+            info_handler=info_handler,
+            set_pos_defaults=self.pos_setup.set_pos_defaults,
+            pnl_report=pnl_report,
+            okx_client=self.okx_client,
+            format_message=format_message,
+            positions_update_frequency=POSITIONS_UPDATE_FREQUENCY,
+            chat_id=chat_id,
+            positions_stream=self.private_ws,
+            reconcile_frequency=POSITIONS_RECONCILE_FREQUENCY,
+            event_bus=self.order_events
+        )
+
+        # свои воркеры на аккаунт: медленный аккаунт не задерживает сигналы остальных
+        self.signals = SignalPipeline(
+            info_handler=info_handler,
+            stages=[("execute", execute, ACCOUNT_SIGNAL_WORKERS)],
+            queue_size=ACCOUNT_SIGNAL_QUEUE_SIZE
+        )
+
+        self.positions_task: Optional[asyncio.Task] = None
+        self.leverage_task: Optional[asyncio.Task] = None
+        root.accounts[chat_id] = self.context
+
+    def fin_settings(self) -> Dict[str, Any]:
+        return self.context.users_configs[self.chat_id]["config"]["fin_settings"]
+
+    def margin_mode(self) -> str:
+        int_margin_mode = self.fin_settings().get("margin_mode", 1)
+        return "isolated" if int_margin_mode == 1 else "cross"
+
+    def dispatch(self, job: dict) -> bool:
+        """Сигнал в очередь аккаунта без ожидания. False — очередь переполнена."""
+        return self.signals.try_submit(job)
+
+    async def start_private_ws(self) -> None:
+        await self.private_ws.subscribe([
+            {"channel": "positions", "instType": "SWAP"},
+            {"channel": "orders", "instType": "SWAP"},
+        ])
+        self.private_ws.start()
+        self.signals.start()
+
+    async def start_positions(self) -> None:
+        """Готово, когда прошла первая сверка позиций (или цикл позиций завершился — стоп)."""
+        self.positions_task = asyncio.create_task(self.sync.refresh_positions_task())
+        first_update = asyncio.create_task(self.sync.first_update.wait())
+        try:
+            await asyncio.wait({first_update, self.positions_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            first_update.cancel()
+
+    def start_leverage_seed(self, inst_ids: List[str]) -> None:
+        """Кэш плеча из leverage-info — фоном (промах = обычный set_leverage)."""
+        self.leverage_task = asyncio.create_task(self._seed_leverage(inst_ids))
+
+    async def _seed_leverage(self, inst_ids: List[str]) -> None:
+        try:
+            margin_mode = self.margin_mode()
+            count = await self.okx_client.seed_leverage(self.context.session, inst_ids, margin_mode)
+            self.info_handler.debug_info_notes(f"[leverage] cache seeded for {self.chat_id}: {count} entries ({margin_mode})")
+        except Exception as e:
+            self.info_handler.debug_error_notes(f"[ERROR] leverage seed {self.chat_id}: {e}", is_print=True)
+
+    async def stop(self, debug: bool = True) -> None:
+        """Гасит задачи и соединения аккаунта."""
+        if self.positions_task:
+            self.positions_task.cancel()
+            try:
+                await self.positions_task
+            except asyncio.CancelledError:
+                if debug:
+                    print(f"[CORE] positions_flow_manager {self.chat_id} cancelled")
+            self.positions_task = None
+
+        # --- Очередь отчётов о закрытии ---
+        await self.sync.stop_reporting()
+
+        if self.leverage_task:
+            self.leverage_task.cancel()
+            try:
+                await self.leverage_task
+            except asyncio.CancelledError:
+                pass
+            self.leverage_task = None
+
+        await self.signals.stop()
+        self.order_events.close()
+
+        try:
+            await asyncio.wait_for(self.private_ws.stop(), timeout=5)
+        except Exception as e:
+            if debug:
+                print(f"[CORE] private_ws.stop() {self.chat_id} error: {e}")
+
+        try:
+            await asyncio.wait_for(self.connector.shutdown_session(), timeout=5)
+        except Exception as e:
+            if debug:
+                print(f"[CORE] connector.shutdown_session() {self.chat_id} error: {e}")
+        finally:
+            self.context.session = None
+            self.context.hedge_session = None
+
+        self.context.position_vars.clear()
+        self.context.root.accounts.pop(self.chat_id, None)
@@ -1,22 +1,59 @@
 import asyncio
 import aiohttp
-from typing import Optional
+from typing import Any, Dict, Optional
+from a_config import SIGNAL_CACHE_TTL, SIGNAL_CACHE_MAXSIZE
+from c_cache import TTLCache
+from c_log import get_log_writer, WARNING
+from c_state import SymbolState, any_in_position
 
 class BotContext:
     def __init__(self):
         """ Инициализируем глобальные структуры"""
         # //
         self.message_cache: list = []  # основной кеш сообщений
-        self.tg_timing_cache = set()
+        self.tg_timing_cache = TTLCache(maxsize=SIGNAL_CACHE_MAXSIZE, ttl=SIGNAL_CACHE_TTL)  # дедуп msg_key
         self.stop_bot = False
         self.start_bot_iteration = False
         self.stop_bot_iteration = False
         # //
         self.users_configs: dict = {}
         self.instruments_data: dict = None
-        self.prices: dict = None
+        self.prices: dict = {}
+        self.prices_ts: dict = {}
         self.queues_msg: dict = {}
-        self.position_vars: dict = {}
+        self.accounts: Dict[Any, "AccountContext"] = {}  # chat_id -> срез контекста торгующего аккаунта
+        self.shards_in_position: Dict[int, bool] = {}  # shard_id -> есть позиции (из отчётов процессов-шардов)
         self.report_list: list = []
         self.session: Optional[aiohttp.ClientSession] = None
-        self.signal_locks: dict = {}
\ No newline at end of file
+        self.hedge_session: Optional[aiohttp.ClientSession] = None  # второй пул соединений под хедж-запросы
+        self.signal_locks = TTLCache(maxsize=SIGNAL_CACHE_MAXSIZE, ttl=SIGNAL_CACHE_TTL, on_evict=self._on_lock_evict)
+
+    def any_in_position(self) -> bool:
+        if any(self.shards_in_position.values()):
+            return True
+        return any(any_in_position(account.position_vars) for account in self.accounts.values())
+
+    @staticmethod
+    def _on_lock_evict(msg_key, lock: asyncio.Lock, reason: str):
+        if lock.locked():
+            get_log_writer().emit(WARNING, f"[BotContext] signal lock {msg_key} evicted while held ({reason})")
+
+
+class AccountContext:
+    """
+    Срез контекста на один аккаунт: свои сессии (пул соединений) и позиции.
+    Флаги итерации, цены, конфиги и кэши сигналов читаются из общего BotContext.
+    """
+
+    def __init__(self, root: BotContext, chat_id: Any):
+        self.root = root
+        self.chat_id = chat_id
+        self.position_vars: Dict[str, SymbolState] = {}
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.hedge_session: Optional[aiohttp.ClientSession] = None
+
+    def __getattr__(self, name: str):
+        # вызывается только для атрибутов, которых нет у среза
+        if name == "root":
+            raise AttributeError(name)
+        return getattr(self.root, name)
@@ -13,18 +13,23 @@ class NetworkManager:
         self._ping_task: asyncio.Task | None = None
         self.proxy_url = proxy_url
 
+    def _new_session(self) -> aiohttp.ClientSession:
+        # Если прокси задан — используем connector с ним
+        if self.proxy_url:
+            connector = aiohttp.TCPConnector(ssl=False)  # отключаем SSL проверки, если нужно
+            return aiohttp.ClientSession(
+                connector=connector,
+                trust_env=False,  # игнорировать системные прокси
+                proxy=self.proxy_url
+            )
+        return aiohttp.ClientSession()
+
     async def initialize_session(self):
         if not self.context.session or self.context.session.closed:
-            # Если прокси задан — используем connector с ним
-            if self.proxy_url:
-                connector = aiohttp.TCPConnector(ssl=False)  # отключаем SSL проверки, если нужно
-                self.context.session = aiohttp.ClientSession(
-                    connector=connector,
-                    trust_env=False,  # игнорировать системные прокси
-                    proxy=self.proxy_url
-                )
-            else:
-                self.context.session = aiohttp.ClientSession()
+            self.context.session = self._new_session()
+        # отдельная сессия (свой пул соединений) для хедж-отправки ордеров
+        if not self.context.hedge_session or self.context.hedge_session.closed:
+            self.context.hedge_session = self._new_session()
 
     async def _ping_once(self) -> bool:
         """Пинг для проверки живости сессии."""
@@ -66,8 +71,9 @@ class NetworkManager:
                 await self._ping_task
             except asyncio.CancelledError:
                 pass
-        if self.context.session and not self.context.session.closed:
-            try:
-                await self.context.session.close()
-            except Exception as e:
-                self.info_handler.debug_error_notes(f"Ошибка при закрытии сессии: {e}")
\ No newline at end of file
+        for session in (self.context.session, self.context.hedge_session):
+            if session and not session.closed:
+                try:
+                    await session.close()
+                except Exception as e:
+                    self.info_handler.debug_error_notes(f"Ошибка при закрытии сессии: {e}")
\ No newline at end of file
@@ -0,0 +1,113 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Компактный TTL + LRU контейнер на OrderedDict.
+    Вставка / поиск / удаление — O(1). TTL единый, поэтому порядок записей совпадает с порядком
+    истечения: просроченные снимаются с головы (амортизированно O(1)), при переполнении maxsize
+    вытесняется самая давняя запись. on_evict(key, value, reason) вызывается на каждое вытеснение
+    (reason: "expired" | "capacity").
+    """
+
+    __slots__ = ("maxsize", "ttl", "on_evict", "_data", "hits", "misses", "expired", "evicted")
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        on_evict: Optional[Callable[[Hashable, Any, str], None]] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data: "OrderedDict[Hashable, list]" = OrderedDict()  # key -> [expires_at, value]
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _evict(self, key: Hashable, value: Any, reason: str) -> None:
+        if reason == "expired":
+            self.expired += 1
+        else:
+            self.evicted += 1
+        if self.on_evict is not None:
+            self.on_evict(key, value, reason)
+
+    def purge(self, now: Optional[float] = None) -> None:
+        """Снимает просроченные записи с головы."""
+        now = time.monotonic() if now is None else now
+        data = self._data
+        while data:
+            key, entry = next(iter(data.items()))
+            if entry[0] > now:
+                break
+            data.popitem(last=False)
+            self._evict(key, entry[1], "expired")
+
+    def set(self, key: Hashable, value: Any = True) -> None:
+        now = time.monotonic()
+        self.purge(now)
+        data = self._data
+        if key in data:
+            data.move_to_end(key)
+        data[key] = [now + self.ttl, value]
+        while len(data) > self.maxsize:
+            old_key, entry = data.popitem(last=False)
+            self._evict(old_key, entry[1], "capacity")
+
+    def add(self, key: Hashable) -> None:
+        """Совместимость с set(): cache.add(key)."""
+        self.set(key, True)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Поиск с LRU-обновлением (запись переезжает в хвост, TTL продлевается)."""
+        now = time.monotonic()
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING or entry[0] <= now:
+            self.misses += 1
+            self.purge(now)
+            return default
+        self.hits += 1
+        entry[0] = now + self.ttl
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key, _MISSING)
+        return entry is not _MISSING and entry[0] > time.monotonic()
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.set(key, value)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def metrics(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+# --- Типы событий ордера / позиции ---
+EVENT_PARTIAL = "partially_filled"
+EVENT_FILLED = "filled"
+EVENT_CANCELED = "canceled"
+EVENT_CLOSED = "closed"
+
+# state из WS канала orders -> тип события
+OKX_ORDER_STATES = {
+    "partially_filled": EVENT_PARTIAL,
+    "filled": EVENT_FILLED,
+    "canceled": EVENT_CANCELED,
+    "mmp_canceled": EVENT_CANCELED,
+}
+
+
+class OrderEvent:
+    __slots__ = ("kind", "symbol", "pos_side", "data", "ts")
+
+    def __init__(self, kind: str, symbol: str, pos_side: str, data: Optional[dict] = None):
+        self.kind = kind
+        self.symbol = symbol
+        self.pos_side = pos_side
+        self.data = data or {}
+        self.ts = int(time.time() * 1000)
+
+    def __repr__(self) -> str:
+        return f"OrderEvent({self.kind}, {self.symbol}, {self.pos_side})"
+
+
+class OrderEventBus:
+    """
+    Шина событий ордеров/позиций по ключу (symbol, pos_side).
+    Публикуют Synchronizer (позиции) и WS канал orders; ожидающие получают событие сразу,
+    без опроса. Подписчики (subscribe) получают все события синхронно.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[Tuple[str, str], List[Tuple[frozenset, Optional[Callable], asyncio.Future]]] = {}
+        self._subscribers: List[Callable[[OrderEvent], None]] = []
+
+    def subscribe(self, callback: Callable[[OrderEvent], None]) -> None:
+        self._subscribers.append(callback)
+
+    def publish(self, kind: str, symbol: str, pos_side: str, data: Optional[dict] = None) -> OrderEvent:
+        event = OrderEvent(kind, symbol, pos_side, data)
+        key = (symbol, pos_side)
+        waiters = self._waiters.get(key)
+        if waiters:
+            keep = []
+            for kinds, match, fut in waiters:
+                if fut.done():
+                    continue
+                if event.kind in kinds and (match is None or match(event)):
+                    fut.set_result(event)
+                else:
+                    keep.append((kinds, match, fut))
+            if keep:
+                self._waiters[key] = keep
+            else:
+                del self._waiters[key]
+        for callback in self._subscribers:
+            callback(event)
+        return event
+
+    async def wait_for(
+        self,
+        symbol: str,
+        pos_side: str,
+        kinds: Iterable[str],
+        timeout: Optional[float] = None,
+        match: Optional[Callable[[OrderEvent], bool]] = None
+    ) -> Optional[OrderEvent]:
+        """Ждёт первое событие из kinds по (symbol, pos_side). None — таймаут или закрытие шины."""
+        key = (symbol, pos_side)
+        entry = (frozenset(kinds), match, asyncio.get_running_loop().create_future())
+        self._waiters.setdefault(key, []).append(entry)
+        try:
+            return await asyncio.wait_for(entry[2], timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = self._waiters.get(key)
+            if waiters and entry in waiters:
+                waiters.remove(entry)
+                if not waiters:
+                    del self._waiters[key]
+
+    def close(self) -> None:
+        """Будит всех ожидающих (None) — при остановке итерации."""
+        for waiters in self._waiters.values():
+            for _, _, fut in waiters:
+                if not fut.done():
+                    fut.set_result(None)
+        self._waiters.clear()
+
+    def pending(self) -> int:
+        return sum(1 for waiters in self._waiters.values() for _, _, fut in waiters if not fut.done())
@@ -0,0 +1,274 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+from c_log import ErrorHandler
+
+
+# --- События изменения инструментов ---
+INSTRUMENT_ADDED = "added"
+INSTRUMENT_CHANGED = "changed"
+INSTRUMENT_SUSPENDED = "suspended"
+INSTRUMENT_DELISTED = "delisted"
+
+# поля, изменение которых влияет на расчет ордера (instIdCode — на ордер через приватный WS)
+SPEC_TRACKED_FIELDS = ("inst_id_code", "ctVal", "lotSz", "tickSz", "minSz", "max_leverage", "state")
+
+
+def count_precision(value_str: str) -> int:
+    """Количество знаков после точки в шаге ("0.001" -> 3)."""
+    value_str = str(value_str)
+    return len(value_str.split(".")[1]) if "." in value_str else 0
+
+
+class InstrumentSpec:
+    """
+    Компактная спецификация инструмента OKX: только поля, нужные для расчёта и округления ордеров.
+    """
+
+    __slots__ = (
+        "inst_id", "inst_id_code", "ctVal", "lotSz", "tickSz", "minSz",
+        "max_leverage", "state", "contract_precision", "price_precision",
+    )
+
+    def __init__(
+        self,
+        inst_id: str,
+        inst_id_code: Optional[int],
+        ctVal: float,
+        lotSz: float,
+        tickSz: float,
+        minSz: float,
+        max_leverage: Optional[int],
+        state: str,
+        contract_precision: int,
+        price_precision: int,
+    ):
+        self.inst_id = inst_id
+        self.inst_id_code = inst_id_code
+        self.ctVal = ctVal
+        self.lotSz = lotSz
+        self.tickSz = tickSz
+        self.minSz = minSz
+        self.max_leverage = max_leverage
+        self.state = state
+        self.contract_precision = contract_precision
+        self.price_precision = price_precision
+
+    @classmethod
+    def from_raw(cls, info: Dict[str, Any]) -> "InstrumentSpec":
+        """Из сырого словаря /api/v5/public/instruments."""
+        lot_sz_str = str(info.get("lotSz") or "1")
+        tick_sz_str = str(info.get("tickSz") or "1")
+        # пробуем взять плечо
+        max_leverage = (
+            info.get("lever") or
+            info.get("maxLeverage") or
+            info.get("leverUp")  # иногда в разных режимах так называется
+        )
+        inst_id_code = info.get("instIdCode")
+        return cls(
+            inst_id=info.get("instId"),
+            inst_id_code=int(inst_id_code) if inst_id_code not in (None, "") else None,
+            ctVal=float(info.get("ctVal") or 1),
+            lotSz=float(lot_sz_str),
+            tickSz=float(tick_sz_str),
+            minSz=float(info.get("minSz") or lot_sz_str),
+            max_leverage=int(float(max_leverage)) if max_leverage else None,
+            state=str(info.get("state") or ""),
+            contract_precision=count_precision(lot_sz_str),
+            price_precision=count_precision(tick_sz_str),
+        )
+
+    def is_complete(self) -> bool:
+        """Есть всё, что нужно для выставления ордера."""
+        return all(getattr(self, name) is not None for name in self.__slots__ if name != "inst_id_code")
+
+    def is_tradable(self) -> bool:
+        return self.state == "live"
+
+    def update_from(self, other: "InstrumentSpec") -> List[str]:
+        """Переносит поля other на месте (ссылки в position_vars остаются валидны). Возвращает изменённые поля."""
+        changed = [name for name in SPEC_TRACKED_FIELDS if getattr(self, name) != getattr(other, name)]
+        if changed:
+            for name in self.__slots__:
+                setattr(self, name, getattr(other, name))
+        return changed
+
+    def as_tuple(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"InstrumentSpec({self.inst_id}, ctVal={self.ctVal}, lotSz={self.lotSz}, tickSz={self.tickSz}, state={self.state})"
+
+
+class InstrumentChange:
+    __slots__ = ("kind", "inst_id", "spec", "fields")
+
+    def __init__(self, kind: str, inst_id: str, spec: InstrumentSpec, fields: tuple = ()):
+        self.kind = kind
+        self.inst_id = inst_id
+        self.spec = spec
+        self.fields = fields
+
+    def __repr__(self) -> str:
+        return f"InstrumentChange({self.kind}, {self.inst_id}, {self.fields})"
+
+
+class InstrumentRegistry:
+    """
+    Реестр инструментов: O(1) поиск по instId и instIdCode.
+    Строится один раз из ответа get_instruments и хранит только InstrumentSpec.
+    """
+
+    def __init__(self, specs: Iterable[InstrumentSpec] = ()):
+        self._by_id: Dict[str, InstrumentSpec] = {}
+        self._by_code: Dict[int, InstrumentSpec] = {}
+        for spec in specs:
+            self._put(spec)
+
+    @staticmethod
+    def parse_raw(raw: Optional[List[Dict[str, Any]]]) -> List[InstrumentSpec]:
+        specs = []
+        for info in raw or []:
+            if not info.get("instId"):
+                continue
+            try:
+                specs.append(InstrumentSpec.from_raw(info))
+            except (TypeError, ValueError):
+                continue
+        return specs
+
+    @classmethod
+    def from_raw(cls, raw: Optional[List[Dict[str, Any]]]) -> "InstrumentRegistry":
+        return cls(cls.parse_raw(raw))
+
+    def apply(self, specs: Iterable[InstrumentSpec]) -> List[InstrumentChange]:
+        """
+        Сверяет свежий список с реестром и применяет только отличия.
+        Изменённые спеки обновляются на месте; пропавшие из листинга помечаются delisted (не удаляются,
+        чтобы открытые позиции по ним не потеряли спецификацию).
+        """
+        changes: List[InstrumentChange] = []
+        seen = set()
+        for fresh in specs:
+            seen.add(fresh.inst_id)
+            current = self._by_id.get(fresh.inst_id)
+            if current is None:
+                self._put(fresh)
+                changes.append(InstrumentChange(INSTRUMENT_ADDED, fresh.inst_id, fresh))
+                continue
+            was_tradable = current.is_tradable()
+            old_code = current.inst_id_code
+            fields = current.update_from(fresh)
+            if not fields:
+                continue
+            if old_code != current.inst_id_code:
+                self._by_code.pop(old_code, None)
+                self._put(current)
+            kind = INSTRUMENT_SUSPENDED if was_tradable and not current.is_tradable() else INSTRUMENT_CHANGED
+            changes.append(InstrumentChange(kind, current.inst_id, current, tuple(fields)))
+
+        for inst_id, current in self._by_id.items():
+            if inst_id not in seen and current.state != INSTRUMENT_DELISTED:
+                current.state = INSTRUMENT_DELISTED
+                changes.append(InstrumentChange(INSTRUMENT_DELISTED, inst_id, current, ("state",)))
+        return changes
+
+    def is_tradable(self, inst_id: str) -> bool:
+        spec = self._by_id.get(inst_id)
+        return spec is not None and spec.is_tradable()
+
+    def _put(self, spec: InstrumentSpec) -> None:
+        self._by_id[spec.inst_id] = spec
+        if spec.inst_id_code is not None:
+            self._by_code[spec.inst_id_code] = spec
+
+    def get(self, inst_id: str) -> Optional[InstrumentSpec]:
+        return self._by_id.get(inst_id)
+
+    def get_by_code(self, inst_id_code: int) -> Optional[InstrumentSpec]:
+        return self._by_code.get(inst_id_code)
+
+    def inst_ids(self) -> List[str]:
+        return list(self._by_id)
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def __contains__(self, inst_id: str) -> bool:
+        return inst_id in self._by_id
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __bool__(self) -> bool:
+        return bool(self._by_id)
+
+
+class InstrumentRefresher:
+    """
+    Фоновое обновление реестра инструментов: раз в interval тянет листинг, применяет дифф
+    и рассылает подписчикам InstrumentChange пачкой. Главный цикл не ждёт запрос.
+    """
+
+    def __init__(
+        self,
+        context,
+        info_handler: ErrorHandler,
+        registry: InstrumentRegistry,
+        fetch: Callable[[], Awaitable[Optional[List[Dict[str, Any]]]]],
+        interval: float = 300.0,
+        parse: Callable[[Any], List[InstrumentSpec]] = InstrumentRegistry.parse_raw,
+    ):
+        info_handler.wrap_foreign_methods(self)
+        self.context = context
+        self.info_handler = info_handler
+        self.registry = registry
+        self.fetch = fetch
+        self.interval = interval
+        self.parse = parse
+        self._subscribers: List[Callable[[List[InstrumentChange]], Any]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.last_changes: List[InstrumentChange] = []
+
+    def subscribe(self, callback: Callable[[List[InstrumentChange]], Any]) -> None:
+        """callback(changes) — обычная функция или корутина."""
+        self._subscribers.append(callback)
+
+    async def refresh_once(self) -> List[InstrumentChange]:
+        raw = await self.fetch()
+        if not raw:
+            self.info_handler.debug_error_notes("[ERROR] Failed to fetch instruments: empty response", is_print=True)
+            return []
+        # разбор нескольких сотен записей — в пуле, чтобы не держать цикл событий
+        specs = await asyncio.to_thread(self.parse, raw)
+        changes = self.registry.apply(specs)
+        self.last_changes = changes
+        if changes:
+            for callback in self._subscribers:
+                result = callback(changes)
+                if asyncio.iscoroutine(result):
+                    await result
+        return changes
+
+    async def _run(self) -> None:
+        while not self.context.stop_bot_iteration and not self.context.stop_bot:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.info_handler.debug_error_notes(f"[ERROR] Failed to refresh instruments: {e}", is_print=True)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
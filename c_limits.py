@@ -0,0 +1,152 @@
+import asyncio
+import heapq
+import random
+import itertools
+import time
+from typing import List, Optional, Tuple
+
+
+# --- Приоритеты ожидания токена (меньше — раньше) ---
+PRIORITY_ORDER: int = 0        # размещение / отмена ордеров
+PRIORITY_DEFAULT: int = 1
+PRIORITY_BACKGROUND: int = 2   # фоновые опросы (позиции, история, инструменты)
+
+
+class TokenBucket:
+    """
+    Token bucket с очередью ожидающих по приоритету.
+    rate — токенов в секунду, capacity — размер всплеска.
+    penalize() временно снижает скорость (при ответах "rate limit"),
+    затем скорость плавно возвращается к базовой.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        penalty_factor: float = 0.5,
+        penalty_cooldown: float = 2.0,
+        min_rate_ratio: float = 0.1,
+    ):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.penalty_factor = penalty_factor
+        self.penalty_cooldown = penalty_cooldown
+        self.min_rate = rate * min_rate_ratio
+
+        self._updated = time.monotonic()
+        self._penalty_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.throttled = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.rate < self.base_rate and now >= self._penalty_until:
+            # восстановление: +25% за каждый период cooldown без новых штрафов
+            self.rate = min(self.base_rate, self.rate * 1.25)
+            self._penalty_until = now + self.penalty_cooldown
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _schedule(self) -> None:
+        if self._timer is not None or not self._waiters:
+            return
+        delay = max(0.0, (1.0 - self.tokens) / self.rate)
+        self._timer = asyncio.get_running_loop().call_later(delay, self._drain)
+
+    def _drain(self) -> None:
+        self._timer = None
+        self._refill()
+        while self._waiters and self.tokens >= 1.0:
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():
+                continue
+            self.tokens -= 1.0
+            fut.set_result(None)
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        self._schedule()
+
+    async def acquire(self, priority: int = PRIORITY_DEFAULT) -> None:
+        """Ждёт токен. Более приоритетные ожидающие обслуживаются первыми."""
+        self._refill()
+        if not self._waiters and self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        self._schedule()
+        await fut
+
+    def penalize(self) -> None:
+        """Биржа ответила "rate limit": обнуляем запас и снижаем скорость."""
+        self._refill()
+        self.throttled += 1
+        self.tokens = 0.0
+        self.rate = max(self.min_rate, self.rate * self.penalty_factor)
+        self._penalty_until = time.monotonic() + self.penalty_cooldown
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Экспоненциальная задержка с полным джиттером: U(0, min(cap, base * 2^(attempt-1)))."""
+    return random.uniform(0.0, min(cap, base * (2 ** max(0, attempt - 1))))
+
+
+class CircuitBreaker:
+    """
+    Предохранитель: после failure_threshold ошибок подряд открывается на reset_timeout секунд
+    и отклоняет запросы сразу. Затем пропускает один пробный запрос (half-open):
+    успех — закрывается, ошибка — снова открывается.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release(self) -> None:
+        """Попытка не состоялась (отмена, дедлайн до отправки): освобождаем пробный слот без вердикта."""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Фиксирует ошибку. True — предохранитель только что сработал."""
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self.trips += 1
+            return True
+        return False
@@ -1,35 +1,242 @@
 from datetime import datetime
 import pytz
+import atexit
 import inspect
+import json
+import multiprocessing as mp
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
 from types import FunctionType, MethodType, BuiltinFunctionType
+from typing import Dict, Optional
 from pprint import pformat
-from a_config import TIME_ZONE
+from a_config import (
+    TIME_ZONE, LOG_LEVEL, LOG_DIR, LOG_MAX_BYTES, LOG_BACKUPS, LOG_RING_SIZE,
+    LOG_FLUSH_INTERVAL, LOG_CONSOLE, LOG_SAMPLING
+)
 import traceback
 
 TZ_LOCATION = pytz.timezone(TIME_ZONE)               
 
-def log_time():
-    now = datetime.now(TZ_LOCATION)
+def log_time(ts: Optional[float] = None):
+    now = datetime.now(TZ_LOCATION) if ts is None else datetime.fromtimestamp(ts, TZ_LOCATION)
     return now.strftime("%Y-%m-%d %H:%M:%S")
 
 
+# --- Уровни ---
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+
+
+def log_category(data: str) -> str:
+    """Категория — первый тег сообщения: "[TG SEND][123] ..." -> "TG SEND"."""
+    if data.startswith("["):
+        end = data.find("]", 1, 40)
+        if end > 0:
+            return data[1:end]
+    return ""
+
+
+class AsyncLogWriter:
+    """
+    Неблокирующий бэкенд логов процесса. Горячий путь только кладёт кортеж в кольцевой буфер
+    (deque с maxlen: append атомарен под GIL — ни блокировок, ни I/O; переполнен — теряются старые записи).
+    Фоновый поток раз в flush_interval разбирает буфер: форматирует, пишет JSON lines в файл
+    с ротацией по размеру и, если включено, в консоль.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        directory: str = LOG_DIR,
+        level: str = LOG_LEVEL,
+        ring_size: int = LOG_RING_SIZE,
+        max_bytes: int = LOG_MAX_BYTES,
+        backups: int = LOG_BACKUPS,
+        flush_interval: float = LOG_FLUSH_INTERVAL,
+        console: bool = LOG_CONSOLE,
+        sampling: Optional[Dict[str, float]] = None,
+    ):
+        self.name = name
+        self.path = os.path.join(directory, f"{name}.jsonl") if directory else None
+        self.level = LEVELS.get(str(level).upper(), INFO)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.console = console
+        self.sampling = dict(LOG_SAMPLING if sampling is None else sampling)
+        self.dropped = 0
+        self.sampled_out = 0
+        self.written = 0
+        self._ring: deque = deque(maxlen=ring_size)
+        self._pid = os.getpid()
+        self._file = None
+        self._size = 0
+        self._reported_dropped = 0
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def emit(self, level: int, message: str, category: Optional[str] = None, console: bool = True) -> None:
+        """Горячий путь: фильтр уровня, сэмплинг категории и append в буфер. Ничего не ждёт."""
+        if level < self.level:
+            return
+        if category is None:
+            category = log_category(message)
+        if level < ERROR and self.sampling:
+            rate = self.sampling.get(category)
+            if rate is not None and random.random() >= rate:
+                self.sampled_out += 1
+                return
+        ring = self._ring
+        if len(ring) == ring.maxlen:
+            self.dropped += 1
+        ring.append((time.time(), level, category, message, console))
+        if self._thread is None:
+            self._start()
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=f"log-writer-{self.name}", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            stopping = self._stop.wait(self.flush_interval)
+            try:
+                self._drain()
+            except Exception as e:
+                sys.stderr.write(f"[LOG] writer error: {e}\n")
+            if stopping:
+                return
+
+    def _drain(self) -> None:
+        ring = self._ring
+        records = []
+        while ring:
+            try:
+                records.append(ring.popleft())
+            except IndexError:
+                break
+        if self.dropped != self._reported_dropped:
+            lost = self.dropped - self._reported_dropped
+            self._reported_dropped += lost
+            records.append((time.time(), WARNING, "LOG", f"[LOG] ring buffer overflow: {lost} records lost", True))
+        lines = []
+        console = []
+        for ts, level, category, message, to_console in records:
+            level_name = LEVEL_NAMES.get(level, str(level))
+            stamp = log_time(ts)
+            lines.append(json.dumps(
+                {"ts": round(ts, 6), "time": stamp, "level": level_name, "cat": category, "pid": self._pid, "msg": message},
+                ensure_ascii=False
+            ))
+            if to_console and self.console:
+                console.append(f"{message} Time: {stamp}[{level_name}]")
+        if console:
+            try:
+                sys.stdout.write("\n".join(console) + "\n")
+                sys.stdout.flush()
+            except (OSError, ValueError):
+                pass
+        if lines and self.path:
+            self._write("\n".join(lines) + "\n")
+            self.written += len(lines)
+
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._file = None
+        if self.backups > 0:
+            for idx in range(self.backups - 1, 0, -1):
+                src = f"{self.path}.{idx}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{idx + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _write(self, chunk: str) -> None:
+        try:
+            if self._file is None:
+                self._open()
+            self._file.write(chunk)
+            self._file.flush()
+            self._size += len(chunk.encode("utf-8"))
+            if self._size >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            # диск недоступен: файл бросаем, консоль продолжает работать
+            sys.stderr.write(f"[LOG] file {self.path} unavailable: {e}\n")
+            self.path = None
+
+    def flush(self, timeout: float = 2.0) -> bool:
+        """Ждёт, пока фоновый поток разберёт буфер (не для горячего пути). False — не успел."""
+        deadline = time.monotonic() + timeout
+        while self._ring and time.monotonic() < deadline:
+            time.sleep(self.flush_interval / 4)
+        return not self._ring
+
+    def close(self) -> None:
+        thread = self._thread
+        if thread is None or self._stop.is_set():
+            return
+        self._stop.set()
+        thread.join(timeout=5)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+_writers: Dict[str, AsyncLogWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_log_writer(name: Optional[str] = None) -> AsyncLogWriter:
+    """Один бэкенд на процесс и имя. По умолчанию: "bot" в главном процессе, имя процесса — в шардах."""
+    if name is None:
+        process_name = mp.current_process().name
+        name = "bot" if process_name == "MainProcess" else process_name
+    writer = _writers.get(name)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(name)
+            if writer is None:
+                writer = _writers[name] = AsyncLogWriter(name)
+    return writer
+
+
 class Total_Logger:
-    def __init__(self): 
+    def __init__(self, log_name: Optional[str] = None):
         self.debug_err_list: list = []
         self.debug_info_list: list = []
+        self.log = get_log_writer(log_name)
 
     # debug    
     def debug_error_notes(self, data: str, is_print: bool=True):
-        data += f" Time: {log_time()}" + "[ERROR]"
-        # self.debug_err_list.append(data)
-        # if is_print:
-        print(data)
+        self.log.emit(ERROR, data, console=is_print)
 
     def debug_info_notes(self, data: str, is_print: bool=True):
-        data += f" Time: {log_time()}" + "[INFO]"
-        # self.debug_info_list.append(data)
-        # if is_print:
-        print(data)
+        self.log.emit(INFO, data, console=is_print)
+
+    def debug_notes(self, data: str, level: int = DEBUG, category: Optional[str] = None, is_print: bool = True):
+        """Запись произвольного уровня; category — ключ сэмплинга (по умолчанию первый тег сообщения)."""
+        self.log.emit(level, data, category=category, console=is_print)
 
     def _log_decor_notes(self, ex, is_print: bool=True):
         """Логирование исключений с указанием точного места ошибки."""
@@ -45,9 +252,7 @@ class Total_Logger:
             message = f"Error in '{func_name}' at {file_name}, line {line_number}: {exception_message}"
         else:
             message = f"Error: {exception_message}"
-        # if is_print:
-        print(message)
-        # self.debug_err_list.append(message)
+        self.log.emit(ERROR, message, console=is_print)
 
     async def _async_log_exception(self, ex):
         """Асинхронное логирование без блокировок."""
@@ -81,8 +286,8 @@ class Total_Logger:
 
 
 class ErrorHandler(Total_Logger):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, log_name: Optional[str] = None):
+        super().__init__(log_name)
 
     def wrap_foreign_methods(self, obj):
         """
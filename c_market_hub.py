@@ -0,0 +1,355 @@
+import asyncio
+import os
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Optional
+from a_config import (
+    OKX_WS_PUBLIC_URL, INSTRUMENTS_REFRESH_FREQUENCY,
+    MARKET_HUB_NAME, MARKET_HUB_CAPACITY, MARKET_HUB_HEARTBEAT
+)
+from b_context import BotContext
+from b_network import NetworkManager
+from c_log import ErrorHandler
+from c_instruments import InstrumentSpec, InstrumentRegistry, InstrumentRefresher, InstrumentChange, INSTRUMENT_ADDED
+from API.OKX.okx import OkxFuturesClient
+from API.OKX.okx_ws import OkxTickerStream
+
+
+# --- Раскладка сегмента (фиксированная, little-endian) ---
+# [0..64)            заголовок
+# [64..64+cap*16)    цены: на слот инструмента два double — (last, ts)
+# [.. +cap*80)       инструменты: на слот запись INSTRUMENT_FMT
+HUB_MAGIC = b"OKXM"
+HUB_VERSION = 1
+HEADER_SIZE = 64
+OFF_MAGIC = 0              # 4s
+OFF_VERSION = 4            # I
+OFF_CAPACITY = 8           # I
+OFF_COUNT = 12             # I — занятых слотов
+OFF_PRICE_SEQ = 16         # Q — seqlock цен
+OFF_INST_SEQ = 24          # Q — seqlock таблицы инструментов
+OFF_PRICES_AT = 32         # d — время последней записи цен
+OFF_HEARTBEAT = 40         # d — хаб жив
+OFF_PID = 48               # I — pid хаба
+
+PRICE_SLOT = 16
+# inst_id, instIdCode (-1 — нет), ctVal, lotSz, tickSz, minSz, max_leverage (0 — нет), state, contract/price precision
+INSTRUMENT_FMT = "<32sqddddiBBBx"
+INSTRUMENT_SIZE = struct.calcsize(INSTRUMENT_FMT)
+
+STATE_CODES = {"": 0, "live": 1, "suspend": 2, "preopen": 3, "test": 4, "delisted": 5, "expired": 6}
+STATE_NAMES = {code: name for name, code in STATE_CODES.items()}
+
+SEQLOCK_SPINS = 1000
+
+
+def segment_size(capacity: int) -> int:
+    return HEADER_SIZE + capacity * (PRICE_SLOT + INSTRUMENT_SIZE)
+
+
+class _Segment:
+    """Общие смещения и чтение заголовка для писателя и читателя."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, capacity: int):
+        self.shm = shm
+        self.buf = shm.buf
+        self.capacity = capacity
+        self.prices_off = HEADER_SIZE
+        self.inst_off = HEADER_SIZE + capacity * PRICE_SLOT
+        # zero-copy представление цен: prices[2 * slot] — last, prices[2 * slot + 1] — ts
+        self._prices_raw = self.buf[self.prices_off:self.inst_off]
+        self.prices = self._prices_raw.cast("d")
+
+    def _u64(self, offset: int) -> int:
+        return struct.unpack_from("<Q", self.buf, offset)[0]
+
+    def _f64(self, offset: int) -> float:
+        return struct.unpack_from("<d", self.buf, offset)[0]
+
+    def count(self) -> int:
+        return struct.unpack_from("<I", self.buf, OFF_COUNT)[0]
+
+    def heartbeat(self) -> float:
+        return self._f64(OFF_HEARTBEAT)
+
+    def release(self) -> None:
+        self.prices.release()
+        self._prices_raw.release()
+        self.buf = None
+        self.shm.close()
+
+
+class SharedMarketWriter(_Segment):
+    """
+    Сторона хаба: единственный писатель сегмента. Каждая пачка изменений — одна секция seqlock
+    (счётчик нечётный — запись идёт, читатель повторяет чтение).
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, capacity: int):
+        super().__init__(shm, capacity)
+        self.slots: Dict[str, int] = {}
+
+    @classmethod
+    def create(cls, name: str, capacity: int) -> "SharedMarketWriter":
+        try:
+            # сегмент от упавшего хаба — пересоздаём
+            stale = shared_memory.SharedMemory(name=name, create=False)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=segment_size(capacity))
+        writer = cls(shm, capacity)
+        struct.pack_into("<4sIII", writer.buf, 0, HUB_MAGIC, HUB_VERSION, capacity, 0)
+        struct.pack_into("<QQddI", writer.buf, OFF_PRICE_SEQ, 0, 0, 0.0, time.time(), os.getpid())
+        return writer
+
+    def _begin(self, offset: int) -> int:
+        seq = self._u64(offset) + 1
+        struct.pack_into("<Q", self.buf, offset, seq)  # нечётный — запись идёт
+        return seq
+
+    def _end(self, offset: int, seq: int) -> None:
+        struct.pack_into("<Q", self.buf, offset, seq + 1)
+
+    def write_instruments(self, specs: List[InstrumentSpec]) -> int:
+        """Новые инструменты получают следующий слот; слот за instId не меняется до перезапуска хаба."""
+        seq = self._begin(OFF_INST_SEQ)
+        try:
+            for spec in specs:
+                slot = self.slots.get(spec.inst_id)
+                if slot is None:
+                    if len(self.slots) >= self.capacity:
+                        continue
+                    slot = self.slots[spec.inst_id] = len(self.slots)
+                struct.pack_into(
+                    INSTRUMENT_FMT, self.buf, self.inst_off + slot * INSTRUMENT_SIZE,
+                    spec.inst_id.encode("utf-8")[:32],
+                    spec.inst_id_code if spec.inst_id_code is not None else -1,
+                    spec.ctVal, spec.lotSz, spec.tickSz, spec.minSz,
+                    spec.max_leverage or 0,
+                    STATE_CODES.get(spec.state, 0),
+                    spec.contract_precision, spec.price_precision,
+                )
+            struct.pack_into("<I", self.buf, OFF_COUNT, len(self.slots))
+        finally:
+            self._end(OFF_INST_SEQ, seq)
+        return len(self.slots)
+
+    def write_prices(self, prices: Dict[str, float], ts: Optional[float] = None) -> None:
+        ts = time.time() if ts is None else ts
+        slots = self.slots
+        view = self.prices
+        seq = self._begin(OFF_PRICE_SEQ)
+        try:
+            for inst_id, price in prices.items():
+                slot = slots.get(inst_id)
+                if slot is None:
+                    continue
+                view[2 * slot] = price
+                view[2 * slot + 1] = ts
+            struct.pack_into("<d", self.buf, OFF_PRICES_AT, ts)
+        finally:
+            self._end(OFF_PRICE_SEQ, seq)
+
+    def beat(self) -> None:
+        struct.pack_into("<d", self.buf, OFF_HEARTBEAT, time.time())
+
+    def close(self) -> None:
+        self.release()
+        self.shm.unlink()
+
+
+class SharedMarketReader(_Segment):
+    """
+    Сторона бота: подключение к сегменту хаба только на чтение (методов записи нет).
+    Цена — два double прямо из общей памяти под seqlock, без копий и запросов.
+    Индекс instId -> слот перестраивается, только когда хаб поменял таблицу инструментов.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, capacity: int):
+        super().__init__(shm, capacity)
+        self._index: Dict[str, int] = {}
+        self._index_seq = -1
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedMarketReader":
+        shm = shared_memory.SharedMemory(name=name, create=False)
+        # до 3.13 подключившийся процесс регистрирует сегмент в resource_tracker и тот удалит его на выходе
+        if struct.unpack_from("<I", shm.buf, OFF_PID)[0] != os.getpid():
+            try:
+                resource_tracker.unregister(shm._name, "shared_memory")
+            except Exception:
+                pass
+        magic, version, capacity = struct.unpack_from("<4sII", shm.buf, 0)
+        if magic != HUB_MAGIC or version != HUB_VERSION:
+            shm.close()
+            raise ValueError(f"market hub segment {name!r}: unexpected layout {magic!r} v{version}")
+        return cls(shm, capacity)
+
+    def _read(self, seq_offset: int, func):
+        for _ in range(SEQLOCK_SPINS):
+            before = self._u64(seq_offset)
+            if not before & 1:
+                result = func()
+                if self._u64(seq_offset) == before:
+                    return result
+            os.sched_yield()  # писатель посреди пачки — отдаём ему ядро
+        raise TimeoutError("market hub: seqlock read did not settle")
+
+    def _read_instruments(self) -> List[InstrumentSpec]:
+        specs = []
+        for slot in range(self.count()):
+            (raw_id, code, ct_val, lot_sz, tick_sz, min_sz, max_lev, state, c_prec, p_prec) = struct.unpack_from(
+                INSTRUMENT_FMT, self.buf, self.inst_off + slot * INSTRUMENT_SIZE
+            )
+            specs.append(InstrumentSpec(
+                inst_id=raw_id.rstrip(b"\0").decode("utf-8"),
+                inst_id_code=code if code >= 0 else None,
+                ctVal=ct_val,
+                lotSz=lot_sz,
+                tickSz=tick_sz,
+                minSz=min_sz,
+                max_leverage=max_lev or None,
+                state=STATE_NAMES.get(state, ""),
+                contract_precision=c_prec,
+                price_precision=p_prec,
+            ))
+        return specs
+
+    def specs(self) -> List[InstrumentSpec]:
+        """Согласованная копия таблицы инструментов (для реестра и диффа)."""
+        seq = self._u64(OFF_INST_SEQ)
+        specs = self._read(OFF_INST_SEQ, self._read_instruments)
+        self._index = {spec.inst_id: slot for slot, spec in enumerate(specs)}
+        self._index_seq = seq
+        return specs
+
+    def registry(self) -> InstrumentRegistry:
+        return InstrumentRegistry(self.specs())
+
+    def _slot(self, inst_id: str) -> Optional[int]:
+        if self._u64(OFF_INST_SEQ) != self._index_seq:
+            self.specs()
+        return self._index.get(inst_id)
+
+    def quote(self, inst_id: str) -> Optional[tuple]:
+        """(last, ts) или None, если инструмента нет / цены ещё не было."""
+        slot = self._slot(inst_id)
+        if slot is None:
+            return None
+        view = self.prices
+        price, ts = self._read(OFF_PRICE_SEQ, lambda: (view[2 * slot], view[2 * slot + 1]))
+        return (price, ts) if ts else None
+
+    def age(self, inst_id: str) -> Optional[float]:
+        quote = self.quote(inst_id)
+        return None if quote is None else time.time() - quote[1]
+
+    def get_price(self, inst_id: str, max_age: float) -> Optional[float]:
+        """Цена, если она не старше max_age секунд, иначе None (как OkxTickerStream.get_price)."""
+        quote = self.quote(inst_id)
+        if quote is None or time.time() - quote[1] > max_age:
+            return None
+        return quote[0]
+
+    def alive(self, max_silence: float) -> bool:
+        return time.time() - self.heartbeat() <= max_silence
+
+    def close(self) -> None:
+        self.release()
+
+
+class HubTickerStream(OkxTickerStream):
+    """Поток тикеров хаба: каждый push — одна запись в сегмент (и в context.prices хаба)."""
+
+    def __init__(self, url: str, context: BotContext, info_handler: ErrorHandler, writer: SharedMarketWriter, **kwargs):
+        super().__init__(url, context, info_handler, name="OKX WS hub tickers", **kwargs)
+        self.writer = writer
+
+    async def _on_tickers(self, arg: Dict[str, Any], data: List[Dict[str, Any]]) -> None:
+        batch = {}
+        for item in data:
+            inst_id = item.get("instId")
+            last = item.get("last")
+            if not inst_id or not last:
+                continue
+            try:
+                batch[inst_id] = float(last)
+            except ValueError:
+                continue
+        if batch:
+            now = time.time()
+            self.context.prices.update(batch)
+            self.context.prices_ts.update(dict.fromkeys(batch, now))
+            self.writer.write_prices(batch, now)
+
+
+async def run_hub(name: str = MARKET_HUB_NAME, capacity: int = MARKET_HUB_CAPACITY) -> None:
+    """
+    Процесс хаба рыночных данных: один набор публичных запросов и один поток тикеров на хост.
+    Боты с тем же MARKET_HUB_NAME подключаются к сегменту вместо собственных запросов.
+    """
+    context = BotContext()
+    info_handler = ErrorHandler(log_name="hub")
+    writer = SharedMarketWriter.create(name, capacity)
+    connector = NetworkManager(context=context, info_handler=info_handler)
+    await connector.initialize_session()
+    connector.start_ping_loop()
+    client = OkxFuturesClient(
+        api_key=None,
+        api_secret=None,
+        api_passphrase=None,
+        context=context,
+        info_handler=info_handler
+    )
+    stream = None
+    refresher = None
+    try:
+        registry = InstrumentRegistry.from_raw(await client.get_instruments(session=context.session))
+        writer.write_instruments(list(registry))
+        prices = await client.get_all_current_prices(session=context.session)
+        if prices:
+            writer.write_prices(prices)
+        info_handler.debug_info_notes(f"[HUB] segment {name!r}: {len(registry)} instruments, {len(prices or {})} prices")
+
+        stream = HubTickerStream(OKX_WS_PUBLIC_URL, context, info_handler, writer)
+        await stream.track(registry.inst_ids())
+        stream.start()
+
+        async def on_changes(changes: List[InstrumentChange]):
+            writer.write_instruments(list(registry))
+            added = [ch.inst_id for ch in changes if ch.kind == INSTRUMENT_ADDED and ch.spec.is_tradable()]
+            if added:
+                await stream.track(added)
+            info_handler.debug_info_notes(f"[HUB] instruments diff applied: {len(changes)} changes")
+
+        refresher = InstrumentRefresher(
+            context=context,
+            info_handler=info_handler,
+            registry=registry,
+            fetch=lambda: client.get_instruments(session=context.session),
+            interval=INSTRUMENTS_REFRESH_FREQUENCY
+        )
+        refresher.subscribe(on_changes)
+        refresher.start()
+
+        while not context.stop_bot:
+            writer.beat()
+            await asyncio.sleep(MARKET_HUB_HEARTBEAT)
+    finally:
+        context.stop_bot = True
+        if refresher:
+            await refresher.stop()
+        if stream:
+            await stream.stop()
+        await connector.shutdown_session()
+        writer.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_hub(MARKET_HUB_NAME or "okx_market_hub"))
+    except KeyboardInterrupt:
+        print("[HUB] stopped")
@@ -0,0 +1,103 @@
+import asyncio
+from collections import Counter
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Tuple
+from c_log import ErrorHandler
+
+
+# handler(item) -> итерируемое выходов для следующей стадии (пусто / None — элемент отброшен)
+StageHandler = Callable[[Any], Awaitable[Optional[Iterable[Any]]]]
+
+
+class SignalPipeline:
+    """
+    Конвейер обработки сигналов на asyncio.Queue: каждая стадия — своя ограниченная очередь
+    и фиксированное число воркеров. Полная очередь блокирует put предыдущей стадии (backpressure).
+    Последняя стадия ничего не возвращает — она исполняет.
+    """
+
+    def __init__(
+        self,
+        info_handler: ErrorHandler,
+        stages: List[Tuple[str, StageHandler, int]],
+        queue_size: int = 100,
+    ):
+        info_handler.wrap_foreign_methods(self)
+        self.info_handler = info_handler
+        self.stages = stages
+        self.queue_size = queue_size
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+        self.stats: Counter = Counter()
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        for idx, (name, handler, workers) in enumerate(self.stages):
+            for _ in range(max(1, workers)):
+                self._workers.append(asyncio.create_task(self._worker(idx, name, handler)))
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+        self._queues = []
+
+    async def drain(self, timeout: float) -> bool:
+        """Ждёт, пока все стадии разберут очереди. False — не успели за timeout."""
+        async def join_all():
+            for queue in self._queues:
+                await queue.join()
+        try:
+            await asyncio.wait_for(join_all(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def submit(self, item: Any) -> None:
+        """Вход конвейера. Ждёт, если первая стадия переполнена."""
+        if not self._queues:
+            self.stats["dropped:not_running"] += 1
+            return
+        await self._queues[0].put(item)
+        self.stats["submitted"] += 1
+
+    def try_submit(self, item: Any) -> bool:
+        """Вход без ожидания: False — конвейер не запущен или первая стадия переполнена."""
+        if not self._queues:
+            self.stats["dropped:not_running"] += 1
+            return False
+        try:
+            self._queues[0].put_nowait(item)
+        except asyncio.QueueFull:
+            self.stats["dropped:full"] += 1
+            return False
+        self.stats["submitted"] += 1
+        return True
+
+    async def _worker(self, idx: int, name: str, handler: StageHandler) -> None:
+        queue = self._queues[idx]
+        next_queue = self._queues[idx + 1] if idx + 1 < len(self._queues) else None
+        while True:
+            item = await queue.get()
+            try:
+                outputs = await handler(item)
+                self.stats[name] += 1
+                if next_queue is not None and outputs:
+                    for out in outputs:
+                        await next_queue.put(out)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats[f"errors:{name}"] += 1
+                self.info_handler.debug_error_notes(f"[pipeline:{name}] {e}", is_print=True)
+            finally:
+                queue.task_done()
+
+    def queue_sizes(self) -> dict:
+        return {name: q.qsize() for (name, _, _), q in zip(self.stages, self._queues)}
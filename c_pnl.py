@@ -0,0 +1,168 @@
+import asyncio
+from typing import Any, Dict, Optional, Set, Tuple
+
+
+_EPS = 1e-12
+
+
+def _num(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class PositionFills:
+    """Накопитель исполнений одной позиции: объёмы и px*sz для VWAP, комиссии, PnL закрытий, фандинг."""
+
+    __slots__ = (
+        "open_sz", "open_px_sz", "close_sz", "close_px_sz",
+        "fee", "fill_pnl", "funding_fee", "trade_ids", "first_fill", "last_fill",
+    )
+
+    def __init__(self):
+        self.open_sz = 0.0
+        self.open_px_sz = 0.0
+        self.close_sz = 0.0
+        self.close_px_sz = 0.0
+        self.fee = 0.0
+        self.fill_pnl = 0.0
+        self.funding_fee = 0.0
+        self.trade_ids: Set[str] = set()
+        self.first_fill: Optional[int] = None
+        self.last_fill: Optional[int] = None
+
+    @property
+    def entry_vwap(self) -> Optional[float]:
+        return self.open_px_sz / self.open_sz if self.open_sz > _EPS else None
+
+    @property
+    def exit_vwap(self) -> Optional[float]:
+        return self.close_px_sz / self.close_sz if self.close_sz > _EPS else None
+
+    @property
+    def is_flat(self) -> bool:
+        """Всё открытое закрыто (известны и входы, и выходы)."""
+        return self.open_sz > _EPS and self.close_sz >= self.open_sz - _EPS
+
+
+class FillsPnlEngine:
+    """
+    Реализованный PnL из исполнений канала orders (fillPx / fillSz / fillFee / fillPnl)
+    и фандинга из канала positions — в памяти, по ключу (instId, posSide).
+    Отчёт готов в момент, когда позиция становится плоской, без ожидания positions-history.
+    Позиции, открытые до старта (нет входных fill-ов), не считаются — для них остаётся история.
+    """
+
+    def __init__(self):
+        self._positions: Dict[Tuple[str, str], PositionFills] = {}
+        self._flat: Dict[Tuple[str, str], asyncio.Event] = {}
+
+    @staticmethod
+    def _key(inst_id: Any, pos_side: Any) -> Tuple[str, str]:
+        return str(inst_id or "").upper(), str(pos_side or "").upper()
+
+    def on_order(self, order: Dict[str, Any]) -> bool:
+        """Пуш канала orders. Учитывает только новые исполнения (дедуп по tradeId). True — fill учтён."""
+        fill_sz = _num(order.get("fillSz"))
+        trade_id = str(order.get("tradeId") or "")
+        if fill_sz <= 0 or not trade_id:
+            return False
+
+        key = self._key(order.get("instId"), order.get("posSide"))
+        pos = self._positions.get(key)
+        if pos is None:
+            pos = self._positions[key] = PositionFills()
+        if trade_id in pos.trade_ids:
+            return False
+        pos.trade_ids.add(trade_id)
+
+        fill_px = _num(order.get("fillPx"))
+        # long: buy открывает, sell закрывает; short — наоборот
+        opening = (str(order.get("side", "")).lower() == "buy") == (key[1] == "LONG")
+        if opening:
+            pos.open_sz += fill_sz
+            pos.open_px_sz += fill_px * fill_sz
+        else:
+            pos.close_sz += fill_sz
+            pos.close_px_sz += fill_px * fill_sz
+        pos.fee += _num(order.get("fillFee"))  # у OKX списанная комиссия — отрицательная
+        pos.fill_pnl += _num(order.get("fillPnl"))
+
+        fill_time = int(_num(order.get("fillTime"))) or None
+        if fill_time:
+            pos.first_fill = pos.first_fill or fill_time
+            pos.last_fill = fill_time
+
+        if pos.is_flat:
+            self._flat_event(key).set()
+        return True
+
+    def on_position(self, position: Dict[str, Any]) -> None:
+        """Пуш канала positions: накопленный фандинг позиции."""
+        funding = position.get("fundingFee")
+        if funding in (None, ""):
+            return
+        key = self._key(position.get("instId"), position.get("posSide"))
+        pos = self._positions.get(key)
+        if pos is not None:
+            pos.funding_fee = _num(funding)
+
+    def _flat_event(self, key: Tuple[str, str]) -> asyncio.Event:
+        event = self._flat.get(key)
+        if event is None:
+            event = self._flat[key] = asyncio.Event()
+        return event
+
+    async def wait_flat(self, symbol: str, pos_side: str, timeout: float) -> bool:
+        """Ждёт закрывающие fill-ы (пуш orders может отстать от positions). False — не дождались."""
+        key = self._key(symbol, pos_side)
+        pos = self._positions.get(key)
+        if pos is None or pos.open_sz <= _EPS:
+            return False
+        if pos.is_flat:
+            return True
+        try:
+            await asyncio.wait_for(self._flat_event(key).wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def settle(self, symbol: str, pos_side: str, ct_val: float, leverage: Optional[float]) -> Optional[Dict[str, Any]]:
+        """
+        Закрывает учёт позиции и отдаёт отчёт в формате get_realized_pnl (+ детали).
+        None — входы неизвестны или закрытий не было: считать по истории.
+        """
+        key = self._key(symbol, pos_side)
+        pos = self._positions.pop(key, None)
+        self._flat.pop(key, None)
+        if pos is None or not pos.is_flat:
+            return None
+
+        entry_vwap = pos.entry_vwap
+        exit_vwap = pos.exit_vwap
+        gross = pos.fill_pnl
+        if not gross:
+            direction = 1 if key[1] == "LONG" else -1
+            gross = (exit_vwap - entry_vwap) * pos.close_sz * ct_val * direction
+        pnl_usdt = gross + pos.fee + pos.funding_fee
+
+        margin = entry_vwap * pos.close_sz * ct_val / (leverage or 1)
+        pnl_pct = pnl_usdt / margin * 100 if margin > _EPS else 0.0
+
+        return {
+            "pnl_usdt": round(pnl_usdt, 4),
+            "pnl_pct": round(pnl_pct, 4),
+            "entry_vwap": entry_vwap,
+            "exit_vwap": exit_vwap,
+            "fee": round(pos.fee, 4),
+            "funding_fee": round(pos.funding_fee, 4),
+        }
+
+    def discard(self, symbol: str, pos_side: str) -> None:
+        key = self._key(symbol, pos_side)
+        self._positions.pop(key, None)
+        self._flat.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._positions)
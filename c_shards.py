@@ -0,0 +1,351 @@
+import asyncio
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional
+from b_context import BotContext
+from c_log import ErrorHandler
+from TG.tg_notifier import MessageFormatter
+
+
+# --- Сообщения канала родитель <-> воркер: (kind, payload) ---
+MSG_SIGNAL = "signal"      # родитель -> воркер: ((parsed_msg, last_timestamp, msg_key), sent_at)
+MSG_STOP = "stop"          # родитель -> воркер: завершить итерацию
+MSG_TEXTS = "texts"        # воркер -> родитель: (chat_id, [готовые тексты для Telegram])
+MSG_HEALTH = "health"      # воркер -> родитель: dict метрик
+
+
+def split_accounts(chat_ids: List[Any], workers: int) -> List[List[Any]]:
+    """Раскладывает аккаунты по воркерам по кругу; пустые шарды отбрасываются."""
+    shards: List[List[Any]] = [[] for _ in range(max(1, workers))]
+    for idx, chat_id in enumerate(chat_ids):
+        shards[idx % len(shards)].append(chat_id)
+    return [shard for shard in shards if shard]
+
+
+class LatencyStats:
+    """Счётчик задержек за окно между отчётами: count / avg / max в мс."""
+
+    __slots__ = ("count", "total", "peak")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.peak = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.peak:
+            self.peak = seconds
+
+    def flush(self) -> dict:
+        result = {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "max_ms": round(self.peak * 1000, 2),
+        }
+        self.count = 0
+        self.total = 0.0
+        self.peak = 0.0
+        return result
+
+
+# =====================================================================
+# Сторона воркера
+# =====================================================================
+class ShardNotifier(MessageFormatter):
+    """
+    Нотификатор процесса-шарда: форматирует сообщения на месте (нагрузка остаётся в воркере),
+    а готовые тексты пачкой уходят родителю — Telegram держит только родительский процесс.
+    """
+
+    def __init__(self, context: BotContext, info_handler: ErrorHandler, link: "ShardWorkerLink"):
+        super().__init__(context, info_handler)
+        self.link = link
+
+    async def send_report_batches(self, chat_id: Any, batch_size: int = 1):
+        queue = self.context.queues_msg.get(chat_id)
+        if queue:
+            self.link.send(MSG_TEXTS, (chat_id, list(queue)))
+            queue.clear()
+
+
+class ShardWorkerLink:
+    """
+    Конец канала в процессе-шарде. Чтение — в отдельном потоке (recv блокирующий),
+    доставка сигналов — в цикл событий воркера. Отправка — только из потока цикла.
+    """
+
+    def __init__(self, conn: Connection, shard_id: int):
+        self.conn = conn
+        self.shard_id = shard_id
+        self.on_signal: Optional[Callable[[tuple], Any]] = None
+        self.on_stop: Optional[Callable[[], None]] = None
+        self.ipc_latency = LatencyStats()
+        self.exec_latency = LatencyStats()
+        self.signals = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reader: Optional[threading.Thread] = None
+        self._closed = False
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._reader = threading.Thread(target=self._read_loop, name=f"shard-{self.shard_id}-reader", daemon=True)
+        self._reader.start()
+
+    def _read_loop(self) -> None:
+        while True:
+            try:
+                kind, payload = self.conn.recv()
+            except (EOFError, OSError):
+                # родитель умер или закрыл канал — останавливаемся
+                kind, payload = MSG_STOP, None
+            if kind == MSG_SIGNAL:
+                asyncio.run_coroutine_threadsafe(self._deliver(payload), self._loop)
+            elif kind == MSG_STOP:
+                if self.on_stop is not None:
+                    self._loop.call_soon_threadsafe(self.on_stop)
+                return
+
+    async def _deliver(self, payload: tuple) -> None:
+        item, sent_at = payload
+        self.ipc_latency.add(max(0.0, time.time() - sent_at))
+        self.signals += 1
+        if self.on_signal is not None:
+            await self.on_signal(item)
+
+    def send(self, kind: str, payload: Any) -> None:
+        if self._closed:
+            return
+        try:
+            self.conn.send((kind, payload))
+        except (OSError, ValueError):
+            self._closed = True
+
+    def report_health(self, extra: Dict[str, Any]) -> None:
+        health = {
+            "shard": self.shard_id,
+            "pid": os.getpid(),
+            "ts": time.time(),
+            "signals": self.signals,
+            "ipc": self.ipc_latency.flush(),
+            "exec": self.exec_latency.flush(),
+        }
+        health.update(extra)
+        self.send(MSG_HEALTH, health)
+
+    def close(self) -> None:
+        self._closed = True
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+
+# =====================================================================
+# Сторона родителя
+# =====================================================================
+class ShardHandle:
+    """
+    Процесс-шард глазами родителя: канал, аккаунты и последний отчёт о здоровье.
+    Запись в канал — из своего потока через outbox: Connection.send блокирующий, цикл событий его не ждёт.
+    """
+
+    __slots__ = ("shard_id", "chat_ids", "process", "conn", "reader", "writer", "outbox", "health", "health_at", "restarts")
+
+    def __init__(self, shard_id: int, chat_ids: List[Any]):
+        self.shard_id = shard_id
+        self.chat_ids = chat_ids
+        self.process: Optional[mp.Process] = None
+        self.conn: Optional[Connection] = None
+        self.reader: Optional[threading.Thread] = None
+        self.writer: Optional[threading.Thread] = None
+        self.outbox: Optional[queue.SimpleQueue] = None
+        self.health: Dict[str, Any] = {}
+        self.health_at = 0.0
+        self.restarts = 0
+
+    def send(self, kind: str, payload: Any) -> bool:
+        """В очередь потока-писателя без ожидания. False — канал закрыт или писатель завершился."""
+        if self.outbox is None or self.writer is None or not self.writer.is_alive():
+            return False
+        self.outbox.put((kind, payload))
+        return True
+
+
+class ShardPool:
+    """
+    Пул процессов-воркеров под аккаунты. Родитель держит Telegram, разбор сообщений и рыночные данные
+    для фильтра; разобранный сигнал уходит по Pipe во все шарды, каждый раздаёт его своим аккаунтам.
+    Воркеры шлют обратно готовые тексты для Telegram и отчёты о здоровье (задержки IPC / исполнения,
+    лаг цикла событий). Умерший воркер перезапускается с теми же аккаунтами.
+    """
+
+    def __init__(
+        self,
+        context: BotContext,
+        info_handler: ErrorHandler,
+        target: Callable,
+        workers: int,
+        health_interval: float = 5.0,
+        on_texts: Optional[Callable[..., None]] = None,
+    ):
+        info_handler.wrap_foreign_methods(self)
+        self.context = context
+        self.info_handler = info_handler
+        self.target = target
+        self.workers = workers
+        self.health_interval = health_interval
+        self.on_texts = on_texts  # on_texts(chat_id, *texts) — в очередь отправки Telegram
+        self.shards: List[ShardHandle] = []
+        self.target_args: tuple = ()  # дополнительные аргументы target после (conn, shard_id, configs)
+        self._mp = mp.get_context("spawn")  # без fork: у родителя живой цикл событий и потоки aiogram
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def chat_ids(self) -> List[Any]:
+        return [chat_id for shard in self.shards for chat_id in shard.chat_ids]
+
+    def start(self, chat_ids: List[Any], *target_args: Any) -> None:
+        self._loop = asyncio.get_running_loop()
+        self.target_args = target_args
+        for shard_id, shard_chat_ids in enumerate(split_accounts(chat_ids, self.workers)):
+            shard = ShardHandle(shard_id, shard_chat_ids)
+            self.shards.append(shard)
+            self._spawn(shard)
+
+    def _spawn(self, shard: ShardHandle) -> None:
+        parent_conn, child_conn = self._mp.Pipe(duplex=True)
+        configs = {chat_id: self.context.users_configs[chat_id] for chat_id in shard.chat_ids}
+        process = self._mp.Process(
+            target=self.target,
+            args=(child_conn, shard.shard_id, configs, *self.target_args),
+            name=f"shard-{shard.shard_id}",
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        shard.process = process
+        shard.conn = parent_conn
+        shard.health = {}
+        shard.health_at = time.time()
+        shard.reader = threading.Thread(
+            target=self._read_loop, args=(shard, parent_conn), name=f"shard-{shard.shard_id}-parent", daemon=True
+        )
+        shard.reader.start()
+        shard.outbox = queue.SimpleQueue()
+        shard.writer = threading.Thread(
+            target=self._write_loop, args=(shard, parent_conn, shard.outbox), name=f"shard-{shard.shard_id}-writer", daemon=True
+        )
+        shard.writer.start()
+        self.info_handler.debug_info_notes(
+            f"[SHARDS] worker {shard.shard_id} started (pid {process.pid}), accounts: {shard.chat_ids}"
+        )
+
+    def _read_loop(self, shard: ShardHandle, conn: Connection) -> None:
+        while True:
+            try:
+                kind, payload = conn.recv()
+            except (EOFError, OSError):
+                return
+            self._loop.call_soon_threadsafe(self._on_message, shard, kind, payload)
+
+    def _write_loop(self, shard: ShardHandle, conn: Connection, outbox: queue.SimpleQueue) -> None:
+        while True:
+            message = outbox.get()
+            if message is None:
+                return
+            try:
+                conn.send(message)
+            except (OSError, ValueError) as e:
+                self.info_handler.debug_error_notes(f"[SHARDS] worker {shard.shard_id} pipe closed: {e}", is_print=True)
+                return
+
+    def _on_message(self, shard: ShardHandle, kind: str, payload: Any) -> None:
+        if kind == MSG_TEXTS:
+            chat_id, texts = payload
+            if self.on_texts is not None:
+                self.on_texts(chat_id, *texts)
+            else:
+                self.context.queues_msg.setdefault(chat_id, []).extend(texts)
+        elif kind == MSG_HEALTH:
+            shard.health = payload
+            shard.health_at = time.time()
+            self.context.shards_in_position[shard.shard_id] = bool(payload.get("in_position"))
+
+    def dispatch(self, item: tuple) -> None:
+        """Разобранный сигнал — во все шарды (в outbox потоков-писателей, цикл событий не ждёт канал)."""
+        envelope = (item, time.time())
+        for shard in self.shards:
+            if not shard.send(MSG_SIGNAL, envelope):
+                self.info_handler.debug_error_notes(
+                    f"[SHARDS] worker {shard.shard_id} unreachable, signal {item[2]} lost", is_print=True
+                )
+
+    def check(self) -> None:
+        """Из главного цикла: перезапуск умерших воркеров, предупреждение о молчащих."""
+        now = time.time()
+        for shard in self.shards:
+            if shard.process is not None and not shard.process.is_alive():
+                self.info_handler.debug_error_notes(
+                    f"[SHARDS] worker {shard.shard_id} exited (code {shard.process.exitcode}), restarting", is_print=True
+                )
+                self._close(shard)
+                # позиции умершего шарда неизвестны до первого отчёта нового процесса
+                self.context.shards_in_position.pop(shard.shard_id, None)
+                shard.restarts += 1
+                self._spawn(shard)
+            elif now - shard.health_at > self.health_interval * 3:
+                self.info_handler.debug_info_notes(
+                    f"[SHARDS] worker {shard.shard_id} silent for {now - shard.health_at:.0f}s", is_print=True
+                )
+
+    def report(self) -> str:
+        lines = []
+        for shard in self.shards:
+            h = shard.health
+            if not h:
+                lines.append(f"shard {shard.shard_id}: no health yet")
+                continue
+            lines.append(
+                f"shard {shard.shard_id} pid {h.get('pid')}: accounts {h.get('accounts')}, "
+                f"signals {h.get('signals')}, ipc avg {h['ipc']['avg_ms']}ms max {h['ipc']['max_ms']}ms, "
+                f"exec avg {h['exec']['avg_ms']}ms, loop lag {h.get('loop_lag_ms')}ms, restarts {shard.restarts}"
+            )
+        return "[SHARDS] " + " | ".join(lines)
+
+    def _close(self, shard: ShardHandle) -> None:
+        if shard.outbox is not None:
+            shard.outbox.put(None)
+            shard.outbox = None
+        if shard.writer is not None:
+            shard.writer.join(timeout=1.0)
+            shard.writer = None
+        if shard.conn is not None:
+            try:
+                shard.conn.close()
+            except OSError:
+                pass
+            shard.conn = None
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        for shard in self.shards:
+            shard.send(MSG_STOP, None)
+        deadline = time.time() + timeout
+        for shard in self.shards:
+            process = shard.process
+            if process is None:
+                continue
+            await asyncio.to_thread(process.join, max(0.0, deadline - time.time()))
+            if process.is_alive():
+                self.info_handler.debug_error_notes(
+                    f"[SHARDS] worker {shard.shard_id} did not stop in {timeout}s, terminating", is_print=True
+                )
+                process.terminate()
+                await asyncio.to_thread(process.join, 1.0)
+            self._close(shard)
+            self.context.shards_in_position.pop(shard.shard_id, None)
+        self.shards = []
@@ -0,0 +1,48 @@
+import json
+import os
+import time
+from typing import Dict, Optional, Tuple
+from c_instruments import InstrumentRegistry, InstrumentSpec
+
+
+SNAPSHOT_VERSION = 1
+
+
+def save_snapshot(path: str, registry: InstrumentRegistry, prices: Dict[str, float]) -> None:
+    """
+    Пишет компактный снимок реестра и цен: спеки — кортежами полей (порядок __slots__).
+    Запись атомарная (tmp + replace), чтобы обрыв процесса не оставил битый файл.
+    """
+    payload = {
+        "version": SNAPSHOT_VERSION,
+        "saved_at": time.time(),
+        "fields": InstrumentSpec.__slots__,
+        "specs": [spec.as_tuple() for spec in registry],
+        "prices": prices,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str, ttl: float) -> Optional[Tuple[InstrumentRegistry, Dict[str, float], float]]:
+    """(registry, prices, saved_at) или None — нет файла, другая версия/схема, протух, битый."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if payload.get("version") != SNAPSHOT_VERSION or tuple(payload.get("fields") or ()) != InstrumentSpec.__slots__:
+        return None
+    saved_at = float(payload.get("saved_at") or 0)
+    if time.time() - saved_at > ttl:
+        return None
+
+    try:
+        registry = InstrumentRegistry(InstrumentSpec(*values) for values in payload.get("specs") or [])
+        prices = {inst_id: float(price) for inst_id, price in (payload.get("prices") or {}).items()}
+    except (TypeError, ValueError):
+        return None
+    return registry, prices, saved_at
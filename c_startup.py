@@ -0,0 +1,104 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from c_log import ErrorHandler
+
+
+class StartupOrchestrator:
+    """
+    Запуск итерации графом шагов: каждый шаг стартует, как только готовы его зависимости,
+    независимые идут параллельно. Упавший шаг логируется и не блокирует зависимых
+    (они сами проверяют, что им досталось). ready выставляется, когда отработали все шаги.
+    """
+
+    def __init__(self, info_handler: ErrorHandler):
+        self.info_handler = info_handler
+        self._steps: Dict[str, Tuple[Callable[[], Awaitable], Tuple[str, ...]]] = {}
+        self._done: Dict[str, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.timings: Dict[str, float] = {}  # name -> сек
+        self.failed: Dict[str, str] = {}
+        self.ready = asyncio.Event()
+        self.started_at: Optional[float] = None
+        self.ready_after: Optional[float] = None
+
+    def add(self, name: str, func: Callable[[], Awaitable], deps: Iterable[str] = ()) -> None:
+        if name in self._steps:
+            raise ValueError(f"startup step {name!r} already added")
+        self._steps[name] = (func, tuple(deps))
+        self._done[name] = asyncio.Event()
+
+    def _check_graph(self) -> None:
+        """Неизвестные зависимости и циклы — ошибка сборки, а не повод зависнуть."""
+        indegree = {name: 0 for name in self._steps}
+        for name, (_, deps) in self._steps.items():
+            for dep in deps:
+                if dep not in self._steps:
+                    raise ValueError(f"startup step {name!r} depends on unknown {dep!r}")
+                indegree[name] += 1
+        queue = [name for name, deg in indegree.items() if deg == 0]
+        visited = 0
+        while queue:
+            current = queue.pop()
+            visited += 1
+            for name, (_, deps) in self._steps.items():
+                if current in deps:
+                    indegree[name] -= 1
+                    if indegree[name] == 0:
+                        queue.append(name)
+        if visited != len(self._steps):
+            raise ValueError("startup steps have a dependency cycle")
+
+    async def _run_step(self, name: str) -> None:
+        func, deps = self._steps[name]
+        for dep in deps:
+            await self._done[dep].wait()
+        t0 = time.monotonic()
+        try:
+            await func()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed[name] = str(e)
+            self.info_handler.debug_error_notes(f"[STARTUP] step {name} failed: {e}", is_print=True)
+        finally:
+            self.timings[name] = time.monotonic() - t0
+            self._done[name].set()
+
+    async def wait(self, names: Iterable[str], timeout: Optional[float] = None) -> bool:
+        """Ждёт завершения шагов names (упавший шаг тоже завершён). False — не дождались за timeout."""
+        pending = [self._done[name] for name in names if name in self._done and not self._done[name].is_set()]
+        if not pending:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.gather(*(event.wait() for event in pending)), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def run(self) -> None:
+        self._check_graph()
+        self.started_at = time.monotonic()
+        self._tasks = [asyncio.create_task(self._run_step(name)) for name in self._steps]
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            self._tasks = []
+        self.ready_after = time.monotonic() - self.started_at
+        self.ready.set()
+
+    async def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def report(self) -> str:
+        steps = ", ".join(f"{name} {sec * 1000:.0f}ms" for name, sec in self.timings.items())
+        failed = f" | failed: {', '.join(self.failed)}" if self.failed else ""
+        total = f"{self.ready_after * 1000:.0f}ms" if self.ready_after is not None else "-"
+        return f"[STARTUP] ready in {total}: {steps}{failed}"
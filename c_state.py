@@ -0,0 +1,134 @@
+from typing import Dict, Iterator, Optional
+from c_instruments import InstrumentSpec
+
+
+# --- Состояния позиции ---
+POS_IDLE = "idle"          # ничего не выставлено
+POS_PENDING = "pending"    # ордер на вход выставлен, позиции ещё нет
+POS_OPEN = "open"          # позиция на бирже
+POS_CLOSING = "closing"    # позиция уменьшается (частичное закрытие)
+POS_CLOSED = "closed"      # позиция закрыта, ждёт сброса в idle
+
+POS_TRANSITIONS: Dict[str, frozenset] = {
+    POS_IDLE: frozenset({POS_PENDING, POS_OPEN}),       # open напрямую — позиция найдена на бирже
+    POS_PENDING: frozenset({POS_OPEN, POS_IDLE}),       # fill / отмена или таймаут
+    POS_OPEN: frozenset({POS_CLOSING, POS_CLOSED}),
+    POS_CLOSING: frozenset({POS_OPEN, POS_CLOSED}),     # добор после частичного закрытия / полное закрытие
+    POS_CLOSED: frozenset({POS_IDLE}),
+}
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+class OrderState:
+    """Ордер на вход: биржевой ordId и наш clOrdId."""
+
+    __slots__ = ("order_id", "cl_ord_id")
+
+    def __init__(self):
+        self.order_id: Optional[int] = None
+        self.cl_ord_id: Optional[str] = None
+
+    def clear(self) -> None:
+        self.order_id = None
+        self.cl_ord_id = None
+
+    def __repr__(self) -> str:
+        return f"OrderState({self.order_id}, {self.cl_ord_id})"
+
+
+class PositionState:
+    """Состояние одной стороны символа. Переходы только по POS_TRANSITIONS."""
+
+    __slots__ = (
+        "symbol", "pos_side", "state", "order",
+        "leverage", "margin_vol", "vol_usdt", "vol_assets", "entry_price", "contracts",
+        "pos_id", "trade_id", "c_time",
+    )
+
+    def __init__(self, symbol: str, pos_side: str):
+        self.symbol = symbol
+        self.pos_side = pos_side
+        self.state = POS_IDLE
+        self.order = OrderState()
+        self.leverage: Optional[int] = None
+        self.margin_vol: Optional[float] = None
+        self.vol_usdt: Optional[float] = None
+        self.vol_assets: Optional[float] = None
+        self.entry_price: Optional[float] = None
+        self.contracts: float = 0.0
+        self.pos_id: Optional[str] = None
+        self.trade_id: Optional[str] = None
+        self.c_time: Optional[int] = None
+
+    @property
+    def in_position(self) -> bool:
+        return self.state in (POS_OPEN, POS_CLOSING)
+
+    @property
+    def pending_open(self) -> bool:
+        return self.state == POS_PENDING
+
+    def can(self, new_state: str) -> bool:
+        return new_state in POS_TRANSITIONS[self.state]
+
+    def transition(self, new_state: str) -> None:
+        if new_state not in POS_TRANSITIONS[self.state]:
+            raise InvalidTransition(f"{self.symbol} {self.pos_side}: {self.state} -> {new_state}")
+        self.state = new_state
+
+    def snapshot(self) -> "PositionState":
+        """Копия для отчётов (исходный объект сбрасывается и переиспользуется)."""
+        copy = PositionState(self.symbol, self.pos_side)
+        for name in self.__slots__:
+            setattr(copy, name, getattr(self, name))
+        copy.order = OrderState()
+        copy.order.order_id = self.order.order_id
+        copy.order.cl_ord_id = self.order.cl_ord_id
+        return copy
+
+    def __repr__(self) -> str:
+        return f"PositionState({self.symbol}, {self.pos_side}, {self.state})"
+
+
+class SymbolState:
+    """Спецификация инструмента и обе стороны позиции символа."""
+
+    __slots__ = ("symbol", "spec", "long", "short")
+
+    def __init__(self, symbol: str, spec: Optional[InstrumentSpec] = None):
+        self.symbol = symbol
+        self.spec = spec
+        self.long: Optional[PositionState] = None
+        self.short: Optional[PositionState] = None
+
+    def side(self, pos_side: str) -> Optional[PositionState]:
+        pos_side = pos_side.upper()
+        if pos_side == "LONG":
+            return self.long
+        if pos_side == "SHORT":
+            return self.short
+        return None
+
+    def reset_side(self, pos_side: str) -> PositionState:
+        """Новое idle-состояние стороны."""
+        pos = PositionState(self.symbol, pos_side.upper())
+        if pos.pos_side == "LONG":
+            self.long = pos
+        elif pos.pos_side == "SHORT":
+            self.short = pos
+        else:
+            raise ValueError(f"unknown pos_side {pos_side!r}")
+        return pos
+
+    def sides(self) -> Iterator[PositionState]:
+        if self.long is not None:
+            yield self.long
+        if self.short is not None:
+            yield self.short
+
+
+def any_in_position(position_vars: Dict[str, SymbolState]) -> bool:
+    return any(pos.in_position for symbol_state in position_vars.values() for pos in symbol_state.sides())
@@ -1,11 +1,17 @@
 import aiohttp
 import asyncio
 import time
-from typing import Callable, Dict, List, Set
+from typing import Callable, Dict, List, Set, Optional, Tuple
 from b_context import BotContext
 from c_log import ErrorHandler
 from c_utils import safe_float, safe_int, safe_round
+from c_events import OrderEventBus, OKX_ORDER_STATES, EVENT_FILLED, EVENT_CLOSED
+from c_pnl import FillsPnlEngine
+from c_pipeline import SignalPipeline
+from c_state import PositionState, SymbolState, POS_OPEN, POS_CLOSING, POS_CLOSED
+from a_config import PNL_FILLS_WAIT, PNL_RECONCILE_DELAY, CLOSE_REPORT_WORKERS, CLOSE_REPORT_QUEUE_SIZE
 from API.OKX.okx import OkxFuturesClient
+from API.OKX.okx_ws import OkxPrivateWs
 
 
 class PositionCleaner():
@@ -17,7 +23,9 @@ class PositionCleaner():
         pnl_report: Callable,
         okx_client: OkxFuturesClient,
         format_message: Callable,
-        chat_id: str
+        chat_id: str,
+        event_bus: Optional[OrderEventBus] = None,
+        pnl_engine: Optional[FillsPnlEngine] = None
     ):
         self.context = context
         info_handler.wrap_foreign_methods(self)
@@ -27,6 +35,19 @@ class PositionCleaner():
         self.pnl_report = pnl_report
         self.format_message = format_message
         self.chat_id = chat_id
+        self.event_bus = event_bus or OrderEventBus()
+        self.pnl_engine = pnl_engine or FillsPnlEngine()
+        self._reconcile_tasks: Set[asyncio.Task] = set()
+        # порядок обновлений позиции: последний применённый uTime и момент последнего WS-пуша по (symbol, pos_side)
+        self._pos_utime: Dict[Tuple[str, str], int] = {}
+        self._ws_updated: Dict[Tuple[str, str], float] = {}
+        # отчёты о закрытии — отдельной очередью со своими воркерами, цикл синхронизации их не ждёт
+        self.close_reports = SignalPipeline(
+            info_handler=info_handler,
+            stages=[("close_report", self.report_closes, CLOSE_REPORT_WORKERS)],
+            queue_size=CLOSE_REPORT_QUEUE_SIZE
+        )
+        self._reporting = True
 
     def reset_position_vars(
             self,
@@ -36,28 +57,131 @@ class PositionCleaner():
         self.set_pos_defaults(
             symbol=symbol,
             pos_side=pos_side,
-            instruments_data=None,
+            instruments=None,
             reset_flag=True
         )
 
     async def reset_if_needed(
             self,
-            pos_data: dict,
+            pos: PositionState,
+            symbol: str,
+            pos_side: str,
+            closes: Optional[list] = None
+        ):
+        """
+        closes — сборщик закрытий текущего тика синхронизации: закрытие добавляется в него,
+        а в очередь отчётов уходит пачкой (submit_closes). Без него — отправляется сразу.
+        """
+        if pos.in_position:
+            pos.transition(POS_CLOSED)
+            self.event_bus.publish(EVENT_CLOSED, symbol, pos_side, {"order_id": pos.order.order_id})
+            # снимок до сброса: отчёт строится по нему в воркере, а позиция освобождается сразу
+            item = (symbol, pos_side, pos.snapshot())
+            self.reset_position_vars(symbol, pos_side)
+            if closes is not None:
+                closes.append(item)
+            else:
+                await self.submit_closes([item])
+
+    async def submit_closes(self, closes: list) -> None:
+        if not closes:
+            return
+        if self._reporting:
+            self.close_reports.start()
+            await self.close_reports.submit(closes)
+        else:
+            # очередь уже остановлена (завершение итерации) — отчёт на месте
+            await self.report_closes(closes)
+
+    async def report_closes(self, closes: list) -> None:
+        """
+        Воркер очереди close_reports: пачка закрытий одного тика.
+        PnL из fill-ов — параллельно по всем, оставшиеся — одним проходом по истории позиций,
+        затем отчёты расходятся по каждому закрытию.
+        """
+        results = list(await asyncio.gather(*(
+            self.local_realized_pnl(symbol, pos_side, pos) for symbol, pos_side, pos in closes
+        )))
+        from_fills = [realized is not None for realized in results]
+
+        pending = [idx for idx, realized in enumerate(results) if realized is None]
+        if pending:
+            remote = await self.okx_client.get_realized_pnl_many([
+                {
+                    "symbol": closes[idx][0],
+                    "direction": closes[idx][1].upper(),
+                    "start_time": closes[idx][2].c_time,
+                    "pos_id": closes[idx][2].pos_id,
+                }
+                for idx in pending
+            ])
+            for idx, realized in zip(pending, remote):
+                results[idx] = realized
+
+        await asyncio.gather(*(
+            self.pnl_report(
+                symbol=symbol,
+                pos_side=pos_side,
+                pos=pos,
+                get_realized_pnl=self.okx_client.get_realized_pnl,
+                format_message=self.format_message,
+                chat_id=self.chat_id,
+                realized=realized
+            )
+            for (symbol, pos_side, pos), realized in zip(closes, results)
+        ))
+
+        for (symbol, pos_side, pos), realized, local in zip(closes, results, from_fills):
+            if local:
+                task = asyncio.create_task(self.reconcile_pnl(symbol, pos_side, pos, realized))
+                self._reconcile_tasks.add(task)
+                task.add_done_callback(self._reconcile_tasks.discard)
+
+    async def stop_reporting(self, timeout: float = 5.0) -> None:
+        """Дожидается начатых отчётов (не дольше timeout) и гасит воркеры и сверки."""
+        self._reporting = False
+        await self.close_reports.drain(timeout)
+        await self.close_reports.stop()
+        for task in list(self._reconcile_tasks):
+            task.cancel()
+
+    async def local_realized_pnl(
+            self,
+            symbol: str,
+            pos_side: str,
+            pos: PositionState
+        ) -> Optional[dict]:
+        """PnL закрытой позиции из fill-ов; None — считать по истории позиций."""
+        await self.pnl_engine.wait_flat(symbol, pos_side, PNL_FILLS_WAIT)
+        symbol_state = self.context.position_vars.get(symbol)
+        spec = symbol_state.spec if symbol_state is not None else None
+        return self.pnl_engine.settle(
+            symbol,
+            pos_side,
+            ct_val=safe_float(getattr(spec, "ctVal", None), 1.0),
+            leverage=pos.leverage
+        )
+
+    async def reconcile_pnl(
+            self,
             symbol: str,
-            pos_side: str
+            pos_side: str,
+            pos: PositionState,
+            local: dict
         ):
-        if bool(pos_data.get("in_position", False)):
-            try:
-                await self.pnl_report(
-                    symbol=symbol,
-                    pos_side=pos_side,
-                    pos_data=pos_data,
-                    get_realized_pnl=self.okx_client.get_realized_pnl,
-                    format_message=self.format_message,
-                    chat_id=self.chat_id
-                )   
-            finally:                
-                self.reset_position_vars(symbol, pos_side)
+        """Ленивая сверка с positions-history: расхождение только логируется."""
+        await asyncio.sleep(PNL_RECONCILE_DELAY)
+        remote = await self.okx_client.get_realized_pnl(
+            symbol=symbol,
+            direction=pos_side.upper(),
+            start_time=pos.c_time,
+            end_time=int(time.time() * 1000),
+            pos_id=pos.pos_id
+        )
+        if remote and abs(remote.get("pnl_usdt", 0.0) - local.get("pnl_usdt", 0.0)) > 0.01:
+            self.info_handler.debug_info_notes(
+                f"[pnl reconcile] {symbol} {pos_side}: fills {local.get('pnl_usdt')} vs history {remote.get('pnl_usdt')}"
+            )
             
 
 class Synchronizer(PositionCleaner):
@@ -70,13 +194,22 @@ class Synchronizer(PositionCleaner):
         okx_client: OkxFuturesClient,
         format_message: Callable,
         positions_update_frequency: float,
-        chat_id: str
+        chat_id: str,
+        positions_stream: Optional[OkxPrivateWs] = None,
+        reconcile_frequency: Optional[float] = None,
+        event_bus: Optional[OrderEventBus] = None
     ):
-        super().__init__(context, info_handler, set_pos_defaults, pnl_report, okx_client, format_message, chat_id)       
+        super().__init__(context, info_handler, set_pos_defaults, pnl_report, okx_client, format_message, chat_id, event_bus)       
         info_handler.wrap_foreign_methods(self)
   
         self.positions_update_frequency = positions_update_frequency
-        self._first_update_done = False
+        self.reconcile_frequency = reconcile_frequency or positions_update_frequency
+        self.positions_stream = positions_stream
+        self.first_update = asyncio.Event()  # первая сверка позиций прошла
+
+        if positions_stream is not None:
+            positions_stream.add_handler("positions", self.on_ws_positions)
+            positions_stream.add_handler("orders", self.on_ws_orders)
 
     @staticmethod
     def unpack_position_info(position: dict) -> dict:
@@ -93,7 +226,9 @@ class Synchronizer(PositionCleaner):
                 "entry_price": None,
                 "trade_id": None,
                 "notional_usd": None,
-                "leverage": None
+                "leverage": None,
+                "pos_id": None,
+                "u_time": None
             }
 
         symbol = str(position.get("instId", "N/A")).upper()
@@ -109,16 +244,18 @@ class Synchronizer(PositionCleaner):
             "notional_usd": abs(safe_float(position.get("notionalUsd"), 0.0)),
             "leverage": abs(safe_int(position.get("lever"), 1)),
             "c_time": safe_int(position.get("cTime"), None),
+            "pos_id": str(position.get("posId") or "") or None,
+            "u_time": safe_int(position.get("uTime"), None),
         }
 
     def update_active_position(
             self,
             symbol: str,
-            symbol_data: dict,
+            symbol_state: SymbolState,
             pos_side: str,
             info: dict,
         ):
-        ctVal = safe_float(symbol_data.get("spec", {}).get("ctVal"), 1.0)
+        ctVal = safe_float(getattr(symbol_state.spec, "ctVal", None), 1.0)
 
         entry_price = safe_float(info.get("entry_price"))
         contracts = safe_float(info.get("contracts"))
@@ -127,11 +264,12 @@ class Synchronizer(PositionCleaner):
         vol_usdt = safe_float(info.get("notional_usd"))
         cur_time = info.get("c_time") or int(time.time() * 1000)
 
-        pos_data = symbol_data.get(pos_side, {})
-        margin_vol = safe_float(pos_data.get("margin_vol"))
+        pos = symbol_state.side(pos_side)
+        margin_vol = safe_float(pos.margin_vol)
         vol_assets = contracts * ctVal
 
-        if not pos_data.get("in_position"):
+        was_in_position = pos.in_position
+        if not was_in_position:
             body = {
                 "symbol": symbol,
                 "pos_side": pos_side,
@@ -148,26 +286,122 @@ class Synchronizer(PositionCleaner):
                 is_print=True
             )
 
-        pos_data.update({
-            "c_time": cur_time,
-            "trade_id": trade_id,
-            "entry_price": entry_price,
-            "in_position": True,
-            "margin_vol": margin_vol,
-            "vol_usdt": vol_usdt,
-            "vol_assets": vol_assets,
-            "leverage": leverage
-        })
+        if not was_in_position:
+            pos.transition(POS_OPEN)
+        elif contracts < pos.contracts and pos.state == POS_OPEN:
+            pos.transition(POS_CLOSING)
+        elif contracts > pos.contracts and pos.state == POS_CLOSING:
+            pos.transition(POS_OPEN)
+
+        pos.c_time = cur_time
+        pos.trade_id = trade_id
+        pos.pos_id = info.get("pos_id")
+        pos.entry_price = entry_price
+        pos.contracts = contracts
+        pos.margin_vol = margin_vol
+        pos.vol_usdt = vol_usdt
+        pos.vol_assets = vol_assets
+        pos.leverage = leverage
+
+        if not was_in_position:
+            self.event_bus.publish(EVENT_FILLED, symbol, pos_side, {"order_id": pos.order.order_id})
+
+
+    def is_stale(self, key: Tuple[str, str], info: Optional[dict], requested_at: Optional[float] = None) -> bool:
+        """
+        Обновление позиции устарело: REST-снимок запрошен до последнего WS-пуша по ней,
+        либо uTime старше уже применённого.
+        """
+        if requested_at is not None and self._ws_updated.get(key, 0.0) > requested_at:
+            return True
+        u_time = info.get("u_time") if info else None
+        last = self._pos_utime.get(key)
+        return u_time is not None and last is not None and u_time < last
 
+    async def apply_position(
+        self,
+        symbol: str,
+        pos_side: str,
+        info: dict,
+        closes: Optional[list] = None
+    ) -> None:
+        """Применяет состояние одной позиции (symbol, pos_side) к локальным данным."""
+        u_time = info.get("u_time")
+        if u_time is not None:
+            key = (symbol, pos_side)
+            self._pos_utime[key] = max(u_time, self._pos_utime.get(key, u_time))
+        symbol_state = self.context.position_vars.get(symbol)
+        pos = symbol_state.side(pos_side) if symbol_state is not None else None
+        if pos is None:
+            return
+
+        contracts = info.get("contracts", 0.0)
+        if isinstance(contracts, (float, int)) and contracts > 0:
+            self.update_active_position(
+                symbol=symbol,
+                symbol_state=symbol_state,
+                pos_side=pos_side,
+                info=info
+            )
+        else:
+            await self.reset_if_needed(
+                pos=pos,
+                symbol=symbol,
+                pos_side=pos_side,
+                closes=closes
+            )
+
+    async def on_ws_positions(self, arg: dict, positions: List[Dict]) -> None:
+        """
+        Push канала positions приватного WS. Приходят только изменившиеся позиции
+        (закрытая — с pos == "0"), поэтому отсутствующие в пуше позиции не трогаем.
+        """
+        self.okx_client.leverage.observe(positions)
+        closes = []
+        try:
+            for position in positions:
+                if not position:
+                    continue
+                self.pnl_engine.on_position(position)
+                info = self.unpack_position_info(position)
+                symbol, pos_side = info["symbol"], info["pos_side"]
+                if symbol not in self.context.position_vars:
+                    continue
+                key = (symbol, pos_side)
+                if self.is_stale(key, info):
+                    continue
+                self._ws_updated[key] = time.monotonic()
+                await self.apply_position(symbol, pos_side, info, closes)
+        finally:
+            await self.submit_closes(closes)
+
+    async def on_ws_orders(self, arg: dict, orders: List[Dict]) -> None:
+        """
+        Push канала orders приватного WS: fill-ы — в PnL-движок, fill / partial-fill / cancel — в шину событий.
+        """
+        for order in orders:
+            kind = OKX_ORDER_STATES.get(order.get("state"))
+            if not kind:
+                continue
+            symbol = str(order.get("instId", "")).upper()
+            pos_side = str(order.get("posSide", "")).upper()
+            if symbol in self.context.position_vars:
+                self.pnl_engine.on_order(order)
+            self.event_bus.publish(kind, symbol, pos_side, order)
 
     async def update_positions(
         self,  
         target_symbols: Set[str],
         positions: List[Dict],
+        requested_at: Optional[float] = None,
     ) -> None:
         """
         Обновляет данные о позициях для указанной стратегии и символов.
+        Закрытия тика собираются и уходят в отчёты одной пачкой.
+        requested_at (time.monotonic() до запроса) — позиции, по которым после него пришёл WS-пуш,
+        снимок не трогает: он старее пуша.
         """
+        closes = []
         try:
             # --- Словарь актуальных позиций по символу+стороне ---
             active_positions = {}
@@ -182,43 +416,30 @@ class Synchronizer(PositionCleaner):
 
             # --- Сначала сброс: пройтись по локальным данным и убрать те позиции, которых нет в active_positions ---
             for symbol in target_symbols:
-                symbol_data = self.context.position_vars.get(symbol, {})
-                for pos_side in ("LONG", "SHORT"):
-                    pos_data = symbol_data.get(pos_side, {})
-                    if not pos_data:
-                        continue
+                symbol_state = self.context.position_vars.get(symbol)
+                if symbol_state is None:
+                    continue
+                for pos in list(symbol_state.sides()):
+                    pos_side = pos.pos_side
                     if (symbol, pos_side) not in active_positions:
+                        if self.is_stale((symbol, pos_side), None, requested_at):
+                            continue
                         # на бирже нет позиции → сбрасываем локальную
                         await self.reset_if_needed(
-                            pos_data=pos_data,
+                            pos=pos,
                             symbol=symbol,
-                            pos_side=pos_side
+                            pos_side=pos_side,
+                            closes=closes
                         )
 
             # --- Теперь обновление / установка активных позиций ---
             for (symbol, pos_side), info in active_positions.items():
-                contracts = info.get("contracts", 0.0)
-                symbol_data = self.context.position_vars.get(symbol, {})
-                pos_data = symbol_data.get(pos_side, {})
-                if not pos_data:
+                if self.is_stale((symbol, pos_side), info, requested_at):
                     continue
+                await self.apply_position(symbol, pos_side, info, closes)
 
-                if isinstance(contracts, (float, int)) and contracts > 0:
-                    self.update_active_position(
-                        symbol=symbol,
-                        symbol_data=symbol_data,
-                        pos_side=pos_side,
-                        info=info
-                    )
-                else:
-                    await self.reset_if_needed(
-                        pos_data=pos_data,
-                        symbol=symbol,
-                        pos_side=pos_side
-                    )
-
-            if not self._first_update_done:
-                self._first_update_done = True
+            if not self.first_update.is_set():
+                self.first_update.set()
                 self.info_handler.debug_info_notes("[update_positions] First update done, flag set")
 
         except KeyError as e:
@@ -229,6 +450,8 @@ class Synchronizer(PositionCleaner):
             self.info_handler.debug_error_notes(
                 f"[Unexpected Error]: {e}"
             )
+        finally:
+            await self.submit_closes(closes)
 
     async def refresh_positions_state(
         self
@@ -239,12 +462,14 @@ class Synchronizer(PositionCleaner):
         try:
             symbols_set = set(self.context.position_vars.keys())
             if not symbols_set:
-                # print("not symbols_set")
+                # сверять нечего — считаем синхронизированным
+                self.first_update.set()
                 return
             
             if not self.context.session or self.context.session.closed:
                 return
             
+            requested_at = time.monotonic()
             positions = await self.okx_client.fetch_positions(session=self.context.session)
 
             if positions is None:
@@ -252,10 +477,12 @@ class Synchronizer(PositionCleaner):
                     f"No 'data' field in positions response."
                 )
                 return
+            self.okx_client.leverage.observe(positions)
 
             await self.update_positions(
                 symbols_set,
-                positions
+                positions,
+                requested_at
             )
         
         except aiohttp.ClientError as e:
@@ -268,6 +495,15 @@ class Synchronizer(PositionCleaner):
             )
             
     async def refresh_positions_task(self) -> None:
+        """
+        REST-опрос позиций. Пока жив приватный WS — только редкая сверка (reconcile_frequency),
+        при падении сокета возвращаемся к частому опросу.
+        """
+        last_refresh = 0.0
         while not self.context.stop_bot and not self.context.stop_bot_iteration:
-            await self.refresh_positions_state()
+            stream_alive = self.positions_stream is not None and self.positions_stream.is_alive()
+            interval = self.reconcile_frequency if (stream_alive and self.first_update.is_set()) else self.positions_update_frequency
+            if time.monotonic() - last_refresh >= interval:
+                last_refresh = time.monotonic()
+                await self.refresh_positions_state()
             await asyncio.sleep(self.positions_update_frequency)
\ No newline at end of file
@@ -0,0 +1,102 @@
+import asyncio
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from c_log import ErrorHandler
+
+
+class TimerWheel:
+    """
+    Хешированное колесо таймеров: один таск на все отложенные действия (таймауты ордеров).
+    arm / disarm — O(1). Истёкшие за тик записи отдаются в on_expire одной пачкой,
+    чтобы отмены можно было слать батчами. Ошибка в on_expire логируется и колесо крутится дальше.
+    """
+
+    def __init__(
+        self,
+        info_handler: ErrorHandler,
+        on_expire: Callable[[List[Tuple[Hashable, Any]]], Awaitable],
+        tick: float = 0.1,
+        slots: int = 512,
+    ):
+        self.info_handler = info_handler
+        self.on_expire = on_expire
+        self.tick = tick
+        self.slots_count = slots
+        self._slots: List[Dict[Hashable, List[Any]]] = [{} for _ in range(slots)]  # key -> [rounds, payload]
+        self._index: Dict[Hashable, int] = {}  # key -> номер слота
+        self._cursor = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._index
+
+    def arm(self, key: Hashable, delay: float, payload: Any = None) -> None:
+        """Взводит таймер key через delay секунд (повторный arm перевзводит)."""
+        self.disarm(key)
+        ticks = max(1, math.ceil(delay / self.tick))
+        slot = (self._cursor + ticks) % self.slots_count
+        rounds = (ticks - 1) // self.slots_count
+        self._slots[slot][key] = [rounds, payload]
+        self._index[key] = slot
+
+    def peek(self, key: Hashable) -> Any:
+        """payload взведённого таймера (без снятия) или None."""
+        slot = self._index.get(key)
+        return None if slot is None else self._slots[slot][key][1]
+
+    def disarm(self, key: Hashable) -> Any:
+        """Снимает таймер. Возвращает payload или None, если таймера не было."""
+        slot = self._index.pop(key, None)
+        if slot is None:
+            return None
+        return self._slots[slot].pop(key)[1]
+
+    def _advance(self) -> List[Tuple[Hashable, Any]]:
+        self._cursor = (self._cursor + 1) % self.slots_count
+        bucket = self._slots[self._cursor]
+        expired = []
+        for key, entry in list(bucket.items()):
+            if entry[0] > 0:
+                entry[0] -= 1
+                continue
+            del bucket[key]
+            del self._index[key]
+            expired.append((key, entry[1]))
+        return expired
+
+    async def _run(self) -> None:
+        next_tick = time.monotonic() + self.tick
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            expired = []
+            # догоняем пропущенные тики, если цикл подтормозил
+            while next_tick <= time.monotonic():
+                expired.extend(self._advance())
+                next_tick += self.tick
+            if expired:
+                try:
+                    await self.on_expire(expired)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # единственный таск всех таймаутов: падать нельзя, иначе ордера больше не истекают
+                    self.info_handler.debug_error_notes(
+                        f"[TIMERS] on_expire failed for {len(expired)} timers: {e}", is_print=True
+                    )
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
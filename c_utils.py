@@ -1,7 +1,8 @@
-from typing import List, Dict, Any, Optional, Callable
+from typing import Any, Optional, Callable
 from datetime import datetime
 from a_config import SLIPPAGE_PCT, PRECISION
 from c_log import ErrorHandler, TZ_LOCATION
+from c_state import PositionState
 import math
 from decimal import Decimal, getcontext
 import time
@@ -125,34 +126,6 @@ class Utils:
         info_handler.wrap_foreign_methods(self)
         self.info_handler = info_handler   
 
-    @staticmethod
-    def parse_precision(data: List[Dict[str, Any]], symbol: str) -> Optional[Dict[str, Any]]:
-        for info in data:
-            if info.get("instId") == symbol:
-                # print(f"spec: {info}")
-                def count_precision(value_str: str) -> int:
-                    return len(value_str.split(".")[1]) if "." in value_str else 0
-
-                ctVal_str = str(info.get("ctVal", "1"))
-                lot_sz_str = str(info.get("lotSz", "1"))
-                tick_sz_str = str(info.get("tickSz", "1"))
-
-                # пробуем взять плечо
-                max_leverage = (
-                    info.get("lever") or
-                    info.get("maxLeverage") or
-                    info.get("leverUp")  # иногда в разных режимах так называется
-                )
-
-                return {
-                    "ctVal": float(ctVal_str),
-                    "lotSz": float(lot_sz_str),
-                    "contract_precision": count_precision(lot_sz_str),
-                    "price_precision": count_precision(tick_sz_str),
-                    "max_leverage": int(max_leverage) if max_leverage else None
-                }
-        return None
-
     def contract_calc(
         self,
         margin_size: float,
@@ -183,24 +156,28 @@ class Utils:
         self,
         symbol: str,
         pos_side: str,
-        pos_data: dict,
+        pos: PositionState,
         get_realized_pnl: Callable,
         format_message: Callable,
-        chat_id: str
+        chat_id: str,
+        realized: Optional[dict] = None
     ):
         """
-        Отчет по реализованному PnL через API, с поправкой на плечо.
+        Отчет по реализованному PnL: посчитанный локально из fill-ов (realized) либо через API.
         Не использует текущую цену.
         """
         cur_time = int(time.time() * 1000)
-        start_time = pos_data.get("c_time")
+        start_time = pos.c_time
 
-        realized_pnl = await get_realized_pnl(
-            symbol=symbol,
-            direction=pos_side.upper(),
-            start_time=start_time,
-            end_time=cur_time
-        )
+        realized_pnl = realized
+        if realized_pnl is None:
+            realized_pnl = await get_realized_pnl(
+                symbol=symbol,
+                direction=pos_side.upper(),
+                start_time=start_time,
+                end_time=cur_time,
+                pos_id=pos.pos_id
+            )
 
         if realized_pnl is None:
             return
@@ -1,25 +1,39 @@
 import asyncio
+import hashlib
 import time
-import aiohttp
 from pprint import pprint
 from typing import *
 from a_config import *
 from b_context import BotContext
-from b_constructor import PositionVarsSetup
+from b_accounts import TradingAccount
 from b_network import NetworkManager
 from TG.tg_parser import TgBotWatcherAiogram
 from TG.tg_notifier import TelegramNotifier
-from TG.tg_buttons import TelegramUserInterface
-from API.OKX.okx import OkxFuturesClient, ApiResponseValidator
+from TG.tg_buttons import TelegramUserInterface, validate_user_config
+from API.OKX.okx import OkxFuturesClient, ApiResponseValidator, client_order_id
+from API.OKX.okx_ws import OkxTickerStream
+from API.OKX.okx_limits import OkxRateLimiter
 from aiogram import Bot, Dispatcher
 
-from c_sync import Synchronizer
+from c_events import EVENT_FILLED, EVENT_PARTIAL, EVENT_CANCELED
+from c_timer import TimerWheel
+from c_pipeline import SignalPipeline
+from c_instruments import (
+    InstrumentRegistry, InstrumentSpec, InstrumentRefresher, InstrumentChange,
+    INSTRUMENT_ADDED, INSTRUMENT_SUSPENDED, INSTRUMENT_DELISTED
+)
+from c_snapshot import load_snapshot, save_snapshot
+from c_startup import StartupOrchestrator
+from c_shards import ShardPool, ShardWorkerLink, ShardNotifier
+from c_market_hub import SharedMarketReader, SharedMarketWriter, HubTickerStream
+from c_state import PositionState, SymbolState, POS_IDLE, POS_PENDING
 from c_log import ErrorHandler, log_time
 from c_utils import Utils, fix_price_scale, to_human_digit
 import traceback
 import os
 
 SIGNAL_REPEAT_TIMEOUT = 5
+SIGNAL_STARTUP_STEPS = ("users", "instruments", "positions")  # без них сигнал не исполнить
 
 def force_exit(*args):
     print("💥 Принудительное завершение процесса")
@@ -35,75 +49,56 @@ class Core:
         self.tg_watcher = None
         self.notifier = None
         self.tg_interface = None  # позже инициализируем
-        self.positions_task = None
-        self.instruments_data = {}
-
-    async def _start_user_context(self, chat_id: int):
-        """Инициализация юзер-контекста (сессии, клиентов, стримов и контролов)"""
-
-        user_context = self.context.users_configs[chat_id]
-        okx_cfg        = user_context.get("config", {}).get("OKX", {})
-        api_key        = okx_cfg.get("api_key")
-        api_secret     = okx_cfg.get("api_secret")
-        api_passphrase = okx_cfg.get("api_passphrase")
-
-        print("♻️ Пересоздаём user_context сессию")
-
-        # --- Чистим старый connector ---
-        if hasattr(self, "connector") and self.connector:
-            await self.connector.shutdown_session()
-            self.connector = None
-
-        # --- Создаём новый connector ---
-        self.connector = NetworkManager(
-            context=self.context,
-            info_handler=self.info_handler,
-        )
-
-        # --- OKX client ---
-        self.okx_client = OkxFuturesClient(
-            api_key=api_key,
-            api_secret=api_secret,
-            api_passphrase=api_passphrase,
-            context=self.context,
-            info_handler=self.info_handler
-        )
-
-        # --- Вспомогалки ---
+        self.accounts: Dict[Any, TradingAccount] = {}  # chat_id -> контекст исполнения аккаунта
+        self.connector = None  # сессия под публичные запросы (инструменты, цены)
+        self.okx_client = None  # клиент без ключей: только публичные endpoint-ы
         self.utils = Utils(info_handler=self.info_handler)
-
-        self.pos_setup = PositionVarsSetup(
-            context=self.context,
+        self.ticker_stream = None
+        self.order_timers = None
+        self.signal_pipeline = None
+        self.rate_limiter = OkxRateLimiter()  # общий на все клиенты: публичные лимиты считаются по IP
+        self.instruments = InstrumentRegistry()
+        self.instrument_refresher = None
+        self.snapshot_task = None
+        self.market_snapshot_loaded = False
+        self.market_hub: Optional[SharedMarketReader] = None  # сегмент хаба рыночных данных (MARKET_HUB_NAME)
+        self.market_hub_name: str = MARKET_HUB_NAME  # в шарде — сегмент, который назвал родитель
+        self.market_hub_checked_at = 0.0
+        self.market_writer: Optional[SharedMarketWriter] = None  # родитель с шардами без внешнего хаба: свой сегмент
+        self.shard_chat_ids: List[Any] = []
+        self.startup = None
+        self.shards: Optional[ShardPool] = None  # родитель: процессы-шарды с аккаунтами (SHARD_WORKERS > 0)
+        self.shard_link: Optional[ShardWorkerLink] = None  # процесс-шард: канал к родителю
+
+    def _start_account(self, chat_id: Any) -> TradingAccount:
+        """Контекст исполнения аккаунта: сессии, клиент, приватный WS, позиции, очередь сигналов."""
+        account = TradingAccount(
+            root=self.context,
             info_handler=self.info_handler,
-            parse_precision=self.utils.parse_precision
-        )
-
-        self.sync = Synchronizer(
-            context=self.context,
-            info_handler=self.info_handler,
-            set_pos_defaults=self.pos_setup.set_pos_defaults,
+            chat_id=chat_id,
+            rate_limiter=self.rate_limiter,
             pnl_report=self.utils.pnl_report,
-            okx_client=self.okx_client,
             format_message=self.notifier.format_message,
-            positions_update_frequency=POSITIONS_UPDATE_FREQUENCY,
-            chat_id=chat_id
+            on_order_event=self._on_order_event,
+            execute=self._stage_execute
         )
+        self.accounts[chat_id] = account
+        return account
 
-        # --- Заворачиваем внешние методы в обработчик ошибок ---
-        self.info_handler.wrap_foreign_methods(self)
-
-    async def cancel_existing_order(self, session: aiohttp.ClientSession, symbol: str, pos_data: dict) -> None:
+    async def cancel_existing_order(self, account: TradingAccount, symbol: str, pos: PositionState) -> None:
         """
         Отменяет текущий алгоритмический ордер, если он существует (order_id).
-        После попытки отмены сбрасывает pos_data['order_id'] в None.
+        После попытки отмены сбрасывает pos.order.order_id в None.
         """
-        order_id = pos_data.get("order_id", 1)
+        order_id = pos.order.order_id
+        cl_ord_id = pos.order.cl_ord_id
 
         try:
-            cancel_resp = await self.okx_client.cancel_order(
-                session=session,
+            cancel_resp = await account.okx_client.cancel_order(
+                session=account.context.session,
                 instId=symbol,
-                ordId=order_id
+                ordId=str(order_id) if order_id else None,
+                clOrdId=None if order_id else cl_ord_id
             )
             self.info_handler.debug_info_notes(
                 f"[INFO] Order {order_id} cancelled for {symbol}: {cancel_resp}", is_print=True
@@ -113,69 +108,127 @@ class Core:
                 f"[ERROR] Failed to cancel order {order_id} for {symbol}: {e}", is_print=True
             )
         finally:
-            pos_data["order_id"] = None            
+            pos.order.order_id = None
         
-    async def complete_until_cancel(
+    def arm_order_timeout(
         self,
-        session: aiohttp.ClientSession,
-        chat_id: str,
+        account: TradingAccount,
         fin_settings: dict,
         symbol: str,
         pos_side: str,
-        pos_data: dict,
+        pos: PositionState,
         last_timestamp: int
     ):
         """
-        Ожидает открытия позиции до ORDER_TIMEOUT.
-        Если позиция не открыта за это время, логирует таймаут и отменяет ордер.
-        """   
-        try:     
-            self.info_handler.debug_info_notes(f"Запуск ожидания позиции для {symbol}", is_print=True)
-            
-            # start_time = time.time()
-            start_time = last_timestamp / 1000
-            while ((time.time() - start_time) < fin_settings.get("order_timeout")) \
-                and (not self.context.stop_bot) and not self.context.stop_bot_iteration:
-                if pos_data.get("in_position"):
-                    break
-                await asyncio.sleep(0.1)
-
-            if not pos_data.get("in_position"):
-                # Таймаут — позиция так и не открылась
-                market_order_failed_body = {
-                    "symbol": symbol,
-                    "pos_side": pos_side,
-                    "reason": "TIME-OUT",
-                    "cur_time": int(time.time() * 1000),
-                }
-                self.notifier.format_message(
-                    chat_id=chat_id,
-                    marker="market_order_failed",
-                    body=market_order_failed_body,
-                    is_print=True
-                )
+        Взводит таймаут лимитного ордера в колесе таймеров (ORDER_TIMEOUT от момента сигнала).
+        Fill / cancel снимают таймер через шину order_events (_on_order_event),
+        истёкшие ордера отменяются пачкой в _on_orders_expired.
+        """
+        self.info_handler.debug_info_notes(f"Запуск ожидания позиции для {symbol}", is_print=True)
 
-        finally:            
-            await self.cancel_existing_order(
-                session=session,
-                symbol=symbol,
-                pos_data=pos_data
+        if pos.in_position:
+            # fill успел прийти раньше, чем взвели таймер — снимаем остаток сразу
+            asyncio.create_task(self.cancel_existing_order(account, symbol, pos))
+            return
+
+        delay = last_timestamp / 1000 + fin_settings.get("order_timeout") - time.time()
+        self.order_timers.arm((account.chat_id, symbol, pos_side), delay, {"pos": pos})
+
+    def _on_order_event(self, chat_id: str, event) -> None:
+        """Подписчик шины: fill / partial-fill / cancel снимают таймаут ордера за O(1)."""
+        if event.kind not in (EVENT_FILLED, EVENT_PARTIAL, EVENT_CANCELED):
+            return
+        key = (chat_id, event.symbol, event.pos_side)
+        if self.order_timers is None:
+            return
+        payload = self.order_timers.peek(key)
+        if payload is None:
+            return
+        pos: PositionState = payload["pos"]
+        # события WS orders несут ordId — чужие ордера по тому же символу игнорируем
+        if "ordId" in event.data and event.data["ordId"] != str(pos.order.order_id):
+            return
+        self.order_timers.disarm(key)
+
+        if event.kind == EVENT_CANCELED:
+            pos.order.order_id = None
+            if pos.pending_open:
+                pos.transition(POS_IDLE)
+            self.notifier.format_message(
+                chat_id=chat_id,
+                marker="market_order_failed",
+                body={
+                    "symbol": event.symbol,
+                    "pos_side": event.pos_side,
+                    "reason": "CANCELED",
+                    "cur_time": int(time.time() * 1000),
+                },
+                is_print=True
             )
+        elif event.kind == EVENT_FILLED and "ordId" in event.data:
+            # ордер исполнен полностью — отменять нечего
+            pos.order.order_id = None
+        else:
+            # позиция открылась (возможно частично) — снимаем остаток ордера
+            account = self.accounts.get(chat_id)
+            if account is not None:
+                asyncio.create_task(self.cancel_existing_order(account, event.symbol, pos))
+
+    async def _on_orders_expired(self, expired: list) -> None:
+        """Колесо таймеров: отмена всех истёкших за тик ордеров пачкой (по аккаунтам)."""
+        by_chat: Dict[Any, list] = {}
+        for (chat_id, symbol, pos_side), payload in expired:
+            by_chat.setdefault(chat_id, []).append((symbol, pos_side, payload["pos"]))
+
+        for chat_id, items in by_chat.items():
+            account = self.accounts.get(chat_id)
+            if account is None:
+                continue
+            orders = []
+            for symbol, pos_side, pos in items:
+                if not pos.in_position:
+                    # Таймаут — позиция так и не открылась
+                    self.notifier.format_message(
+                        chat_id=chat_id,
+                        marker="market_order_failed",
+                        body={
+                            "symbol": symbol,
+                            "pos_side": pos_side,
+                            "reason": "TIME-OUT",
+                            "cur_time": int(time.time() * 1000),
+                        },
+                        is_print=True
+                    )
+                order_id = pos.order.order_id
+                if order_id:
+                    orders.append({"instId": symbol, "ordId": str(order_id)})
+                elif pos.order.cl_ord_id:
+                    orders.append({"instId": symbol, "clOrdId": pos.order.cl_ord_id})
+                pos.order.order_id = None
+                if pos.pending_open:
+                    pos.transition(POS_IDLE)
+
+            if orders:
+                cancel_resp = await account.okx_client.cancel_batch_orders(session=account.context.session, orders=orders)
+                self.info_handler.debug_info_notes(
+                    f"[INFO] Timed-out orders cancelled ({len(orders)}): {cancel_resp}", is_print=True
+                )
 
     async def pre_order_template(
         self,
-        session: aiohttp.ClientSession,
+        account: TradingAccount,
         chat_id: str,
         fin_settings: dict,
         symbol: str,
         pos_side: str,
         leverage: int,
-        symbol_data: dict,
+        symbol_state: SymbolState,
         entry_price:float,
         take_profit: float,
         stop_loss: float,
         debug_label: str,
-        market_label: str = "limit"
+        market_label: str = "limit",
+        deadline: Optional[float] = None
     ):
         """
         Темплейт под установку плеча, расчёт контрактов и размещение лимитного ордера с TP/SL.
@@ -185,22 +238,24 @@ class Core:
         int_margin_mode = fin_settings.get("margin_mode", 1)
         margin_mode = "isolated" if int_margin_mode == 1 else "cross"
 
-        # === 1. Установка плеча ===
-        lev_resp = await self.okx_client.set_leverage(
-            session=session,
-            instId=symbol,
-            lever=leverage,
-            mgnMode=margin_mode,
-            posSide=pos_side
-        )
-        # print(lev_resp)
+        # === 1. Установка плеча (только если отличается от известного; параллельно с расчётом) ===
+        leverage_task = None
+        if not account.okx_client.leverage.is_set(symbol, margin_mode, pos_side, leverage):
+            leverage_task = asyncio.create_task(account.okx_client.set_leverage(
+                session=account.context.session,
+                instId=symbol,
+                lever=leverage,
+                mgnMode=margin_mode,
+                posSide=pos_side,
+                deadline=deadline
+            ))
 
         # === 2. Расчёт контрактов ===
-        spec = symbol_data.get("spec", {})
-        ctVal = spec.get("ctVal")
-        lotSz = spec.get("lotSz")
-        price_precision = spec.get("price_precision")
-        contract_precision = spec.get("contract_precision")
+        spec: InstrumentSpec = symbol_state.spec
+        ctVal = spec.ctVal
+        lotSz = spec.lotSz
+        price_precision = spec.price_precision
+        contract_precision = spec.contract_precision
 
         contracts = self.utils.contract_calc(
             margin_size=fin_settings.get("margin_size"),
@@ -212,6 +267,9 @@ class Core:
             debug_label=debug_label
         )
 
+        if leverage_task is not None:
+            await leverage_task
+
         if not contracts or contracts <= 0:
             failed_reason = f"{debug_label}: Invalid contracts calculated: {contracts}"
             order_failed_body = {
@@ -233,18 +291,11 @@ class Core:
         tp_px = to_human_digit(round(float(take_profit), price_precision))
         sl_px = to_human_digit(round(float(stop_loss), price_precision))
 
-        print(
-            f"[DEBUG price rounding] precision={price_precision} | "
-            f"entry: raw={entry_price} -> rounded={entry_px} | "
-            f"tp: raw={take_profit} -> rounded={tp_px} | "
-            f"sl: raw={stop_loss} -> rounded={sl_px}"
-        )
-
         return entry_px, tp_px, sl_px, contracts
 
     async def place_order_template(
         self,
-        session: aiohttp.ClientSession,
+        account: TradingAccount,
         chat_id: str,
         fin_settings: dict,
         symbol: str,
@@ -253,30 +304,33 @@ class Core:
         take_profit: str,
         stop_loss: str,
         pos_side: str,
-        symbol_data: dict,
-        pos_data: dict,
-        market_label: str = "limit"
+        symbol_state: SymbolState,
+        pos: PositionState,
+        msg_key: str,
+        market_label: str = "limit",
+        deadline: Optional[float] = None
     ):
             
         debug_label = f"[{symbol}_{pos_side}]"
 
-        # Если уже есть активный order_id — выходим
-        if pos_data.get("order_id"):
-            return False 
+        # Если уже есть активный ордер — выходим
+        if pos.order.order_id or not pos.can(POS_PENDING):
+            return False
 
         pre_order_resp = await self.pre_order_template(
-            session=session,
+            account=account,
             chat_id=chat_id,
             fin_settings=fin_settings,
             symbol=symbol,
             pos_side=pos_side,
             leverage=leverage,
-            symbol_data=symbol_data,
+            symbol_state=symbol_state,
             entry_price=entry_price,
             take_profit=take_profit,
             stop_loss=stop_loss,
             debug_label=debug_label,
-            market_label=market_label
+            market_label=market_label,
+            deadline=deadline
         )
 
         if not pre_order_resp or len(pre_order_resp) != 4:
@@ -291,8 +345,14 @@ class Core:
         int_margin_mode = fin_settings.get("margin_mode", 1)
         margin_mode = "isolated" if int_margin_mode == 1 else "cross"
 
-        place_order_resp = await self.okx_client.place_order(
-            session=session,
+        # clOrdId из ключа сигнала: ретрай / хедж не создадут второй ордер
+        cl_ord_id = client_order_id(msg_key, symbol, pos_side)
+        pos.order.cl_ord_id = cl_ord_id
+
+        place_order_resp = await account.okx_client.place_order_idempotent(
+            sessions=[account.context.session, account.context.hedge_session],
+            client_ord_id=cl_ord_id,
+            hedge_delay=HEDGE_ORDER_DELAY_MS / 1000 if HEDGE_ORDER_DELAY_MS else None,
             instId=symbol,
             sz=contracts,
             side=side,
@@ -306,7 +366,8 @@ class Core:
             sl_trigger_px=sl_px,
             sl_ord_px="-1",               # маркет на закрытие позиции
             tpTriggerPxType="last",       # срабатывает по последней сделке
-            slTriggerPxType="last"
+            slTriggerPxType="last",
+            deadline=deadline             # сигнал протух — ретраить незачем
         )
 
         data_list = ApiResponseValidator.get_data_list(place_order_resp)
@@ -332,9 +393,12 @@ class Core:
 
         # === 4. Сохраняем ID и timestamp ===
         try:
-            pos_data["order_id"] = int(ord_id)
+            pos.order.order_id = int(ord_id)
         except (ValueError, TypeError):
-            pos_data["order_id"] = None
+            pos.order.order_id = None
+        # fill мог прийти через WS раньше ответа на place_order — тогда позиция уже open
+        if pos.can(POS_PENDING):
+            pos.transition(POS_PENDING)
 
         # Логируем успешное размещение лимитного ордера
         order_sent_body = {
@@ -353,26 +417,29 @@ class Core:
 
     async def complete_signal_task(
         self,
-        chat_id: str,
+        account: TradingAccount,
         fin_settings: dict,
         parsed_msg: dict,
-        context_vars: dict,
         last_timestamp: int,
+        msg_key: str,
     ):
+        chat_id = account.chat_id
         symbol = parsed_msg["symbol"]
         pos_side = parsed_msg["pos_side"]
-        symbol_data = context_vars[symbol]
-        pos_data = symbol_data[pos_side]
+        symbol_state = account.context.position_vars[symbol]
+        pos = symbol_state.side(pos_side)
 
-        leverage = pos_data["leverage"]
+        leverage = pos.leverage
         entry_price = parsed_msg["entry_price"]
         take_profit = parsed_msg["take_profit"]
         stop_loss = parsed_msg["stop_loss"]
 
         market_label = "limit" if not fin_settings.get("market_order") else "market"
+        # После order_timeout от момента сигнала запросы по нему бессмысленны
+        order_deadline = last_timestamp / 1000 + fin_settings.get("order_timeout", 60)
         # Выполняем торговый шаблон
         place_order_response: bool = await self.place_order_template(
-                session=self.context.session,
+                account=account,
                 chat_id=chat_id,
                 fin_settings=fin_settings,
                 symbol=symbol,
@@ -381,68 +448,91 @@ class Core:
                 take_profit=take_profit,
                 stop_loss=stop_loss,
                 pos_side=pos_side,
-                symbol_data=symbol_data,
-                pos_data=pos_data,
-                market_label=market_label
+                symbol_state=symbol_state,
+                pos=pos,
+                msg_key=msg_key,
+                market_label=market_label,
+                deadline=order_deadline
             )
         
         if market_label == "limit" and place_order_response:
-            # Создаём задачу для слежения и отмены
-            asyncio.create_task(
-                self.complete_until_cancel(
-                    session=self.context.session,
-                    chat_id=chat_id,
-                    fin_settings=fin_settings,
-                    symbol=symbol,
-                    pos_side=pos_side,
-                    pos_data=pos_data,
-                    last_timestamp=last_timestamp
-                )
+            # Таймаут ордера — в общем колесе таймеров
+            self.arm_order_timeout(
+                account=account,
+                fin_settings=fin_settings,
+                symbol=symbol,
+                pos_side=pos_side,
+                pos=pos,
+                last_timestamp=last_timestamp
             )
 
+    async def _current_price(self, symbol: str) -> Optional[float]:
+        """Свежая цена из хаба / потока тикеров; нет её (или seqlock хаба не успокоился) — REST."""
+        feed = self.market_hub if self.market_hub and self.market_hub.alive(MARKET_HUB_MAX_SILENCE) else self.ticker_stream
+        try:
+            cur_price = feed.get_price(symbol, PRICE_MAX_AGE) if feed else None
+        except TimeoutError as e:
+            self.info_handler.debug_error_notes(f"[HUB] {symbol}: {e}, using REST", is_print=True)
+            cur_price = None
+        if cur_price is None:
+            cur_price = await self.okx_client.get_current_price(symbol) or self.context.prices.get(symbol)
+        return cur_price
+
     async def handle_signal(
         self,
-        chat_id: str,
+        account: TradingAccount,
         parsed_msg: dict,
-        context_vars: dict,        
         symbol: str,
         pos_side: str,
         last_timestamp: str,
+        msg_key: str,
         lock
     ) -> None:
         
+        # Ждём только нужные исполнению шаги (аккаунты, инструменты, первая сверка позиций), не весь старт
+        startup = self.startup
+        if startup is not None and not await startup.wait(SIGNAL_STARTUP_STEPS, timeout=SIGNAL_STARTUP_TIMEOUT):
+            self.info_handler.debug_error_notes(
+                f"[handle_signal] {account.chat_id} {symbol} {pos_side} dropped: startup not ready in {SIGNAL_STARTUP_TIMEOUT}s",
+                is_print=True
+            )
+            return
+
         async with lock:
-            # Проверка и установка дефолтов
-            if not self.pos_setup.set_pos_defaults(symbol, pos_side, self.instruments_data):
+            # Листинг мог смениться, пока сигнал стоял в очереди
+            if not self.instruments.is_tradable(symbol):
+                self.info_handler.debug_info_notes(f"[handle_signal] Skip: {symbol} is not tradable")
                 return
 
-            # Ждём первого апдейта позиций
-            while not self.sync._first_update_done:
-                await asyncio.sleep(0.1)
+            # Проверка и установка дефолтов
+            if not account.pos_setup.set_pos_defaults(symbol, pos_side, self.instruments):
+                return
 
-            pos_data = context_vars.get(symbol, {}).get(pos_side, {})
+            chat_id = account.chat_id
+            symbol_state = account.context.position_vars[symbol]
+            pos = symbol_state.side(pos_side)
 
             # Защита 1: уже в позиции (по данным биржи)
-            if pos_data.get("in_position"):
+            if pos.in_position:
                 self.info_handler.debug_info_notes(
                     f"[handle_signal] Skip: already in_position {symbol} {pos_side}"
                 )
                 return
 
             # --- Достаём фин настройки ---
-            fin_settings = self.context.users_configs[chat_id]["config"]["fin_settings"]
+            fin_settings = account.fin_settings()
 
             # Обновляем плечо
-            max_leverage = context_vars.get(symbol, {}).get("spec", {}).get("max_leverage", 20)
+            max_leverage = symbol_state.spec.max_leverage or 20
             leverage = min(
                 fin_settings.get("leverage") or parsed_msg.get("leverage"),
                 max_leverage
             )
-            pos_data["leverage"] = leverage
-            pos_data["margin_vol"] = fin_settings.get("margin_size")
+            pos.leverage = leverage
+            pos.margin_vol = fin_settings.get("margin_size")
 
-            # Форматируем цены
-            cur_price = self.context.prices.get(symbol)
+            # Форматируем цены (свежая цена из хаба / WS, если устарела — REST)
+            cur_price = await self._current_price(symbol)
             for key in ("entry_price", "take_profit", "stop_loss"):
                 parsed_msg[key] = fix_price_scale(parsed_msg.get(key), cur_price)
 
@@ -460,160 +550,498 @@ class Core:
 
             # Запуск ордера
             await self.complete_signal_task(
-                chat_id=chat_id,
+                account=account,
                 fin_settings=fin_settings,
                 parsed_msg=parsed_msg,
-                context_vars=context_vars,
-                last_timestamp=last_timestamp
+                last_timestamp=last_timestamp,
+                msg_key=msg_key
             )
 
-    async def _run_iteration(self) -> None:
-        """Одна итерация торговли (от старта до стопа)."""
-        print("[CORE] Iteration started")
+    # --- Стадии конвейера сигналов ---
+    async def _stage_dedupe(self, signal_item: tuple):
+        message, last_timestamp = signal_item
+        if not (message and last_timestamp):
+            self.info_handler.debug_info_notes("[pipeline] invalid signal item, skipping")
+            return None
+
+        # стабильный между перезапусками ключ (hash() рандомизирован per-process) — из него строится clOrdId
+        msg_key = f"{last_timestamp}_{hashlib.sha1(message.encode('utf-8')).hexdigest()[:16]}"
+        if msg_key in self.context.tg_timing_cache:
+            return None
+        self.context.tg_timing_cache.add(msg_key)
+        return [(message, last_timestamp, msg_key)]
+
+    async def _stage_parse(self, item: tuple):
+        message, last_timestamp, msg_key = item
+        parsed_msg, all_present = self.tg_watcher.parse_tg_message(message)
+        if not all_present:
+            self.info_handler.debug_info_notes(f"[pipeline] parse error: {parsed_msg}")
+            return None
+        if parsed_msg.get("symbol") in BLACK_SYMBOLS:
+            return None
+        return [(parsed_msg, last_timestamp, msg_key)]
+
+    async def _stage_route(self, item: tuple):
+        """
+        Раскладывает сигнал по очередям всех аккаунтов сразу (без ожидания), отсеивая протухшие
+        и уже взятые в работу. Каждый аккаунт исполняет своими воркерами — число аккаунтов
+        не добавляет задержки первому.
+        """
+        # сигналы, пришедшие до START (бэклог), ждут, пока появятся аккаунты / процессы-шарды
+        if self.startup is not None:
+            await self.startup.wait(("users", "shards"))
+
+        parsed_msg, last_timestamp, msg_key = item
+        diff_sec = time.time() - (last_timestamp / 1000)
+
+        # приостановленные / делистнутые символы отсекаем до любой работы с ордерами
+        symbol = parsed_msg.get("symbol")
+        if self.instruments and not self.instruments.is_tradable(symbol):
+            self.info_handler.debug_info_notes(f"[route] Skip: {symbol} is not tradable")
+            return None
+
+        # аккаунты в процессах-шардах: замки и order_timeout проверит route шарда
+        if self.shards:
+            self.shards.dispatch(item)
+            return None
+
+        for chat_id, account in list(self.accounts.items()):
+            order_timeout = account.fin_settings().get("order_timeout", 60)
+            if diff_sec >= order_timeout:
+                continue
 
-        # --- Перебор пользователей ---
-        for num, (chat_id, user_cfg) in enumerate(self.context.users_configs.items(), start=1):
-            print(f"[DEBUG] Processing user {num} | chat_id: {chat_id}")
-            
-            if num > 1:
+            # если замок уже существует для (аккаунт, msg_key), пропускаем
+            lock_key = f"{chat_id}:{msg_key}"
+            if lock_key in self.context.signal_locks:
+                continue
+
+            # замок живёт в signal_locks (TTLCache) SIGNAL_CACHE_TTL: повтор сигнала в этом окне пропускается
+            cur_lock = self.context.signal_locks[lock_key] = asyncio.Lock()
+            dispatched = account.dispatch({
+                "account": account,
+                "parsed_msg": dict(parsed_msg),  # handle_signal правит цены in-place — копия на аккаунт
+                "symbol": parsed_msg.get("symbol"),
+                "pos_side": parsed_msg.get("pos_side"),
+                "last_timestamp": last_timestamp,
+                "msg_key": msg_key,
+                "lock": cur_lock,
+            })
+            if not dispatched:
+                self.info_handler.debug_error_notes(
+                    f"[route] signal queue of {chat_id} is full, {symbol} skipped", is_print=True
+                )
+        return None
+
+    async def _fetch_all_prices(self):
+        prices = await self.okx_client.get_all_current_prices(session=self.context.session)
+        if prices:
+            now = time.time()
+            self.context.prices.update(prices)
+            self.context.prices_ts.update(dict.fromkeys(prices, now))
+            if self.market_writer:
+                self.market_writer.write_prices(prices, now)
+
+    async def _save_market_snapshot(self):
+        if not self.instruments or self.shard_link or self.market_hub:
+            return  # снимок пишет только родительский процесс без хаба
+        await asyncio.to_thread(save_snapshot, MARKET_SNAPSHOT_PATH, self.instruments, dict(self.context.prices))
+
+    async def _revalidate_market_data(self, from_snapshot: bool):
+        """Фоновая сверка снимка с биржей (дифф в тот же реестр) и перезапись файла."""
+        try:
+            if from_snapshot:
+                await self.instrument_refresher.refresh_once()
+                await self._fetch_all_prices()
+            await self._save_market_snapshot()
+        except Exception as e:
+            self.info_handler.debug_error_notes(f"[ERROR] market snapshot revalidation: {e}", is_print=True)
+
+    async def _on_instruments_changed(self, changes: List[InstrumentChange]):
+        """Реакция на дифф листинга: новые символы — в поток цен (и в сегмент шардов), снятые с торгов — в лог."""
+        if self.market_writer:
+            self.market_writer.write_instruments(list(self.instruments))
+        added = [ch.inst_id for ch in changes if ch.kind == INSTRUMENT_ADDED and ch.spec.is_tradable()]
+        if added and self.ticker_stream:
+            await self.ticker_stream.track(added)
+
+        for ch in changes:
+            if ch.kind in (INSTRUMENT_SUSPENDED, INSTRUMENT_DELISTED):
+                self.info_handler.debug_info_notes(f"[instruments] {ch.inst_id} {ch.kind}", is_print=True)
+
+        self.info_handler.debug_info_notes(f"[instruments] diff applied: {len(changes)} changes")
+
+    async def _stage_execute(self, job: dict):
+        started = time.perf_counter()
+        await self.handle_signal(**job)
+        if self.shard_link:
+            self.shard_link.exec_latency.add(time.perf_counter() - started)
+
+    async def _startup_users(self):
+        """Контексты исполнения для всех пользователей с полным конфигом (здесь или в процессах-шардах)."""
+        sharded = SHARD_WORKERS > 0 and self.shard_link is None
+        chat_ids = []
+        for chat_id, user_cfg in self.context.users_configs.items():
+            if not validate_user_config(user_cfg):
                 self.info_handler.debug_info_notes(
-                    f"Бот настроен только для одного пользователя! "
-                    f"Для текущего chat_id: {chat_id} опция торговли недоступна. {log_time()}"
+                    f"Конфиг пользователя {chat_id} не заполнен — торговля для него не запускается. {log_time()}"
                 )
                 continue
 
-            try:
-                # --- Запуск контекста пользователя ---
-                print(f"[DEBUG] Starting user context for chat_id: {chat_id}")
-                await self._start_user_context(chat_id=chat_id)
-
-                # --- Дебаг OKX настройки ---
-                user_config: Dict[str, Any] = self.context.users_configs.get(chat_id, {})
-                okx_cfg: Dict[str, Any] = user_config.get("config", {}).get("OKX", {})
-                print(f"[DEBUG] OKX config for user {chat_id}: {okx_cfg}")
-
-                required_keys = ["api_key", "api_secret", "api_passphrase"]
-                for key in required_keys:
-                    if key not in okx_cfg or okx_cfg[key] is None:
-                        print(f"[WARNING] OKX {key} not set for user {chat_id}")
+            if sharded:
+                chat_ids.append(chat_id)
+                continue
 
+            try:
+                self._start_account(chat_id=chat_id)
             except Exception as e:
                 err_msg = f"[ERROR] Failed to start user context for chat_id {chat_id}: {e}"
                 self.info_handler.debug_error_notes(err_msg, is_print=True)
                 continue
 
+        if sharded and chat_ids:
+            # процессы стартуют в шаге shards, когда рыночные данные уже в сегменте
+            self.shard_chat_ids = chat_ids
+            self.shards = ShardPool(
+                context=self.context,
+                info_handler=self.info_handler,
+                target=shard_worker_main,
+                workers=SHARD_WORKERS,
+                health_interval=SHARD_HEALTH_INTERVAL,
+                on_texts=self.notifier.enqueue
+            )
+
+        self.info_handler.debug_info_notes(f"[CORE] accounts started: {len(self.accounts)}, in shards: {len(chat_ids)}")
+
+        # --- Заворачиваем внешние методы в обработчик ошибок ---
+        self.info_handler.wrap_foreign_methods(self)
+
+    async def _startup_market(self):
+        """Сессия и клиент без ключей под публичные данные (инструменты, цены)."""
+        self.connector = NetworkManager(
+            context=self.context,
+            info_handler=self.info_handler,
+        )
+        self.okx_client = OkxFuturesClient(
+            api_key=None,
+            api_secret=None,
+            api_passphrase=None,
+            context=self.context,
+            info_handler=self.info_handler,
+            rate_limiter=self.rate_limiter
+        )
+
+    async def _startup_shards(self):
+        """
+        Процессы-шарды: рынок берут из общей памяти (внешнего хаба или сегмента родителя),
+        своих запросов инструментов и потока тикеров не поднимают.
+        """
+        if not self.shards:
+            return
+        if self.market_writer:
+            self._publish_market(self.market_writer)
+            hub_name = self.market_writer.shm.name
+        else:
+            hub_name = self.market_hub_name if self.market_hub else ""
+        self.shards.start(self.shard_chat_ids, hub_name)
+
+    def _publish_market(self, writer: SharedMarketWriter) -> None:
+        """Реестр и текущие цены (со своими метками времени) — в сегмент перед стартом шардов."""
+        writer.write_instruments(list(self.instruments))
+        by_ts: Dict[float, Dict[str, float]] = {}
+        for inst_id, price in self.context.prices.items():
+            by_ts.setdefault(self.context.prices_ts.get(inst_id, 0.0), {})[inst_id] = price
+        for ts, batch in by_ts.items():
+            writer.write_prices(batch, ts)
+        writer.beat()
+
+    async def _startup_ping(self):
         self.connector.start_ping_loop()
+        for account in self.accounts.values():
+            account.connector.start_ping_loop()
+
+    def _attach_market_hub(self) -> bool:
+        """Подключение к сегменту хаба: инструменты и цены берутся оттуда, свои запросы и поток тикеров не нужны."""
+        name = self.market_hub_name
+        try:
+            hub = SharedMarketReader.attach(name)
+        except (FileNotFoundError, ValueError) as e:
+            self.info_handler.debug_error_notes(f"[HUB] segment {name!r} unavailable ({e}), using REST/WS", is_print=True)
+            return False
+        if not hub.alive(MARKET_HUB_MAX_SILENCE):
+            hub.close()
+            self.info_handler.debug_error_notes(f"[HUB] segment {name!r} is stale, using REST/WS", is_print=True)
+            return False
+        self.market_hub = hub
+        self.instruments = hub.registry()
+        self.info_handler.debug_info_notes(f"[HUB] attached {name!r}: {len(self.instruments)} instruments")
+        return True
+
+    async def _hub_specs(self) -> List[InstrumentSpec]:
+        """Таблица хаба; хаб молчит — листинг по REST, чтобы реестр не застыл на мёртвом сегменте."""
+        if self.market_hub.alive(MARKET_HUB_MAX_SILENCE):
+            return self.market_hub.specs()
+        return InstrumentRegistry.parse_raw(await self.okx_client.get_instruments(session=self.context.session))
+
+    async def _check_market_hub(self) -> None:
+        """
+        Хаб упал или перезапущен (старый сегмент отвязан, создан новый): переподключаемся к сегменту
+        по имени. Не вышло — поднимаем свой поток тикеров; хаб вернулся — гасим его.
+        """
+        hub = self.market_hub
+        if not hub.alive(MARKET_HUB_MAX_SILENCE):
+            now = time.monotonic()
+            if now - self.market_hub_checked_at < MARKET_HUB_REATTACH_INTERVAL:
+                return
+            self.market_hub_checked_at = now
+            try:
+                fresh = SharedMarketReader.attach(self.market_hub_name)
+            except (FileNotFoundError, ValueError):
+                fresh = None
+            if fresh is None or not fresh.alive(MARKET_HUB_MAX_SILENCE):
+                if fresh is not None:
+                    fresh.close()
+                if self.ticker_stream is None:
+                    self.info_handler.debug_error_notes(
+                        f"[HUB] segment {self.market_hub_name!r} is silent, starting own ticker stream", is_print=True
+                    )
+                    self.ticker_stream = OkxTickerStream(
+                        url=OKX_WS_PUBLIC_URL,
+                        context=self.context,
+                        info_handler=self.info_handler
+                    )
+                    await self.ticker_stream.track(self.instruments.inst_ids())
+                    self.ticker_stream.start()
+                return
+            # реестр не подменяем: дифф с новой таблицей сделает refresher через _hub_specs
+            self.market_hub = fresh
+            hub.close()
+            self.info_handler.debug_info_notes(f"[HUB] re-attached {self.market_hub_name!r}", is_print=True)
+
+        if self.ticker_stream is None:
+            return
+        stream, self.ticker_stream = self.ticker_stream, None
+        await stream.stop()
+        self.info_handler.debug_info_notes("[HUB] hub is back, own ticker stream stopped")
+
+    async def _startup_snapshot(self):
+        """Инструменты и цены со снимка на диске (если свежий) или из хаба рыночных данных."""
+        self.market_snapshot_loaded = False
+        if self.market_hub_name and self._attach_market_hub():
+            return
+        snapshot = await asyncio.to_thread(load_snapshot, MARKET_SNAPSHOT_PATH, MARKET_SNAPSHOT_TTL)
+        if snapshot:
+            self.instruments, prices, saved_at = snapshot
+            # цены из снимка помечены временем снимка: для ордера они устаревшие, только для старта
+            self.context.prices.update(prices)
+            self.context.prices_ts.update(dict.fromkeys(prices, saved_at))
+            self.market_snapshot_loaded = True
+            self.info_handler.debug_info_notes(
+                f"[snapshot] loaded: {len(self.instruments)} instruments, age {time.time() - saved_at:.0f}s"
+            )
 
-        # --- Получаем инструменты с биржи ---
+    async def _startup_instruments(self):
+        if self.market_snapshot_loaded or self.market_hub:
+            return  # сверка с биржей — в фоне (_revalidate_market_data), у хаба — его забота
         try:       
-            self.instruments_data = await self.okx_client.get_instruments(session=self.context.session)
-            if self.instruments_data:
-                print(f"[DEBUG] Instruments fetched: {len(self.instruments_data)} items")
+            self.instruments = InstrumentRegistry.from_raw(
+                await self.okx_client.get_instruments(session=self.context.session)
+            )
+            if self.instruments:
+                self.info_handler.debug_info_notes(f"[instruments] fetched: {len(self.instruments)} items")
             else:
-                self.info_handler.debug_error_notes(f"[ERROR] Failed to fetch instruments: {e}", is_print=True)
+                self.info_handler.debug_error_notes("[ERROR] Failed to fetch instruments: empty response", is_print=True)
 
         except Exception as e:
             self.info_handler.debug_error_notes(f"[ERROR] Failed to fetch instruments: {e}", is_print=True)
 
-        self.context.prices = await self.okx_client.get_all_current_prices(session=self.context.session)
+    async def _startup_prices(self):
+        if not self.market_snapshot_loaded and not self.market_hub:
+            await self._fetch_all_prices()
 
-        # --- Запуск наблюдателей ---
-        self.tg_watcher.register_handler(tag=TEG_ANCHOR)
-        # /
-        context_vars = self.context.position_vars
-        asyncio.create_task(self.sync.refresh_positions_task())
+    async def _startup_ticker_stream(self):
+        """
+        Живые цены через публичный WS (с хабом — не нужен: цены в общей памяти).
+        Родитель с шардами без хаба сам пишет цены в сегмент, который читают шарды.
+        """
+        if self.market_hub:
+            return
+        if self.shards:
+            self.market_writer = SharedMarketWriter.create(f"okx_bot_{os.getpid()}", MARKET_HUB_CAPACITY)
+            self.market_writer.write_instruments(list(self.instruments))  # слоты — до первых тикеров
+            self.ticker_stream = HubTickerStream(
+                url=OKX_WS_PUBLIC_URL,
+                context=self.context,
+                info_handler=self.info_handler,
+                writer=self.market_writer
+            )
+        else:
+            self.ticker_stream = OkxTickerStream(
+                url=OKX_WS_PUBLIC_URL,
+                context=self.context,
+                info_handler=self.info_handler
+            )
+        await self.ticker_stream.track(self.instruments.inst_ids())
+        self.ticker_stream.start()
+
+    async def _startup_refresher(self):
+        """Фоновое обновление листинга (дифф, без блокировки главного цикла)."""
+        if self.market_hub:
+            # хаб сам ходит на биржу: здесь только дифф его таблицы в локальный реестр
+            self.instrument_refresher = InstrumentRefresher(
+                context=self.context,
+                info_handler=self.info_handler,
+                registry=self.instruments,
+                fetch=self._hub_specs,
+                interval=MARKET_HUB_POLL_INTERVAL,
+                parse=list
+            )
+            self.instrument_refresher.subscribe(self._on_instruments_changed)
+            self.instrument_refresher.start()
+            return
+        self.instrument_refresher = InstrumentRefresher(
+            context=self.context,
+            info_handler=self.info_handler,
+            registry=self.instruments,
+            fetch=lambda: self.okx_client.get_instruments(session=self.context.session),
+            interval=INSTRUMENTS_REFRESH_FREQUENCY
+        )
+        self.instrument_refresher.subscribe(self._on_instruments_changed)
+        self.instrument_refresher.start()
+        self.snapshot_task = asyncio.create_task(self._revalidate_market_data(from_snapshot=self.market_snapshot_loaded))
+
+    async def _startup_private_ws(self):
+        await asyncio.gather(*(account.start_private_ws() for account in self.accounts.values()))
+        self.order_timers.start()
+
+    async def _startup_leverage(self):
+        """Кэш плеча аккаунтов из leverage-info — фоном, в готовность не входит (промах = обычный set_leverage)."""
+        inst_ids = [spec.inst_id for spec in self.instruments if spec.is_tradable()]
+        for account in self.accounts.values():
+            account.start_leverage_seed(inst_ids)
+
+    async def _startup_positions(self):
+        """Готово, когда у всех аккаунтов прошла первая сверка позиций."""
+        await asyncio.gather(*(account.start_positions() for account in self.accounts.values()))
 
-        instrume_update_interval = 300.0
-        last_instrume_time = time.monotonic()
+    async def _run_iteration(self) -> None:
+        """Одна итерация торговли (от старта до стопа)."""
+        print("[CORE] Iteration started")
 
-        # --- Основной цикл итерации ---
+        # --- Конвейер сигналов: принимает сообщения сразу, исполнение ждёт startup.ready ---
+        self.startup = StartupOrchestrator(info_handler=self.info_handler)
+        self.order_timers = TimerWheel(
+            info_handler=self.info_handler,
+            on_expire=self._on_orders_expired,
+            tick=ORDER_TIMER_TICK,
+            slots=ORDER_TIMER_SLOTS
+        )
+        # исполнение — в очередях аккаунтов (TradingAccount.signals), route раздаёт сигнал всем сразу.
+        # В процессе-шарде сигналы приходят от родителя уже разобранными — только route.
+        stages = [] if self.shard_link else [
+            ("dedupe", self._stage_dedupe, 1),
+            ("parse", self._stage_parse, 1),
+        ]
+        stages.append(("route", self._stage_route, 1))
+        self.signal_pipeline = SignalPipeline(
+            info_handler=self.info_handler,
+            stages=stages,
+            queue_size=PIPELINE_QUEUE_SIZE
+        )
+        self.signal_pipeline.start()
+        if self.shard_link:
+            self.shard_link.on_signal = self.signal_pipeline.submit
+        else:
+            self.tg_watcher.register_handler(tag=TEG_ANCHOR)
+            # сообщения, пришедшие до START (протухшие отсеет route по order_timeout)
+            backlog = self.tg_watcher.message_cache[-SIGNAL_PROCESSING_LIMIT:]
+            self.tg_watcher.message_cache.clear()
+            for signal_item in backlog:
+                await self.signal_pipeline.submit(signal_item)
+            self.tg_watcher.on_message = self.signal_pipeline.submit
+
+        # --- Старт: независимые шаги параллельно, по графу зависимостей ---
+        self.startup.add("users", self._startup_users)
+        self.startup.add("market", self._startup_market)
+        self.startup.add("snapshot", self._startup_snapshot)
+        self.startup.add("ping", self._startup_ping, deps=("users", "market"))
+        self.startup.add("instruments", self._startup_instruments, deps=("market", "snapshot"))
+        self.startup.add("prices", self._startup_prices, deps=("market", "snapshot"))
+        self.startup.add("ticker_stream", self._startup_ticker_stream, deps=("users", "instruments"))
+        self.startup.add("refresher", self._startup_refresher, deps=("instruments", "prices", "ticker_stream"))
+        self.startup.add("shards", self._startup_shards, deps=("users", "refresher"))
+        self.startup.add("private_ws", self._startup_private_ws, deps=("users",))
+        self.startup.add("positions", self._startup_positions, deps=("private_ws",))
+        self.startup.add("leverage", self._startup_leverage, deps=("users", "instruments"))
+        await self.startup.run()
+        self.info_handler.debug_info_notes(self.startup.report())
+
+        # --- Основной цикл итерации (сервисные задачи) ---
+        loop_lag = 0.0
+        health_at = report_at = time.monotonic()
         while not self.context.stop_bot_iteration and not self.context.stop_bot:
             try:
-                signal_tasks_val = self.context.message_cache[-SIGNAL_PROCESSING_LIMIT:] if self.context.message_cache else None
-                if not signal_tasks_val:
-                    await asyncio.sleep(MAIN_CYCLE_FREQUENCY)
-                    continue
-
-                for signal_item in signal_tasks_val:
-                    if not signal_item:
-                        continue
-
-                    message, last_timestamp = signal_item
-                    if not (message and last_timestamp):
-                        print("[DEBUG] Invalid signal item, skipping")
-                        continue
-
-                    msg_key = f"{last_timestamp}_{hash(message)}"
-                    if msg_key in self.context.tg_timing_cache:
-                        continue
-                    self.context.tg_timing_cache.add(msg_key)
-
-                    parsed_msg, all_present = self.tg_watcher.parse_tg_message(message)
-                    # print(f"[DEBUG] Parse msg: {parsed_msg}")
-                    if not all_present:
-                        print(f"[DEBUG] Parse error: {parsed_msg}")
-                        continue
-
-                    symbol = parsed_msg.get("symbol")
-                    pos_side = parsed_msg.get("pos_side")
-
-                    if symbol in BLACK_SYMBOLS:
-                        continue
-
-                    diff_sec = time.time() - (last_timestamp / 1000)
-
-                    for num, (chat_id, user_cfg) in enumerate(self.context.users_configs.items(), start=1):
-                        if num > 1:
-                            continue
-                        if diff_sec < user_cfg.get("fin_settings", {}).get("order_timeout", 60):
-
-                            # если замок уже существует для msg_key, пропускаем
-                            if msg_key in self.context.signal_locks:
-                                continue
-
-                            # создаём замок и оставляем его навсегда
-                            cur_lock = self.context.signal_locks[msg_key] = asyncio.Lock()
-
-                            # --- запускаем задачу напрямую ---
-                            asyncio.create_task(self.handle_signal(
-                                chat_id=chat_id,
-                                parsed_msg=parsed_msg,
-                                context_vars=context_vars,
-                                symbol=symbol,
-                                pos_side=pos_side,
-                                last_timestamp=last_timestamp,
-                                lock=cur_lock
-                            ))
+                # Telegram шлют задачи-отправители нотификатора; из шарда тексты пачкой уходят родителю
+                if self.shard_link:
+                    for chat_id in self.accounts:
+                        await self.notifier.send_report_batches(chat_id=chat_id)
 
+                now = time.monotonic()
+                if self.shard_link and now - health_at >= SHARD_HEALTH_INTERVAL:
+                    health_at = now
+                    self._report_shard_health(loop_lag)
+                if self.market_writer:
+                    self.market_writer.beat()
+                if self.market_hub:
+                    await self._check_market_hub()
+                if self.shards:
+                    self.shards.check()
+                    if now - report_at >= SHARD_REPORT_INTERVAL:
+                        report_at = now
+                        self.info_handler.debug_info_notes(self.shards.report())
             except Exception as e:
                 err_msg = f"[ERROR] main loop: {e}\n" + traceback.format_exc()
                 self.info_handler.debug_error_notes(err_msg, is_print=True)
 
             finally:
-                try:
-                    for num, (chat_id, user_cfg) in enumerate(self.context.users_configs.items(), start=1):
-                        if num > 1:
-                            continue
-                        await self.notifier.send_report_batches(chat_id=chat_id, batch_size=1)
-                except Exception as e:
-                    err_msg = f"[ERROR] main finally block: {e}\n" + traceback.format_exc()
-                    self.info_handler.debug_error_notes(err_msg, is_print=True)
-
-                now = time.monotonic()
-
-                # обновление кэша
-                if now - last_instrume_time >= instrume_update_interval:
-                    try:
-                        self.instruments_data = await self.okx_client.get_instruments(session=self.context.session)
-                        if not self.instruments_data:
-                            self.info_handler.debug_error_notes(f"[ERROR] Failed to fetch instruments: {e}", is_print=True)
-
-                    except Exception as e:
-                        self.info_handler.debug_error_notes(f"[ERROR] Failed to fetch instruments: {e}", is_print=True)
-
-                    last_instrume_time = now
-
+                slept_at = time.monotonic()
                 await asyncio.sleep(MAIN_CYCLE_FREQUENCY)
+                # насколько цикл событий опоздал разбудить — мера его загруженности
+                loop_lag = max(0.0, time.monotonic() - slept_at - MAIN_CYCLE_FREQUENCY)
+
+    def _report_shard_health(self, loop_lag: float) -> None:
+        self.shard_link.report_health({
+            "accounts": len(self.accounts),
+            "in_position": self.context.any_in_position(),
+            "loop_lag_ms": round(loop_lag * 1000, 2),
+            "queues": {chat_id: account.signals.queue_sizes() for chat_id, account in self.accounts.items()},
+            "ready": bool(self.startup and self.startup.ready.is_set()),
+        })
+
+    async def run_shard(self, link: ShardWorkerLink, users_configs: dict, hub_name: str = ""):
+        """
+        Процесс-шард: одна торговая итерация для своих аккаунтов, сигналы и стоп — от родителя.
+        Инструменты и цены — из сегмента hub_name (хаб или родитель), без своих публичных запросов.
+        """
+        self.shard_link = link
+        self.market_hub_name = hub_name or MARKET_HUB_NAME
+        self.context.users_configs = users_configs
+        self.context.queues_msg = {chat_id: [] for chat_id in users_configs}
+        self.notifier = ShardNotifier(context=self.context, info_handler=self.info_handler, link=link)
+
+        def stop():
+            self.context.stop_bot = True
+        link.on_stop = stop
+        link.start()
+
+        self.context.start_bot_iteration = True
+        try:
+            await self._run_iteration()
+        finally:
+            # последние тексты — родителю до закрытия канала
+            for chat_id in list(self.accounts):
+                await self.notifier.send_report_batches(chat_id=chat_id)
+            await self._shutdown_iteration(debug=False)
+            link.close()
 
 
     async def run_forever(self, debug: bool = True):
@@ -681,20 +1109,84 @@ class Core:
                 if debug: print("[CORE] Ожидание следующего START после STOP")
                 continue
 
+        # --- Досылаем уведомления ---
+        if isinstance(self.notifier, TelegramNotifier):
+            await self.notifier.stop()
+
         if debug: print("[CORE] run_forever finished")
 
     async def _shutdown_iteration(self, debug: bool = True):
         """Закрывает итерационные ресурсы и обнуляет инстансы."""
 
-        # --- Остановка цикла positions_flow_manager ---
-        if self.positions_task:
-            self.positions_task.cancel()
+        # --- Незавершённый старт ---
+        if self.startup:
+            await self.startup.cancel()
+            self.startup = None
+
+        # --- Конвейер сигналов ---
+        if self.tg_watcher:
+            self.tg_watcher.on_message = None
+        if self.signal_pipeline:
+            await self.signal_pipeline.stop()
+            self.signal_pipeline = None
+
+        # --- Процессы-шарды ---
+        if self.shards:
+            await self.shards.stop(timeout=SHARD_STOP_TIMEOUT)
+            self.shards = None
+
+        # --- Аккаунты: позиции, отчёты, очереди сигналов, приватные WS, сессии ---
+        accounts = list(self.accounts.values())
+        self.accounts = {}
+        if accounts:
+            results = await asyncio.gather(*(account.stop(debug=debug) for account in accounts), return_exceptions=True)
+            for account, result in zip(accounts, results):
+                if isinstance(result, Exception) and debug:
+                    print(f"[CORE] account {account.chat_id} stop error: {result}")
+
+        # --- Гасим колесо таймаутов ---
+        if self.order_timers:
+            await self.order_timers.stop()
+            self.order_timers = None
+
+        # --- Снимок рынка на диск ---
+        if self.snapshot_task:
+            self.snapshot_task.cancel()
             try:
-                await self.positions_task
+                await self.snapshot_task
             except asyncio.CancelledError:
+                pass
+            self.snapshot_task = None
+        try:
+            await asyncio.wait_for(self._save_market_snapshot(), timeout=5)
+        except Exception as e:
+            if debug:
+                print(f"[CORE] save snapshot error: {e}")
+
+        # --- Фоновое обновление инструментов ---
+        if self.instrument_refresher:
+            await self.instrument_refresher.stop()
+            self.instrument_refresher = None
+
+        # --- Сегмент хаба ---
+        if self.market_hub:
+            self.market_hub.close()
+            self.market_hub = None
+
+        # --- Ticker stream ---
+        if self.ticker_stream:
+            try:
+                await asyncio.wait_for(self.ticker_stream.stop(), timeout=5)
+            except Exception as e:
                 if debug:
-                    print("[CORE] positions_flow_manager cancelled")
-            self.positions_task = None
+                    print(f"[CORE] ticker_stream.stop() error: {e}")
+            self.ticker_stream = None
+
+        # --- Сегмент для шардов: после остановки шардов и потока, который в него пишет ---
+        if self.market_writer:
+            self.market_writer.close()
+            self.market_writer = None
+        self.shard_chat_ids = []
 
         # --- Connector ---
         if getattr(self, "connector", None):
@@ -705,19 +1197,24 @@ class Core:
                     print(f"[CORE] connector.shutdown_session() error: {e}")
             finally:
                 self.context.session = None
+                self.context.hedge_session = None
                 self.connector = None
 
         # --- Сброс прочих ссылок ---
         self.okx_client = None
-        self.sync = None
-        self.utils = None
-        self.pos_setup = None
-
-        self.context.position_vars = {}
+        self.context.accounts.clear()
 
         if debug:
             print("[CORE] Iteration shutdown complete")
 
+def shard_worker_main(conn, shard_id: int, users_configs: dict, hub_name: str = ""):
+    """Точка входа процесса-шарда (SHARD_WORKERS > 0): свой цикл событий и свои аккаунты."""
+    try:
+        asyncio.run(Core().run_shard(ShardWorkerLink(conn, shard_id), users_configs, hub_name))
+    except KeyboardInterrupt:
+        pass
+
+
 async def main():
     instance = Core()
     try:
@@ -0,0 +1,53 @@
+import c_cache
+from c_cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(monkeypatch, maxsize=3, ttl=10.0):
+    clock = Clock()
+    monkeypatch.setattr(c_cache.time, "monotonic", clock)
+    evicted = []
+    cache = TTLCache(maxsize=maxsize, ttl=ttl, on_evict=lambda key, value, reason: evicted.append((key, reason)))
+    return cache, clock, evicted
+
+
+def test_expired_entries_are_purged_from_head(monkeypatch):
+    cache, clock, evicted = make_cache(monkeypatch)
+    cache["a"] = 1
+    clock.now += 5
+    cache["b"] = 2
+    clock.now += 6
+    assert "a" not in cache and "b" in cache
+    cache.purge()
+    assert evicted == [("a", "expired")]
+    assert len(cache) == 1 and cache.metrics()["expired"] == 1
+
+
+def test_capacity_evicts_least_recently_used(monkeypatch):
+    cache, clock, evicted = make_cache(monkeypatch, maxsize=2)
+    cache["a"] = 1
+    cache["b"] = 2
+    assert cache.get("a") == 1  # a — в хвост
+    cache["c"] = 3
+    assert evicted == [("b", "capacity")]
+    assert "a" in cache and "c" in cache
+    assert cache.metrics()["evicted"] == 1
+
+
+def test_get_extends_ttl_and_counts_misses(monkeypatch):
+    cache, clock, _ = make_cache(monkeypatch)
+    cache["a"] = 1
+    clock.now += 8
+    assert cache.get("a") == 1
+    clock.now += 8
+    assert cache["a"] == 1
+    clock.now += 11
+    assert cache.get("a", "gone") == "gone"
+    assert cache.metrics()["hits"] == 2 and cache.metrics()["misses"] == 1
@@ -0,0 +1,47 @@
+import asyncio
+from c_events import OrderEventBus, EVENT_FILLED, EVENT_PARTIAL, EVENT_CANCELED
+
+SYMBOL = "BTC-USDT-SWAP"
+
+
+def test_wait_for_matching_order_event():
+    async def scenario():
+        bus = OrderEventBus()
+        seen = []
+        bus.subscribe(seen.append)
+        waiter = asyncio.create_task(bus.wait_for(
+            SYMBOL, "LONG", (EVENT_FILLED, EVENT_CANCELED), timeout=1,
+            match=lambda event: event.data.get("ordId") == "2"
+        ))
+        await asyncio.sleep(0)
+        assert bus.pending() == 1
+        bus.publish(EVENT_FILLED, SYMBOL, "SHORT", {"ordId": "2"})   # другая сторона
+        bus.publish(EVENT_PARTIAL, SYMBOL, "LONG", {"ordId": "2"})   # не тот тип
+        bus.publish(EVENT_FILLED, SYMBOL, "LONG", {"ordId": "1"})    # не тот ордер
+        bus.publish(EVENT_FILLED, SYMBOL, "LONG", {"ordId": "2"})
+        event = await waiter
+        return event, len(seen), bus.pending()
+
+    event, seen, pending = asyncio.run(scenario())
+    assert event.kind == EVENT_FILLED and event.data["ordId"] == "2"
+    assert seen == 4 and pending == 0
+
+
+def test_wait_for_times_out_and_cleans_up():
+    async def scenario():
+        bus = OrderEventBus()
+        event = await bus.wait_for(SYMBOL, "LONG", (EVENT_FILLED,), timeout=0.02)
+        return event, bus.pending(), bus._waiters
+
+    assert asyncio.run(scenario()) == (None, 0, {})
+
+
+def test_close_wakes_waiters_with_none():
+    async def scenario():
+        bus = OrderEventBus()
+        waiter = asyncio.create_task(bus.wait_for(SYMBOL, "SHORT", (EVENT_FILLED,), timeout=5))
+        await asyncio.sleep(0)
+        bus.close()
+        return await waiter, bus.pending()
+
+    assert asyncio.run(scenario()) == (None, 0)
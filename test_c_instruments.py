@@ -0,0 +1,80 @@
+import asyncio
+from b_context import BotContext
+from c_log import ErrorHandler
+from c_instruments import (
+    InstrumentRegistry, InstrumentRefresher,
+    INSTRUMENT_ADDED, INSTRUMENT_CHANGED, INSTRUMENT_SUSPENDED, INSTRUMENT_DELISTED,
+)
+
+
+def raw(inst_id, code, tick="0.1", state="live", lot="0.01"):
+    return {"instId": inst_id, "instIdCode": code, "ctVal": "0.01", "lotSz": lot, "tickSz": tick,
+            "minSz": lot, "lever": "100", "state": state}
+
+
+def kinds(changes):
+    return sorted((ch.kind, ch.inst_id, ch.fields) for ch in changes)
+
+
+def test_diff_updates_specs_in_place():
+    registry = InstrumentRegistry.from_raw([raw("BTC", 1), raw("ETH", 2), raw("SOL", 3)])
+    btc = registry.get("BTC")
+    changes = registry.apply(InstrumentRegistry.parse_raw([
+        raw("BTC", 1, tick="0.5"),
+        raw("ETH", 2, state="suspend"),
+        raw("DOGE", 4),
+    ]))
+    assert kinds(changes) == [
+        (INSTRUMENT_ADDED, "DOGE", ()),
+        (INSTRUMENT_CHANGED, "BTC", ("tickSz",)),
+        (INSTRUMENT_DELISTED, "SOL", ("state",)),
+        (INSTRUMENT_SUSPENDED, "ETH", ("state",)),
+    ]
+    assert registry.get("BTC") is btc and btc.tickSz == 0.5  # ссылки в position_vars остаются валидны
+    assert not registry.is_tradable("SOL") and "SOL" in registry
+    assert registry.get_by_code(4).inst_id == "DOGE"
+
+
+def test_unchanged_listing_gives_empty_diff_and_delisted_reported_once():
+    registry = InstrumentRegistry.from_raw([raw("BTC", 1), raw("ETH", 2)])
+    assert registry.apply(InstrumentRegistry.parse_raw([raw("BTC", 1), raw("ETH", 2)])) == []
+    assert len(registry.apply(InstrumentRegistry.parse_raw([raw("BTC", 1)]))) == 1
+    assert registry.apply(InstrumentRegistry.parse_raw([raw("BTC", 1)])) == []
+
+
+def test_inst_id_code_change_reindexes():
+    registry = InstrumentRegistry.from_raw([raw("BTC", 1)])
+    registry.apply(InstrumentRegistry.parse_raw([raw("BTC", 9, tick="0.2")]))
+    assert registry.get_by_code(1) is None
+    assert registry.get_by_code(9) is registry.get("BTC")
+
+
+def test_inst_id_code_only_change_is_a_diff():
+    registry = InstrumentRegistry.from_raw([raw("BTC", 1)])
+    btc = registry.get("BTC")
+    changes = registry.apply(InstrumentRegistry.parse_raw([raw("BTC", 7)]))
+    assert kinds(changes) == [(INSTRUMENT_CHANGED, "BTC", ("inst_id_code",))]
+    assert btc.inst_id_code == 7
+    assert registry.get_by_code(7) is btc and registry.get_by_code(1) is None
+
+
+def test_refresher_notifies_subscribers_with_diff():
+    async def scenario():
+        registry = InstrumentRegistry.from_raw([raw("BTC", 1)])
+        seen = []
+
+        async def fetch():
+            return [raw("BTC", 1), raw("ETH", 2)]
+
+        async def on_changes(changes):
+            seen.extend(ch.inst_id for ch in changes)
+
+        refresher = InstrumentRefresher(BotContext(), ErrorHandler(), registry, fetch)
+        refresher.subscribe(on_changes)
+        first = await refresher.refresh_once()
+        second = await refresher.refresh_once()
+        return seen, first, second
+
+    seen, first, second = asyncio.run(scenario())
+    assert seen == ["ETH"]
+    assert [ch.kind for ch in first] == [INSTRUMENT_ADDED] and second == []
@@ -0,0 +1,109 @@
+import asyncio
+import time
+import c_limits
+from c_limits import TokenBucket, CircuitBreaker, PRIORITY_ORDER, PRIORITY_BACKGROUND
+
+
+def test_token_bucket_burst_then_rate():
+    async def scenario():
+        bucket = TokenBucket(rate=20, capacity=2)
+        started = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(scenario())
+    # 2 токена из запаса, ещё 2 — по 50 мс
+    assert 0.08 <= elapsed < 0.5
+
+
+def test_token_bucket_priority_order():
+    async def scenario():
+        bucket = TokenBucket(rate=50, capacity=1)
+        await bucket.acquire()
+        order = []
+
+        async def take(name, priority):
+            await bucket.acquire(priority)
+            order.append(name)
+        await asyncio.gather(take("background", 2), take("order", 0), take("default", 1))
+        return order
+
+    assert asyncio.run(scenario()) == ["order", "default", "background"]
+
+
+def test_order_waiter_overtakes_queued_background_waiter():
+    async def scenario():
+        bucket = TokenBucket(rate=20, capacity=1)
+        await bucket.acquire()
+        order = []
+
+        async def take(name, priority):
+            await bucket.acquire(priority)
+            order.append(name)
+        background = [asyncio.create_task(take(f"background{idx}", PRIORITY_BACKGROUND)) for idx in range(2)]
+        await asyncio.sleep(0.01)  # фоновые уже в очереди, токена ещё нет
+        assert bucket.queued == 2
+        await asyncio.gather(take("order", PRIORITY_ORDER), *background)
+        return order
+
+    assert asyncio.run(scenario()) == ["order", "background0", "background1"]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_penalize_refills_at_reduced_rate_then_recovers(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(c_limits.time, "monotonic", clock)
+    bucket = TokenBucket(rate=10, capacity=100, penalty_factor=0.5, penalty_cooldown=2.0)
+    bucket.penalize()
+    assert bucket.tokens == 0.0 and bucket.rate == 5 and bucket.throttled == 1
+
+    clock.now += 1.0
+    bucket._refill()
+    assert bucket.tokens == 5.0  # секунда штрафа — половина базовой скорости
+
+    clock.now += 1.0  # cooldown прошёл: +25% к скорости
+    bucket._refill()
+    assert bucket.rate == 6.25
+    rates = []
+    for _ in range(3):
+        clock.now += 2.0
+        bucket._refill()
+        rates.append(bucket.rate)
+    assert rates == [7.8125, 9.765625, 10]  # не выше базовой
+
+    bucket.penalize()
+    bucket.penalize()
+    assert bucket.rate == 2.5 and bucket.throttled == 3
+    for _ in range(5):
+        bucket.penalize()
+    assert bucket.rate == bucket.min_rate == 1.0
+
+
+def test_breaker_opens_and_half_open_probe():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    assert not breaker.record_failure()
+    assert breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()          # пробный запрос
+    assert not breaker.allow()      # второй ждёт исход пробы
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_release_frees_probe_without_closing():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
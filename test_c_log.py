@@ -0,0 +1,70 @@
+import json
+import os
+import c_log
+from c_log import AsyncLogWriter, DEBUG, INFO, WARNING, ERROR
+
+
+def make_writer(tmp_path, **kwargs):
+    params = {"directory": str(tmp_path), "level": "INFO", "flush_interval": 0.01, "console": False}
+    params.update(kwargs)
+    return AsyncLogWriter("test", **params)
+
+
+def read_lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_level_filter_and_json_lines(tmp_path):
+    writer = make_writer(tmp_path, level="WARNING")
+    writer.emit(DEBUG, "[X] debug")
+    writer.emit(INFO, "[X] info")
+    writer.emit(WARNING, "[X] warning")
+    writer.emit(ERROR, "[Y][1] error")
+    assert writer.flush()
+    writer.close()
+    records = read_lines(writer.path)
+    assert [(r["level"], r["cat"], r["msg"]) for r in records] == [
+        ("WARNING", "X", "[X] warning"),
+        ("ERROR", "Y", "[Y][1] error"),
+    ]
+
+
+def test_size_rotation_keeps_backups(tmp_path):
+    writer = make_writer(tmp_path, max_bytes=300, backups=2)
+    for idx in range(6):
+        writer.emit(INFO, f"[ROT] message {idx} " + "x" * 100)
+        assert writer.flush()
+    writer.close()
+    assert os.path.exists(writer.path + ".1") and os.path.exists(writer.path + ".2")
+    assert not os.path.exists(writer.path + ".3")
+    assert os.path.getsize(writer.path + ".1") >= 300 and os.path.getsize(writer.path + ".2") >= 300
+    assert os.path.getsize(writer.path) < 300
+    assert read_lines(writer.path + ".1")[-1]["msg"].startswith("[ROT] message 5")
+
+
+def test_sampling_applies_per_category_below_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(c_log.random, "random", lambda: 0.5)
+    writer = make_writer(tmp_path, sampling={"TICK": 0.1, "KEEP": 0.9})
+    writer.emit(INFO, "[TICK] dropped by sampling")
+    writer.emit(INFO, "[KEEP] kept")
+    writer.emit(ERROR, "[TICK] errors are never sampled")
+    writer.emit(INFO, "[OTHER] no rule")
+    assert writer.flush()
+    writer.close()
+    assert writer.sampled_out == 1
+    assert [r["msg"] for r in read_lines(writer.path)] == [
+        "[KEEP] kept", "[TICK] errors are never sampled", "[OTHER] no rule",
+    ]
+
+
+def test_ring_overflow_drops_oldest_and_reports(tmp_path):
+    writer = make_writer(tmp_path, ring_size=3)
+    writer._thread = object()  # поток не стартуем: буфер заполняется без разбора
+    for idx in range(5):
+        writer.emit(INFO, f"[R] {idx}")
+    assert writer.dropped == 2
+    writer._drain()
+    writer._file.close()
+    messages = [r["msg"] for r in read_lines(writer.path)]
+    assert messages == ["[R] 2", "[R] 3", "[R] 4", "[LOG] ring buffer overflow: 2 records lost"]
@@ -0,0 +1,128 @@
+import os
+import time
+from multiprocessing import shared_memory
+import pytest
+import c_market_hub
+from c_instruments import InstrumentSpec
+from c_market_hub import SharedMarketWriter, SharedMarketReader, OFF_PRICE_SEQ
+
+
+def spec(inst_id, code=1, tick=0.1, state="live"):
+    return InstrumentSpec(inst_id, code, 0.01, 0.01, tick, 0.01, 100, state, 2, 1)
+
+
+@pytest.fixture
+def hub_name():
+    name = f"test_hub_{os.getpid()}"
+    yield name
+    try:
+        # подчищаем сегмент, если тест упал до close
+        stale = shared_memory.SharedMemory(name=name, create=False)
+        stale.close()
+        stale.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def test_round_trip(hub_name):
+    writer = SharedMarketWriter.create(hub_name, 8)
+    writer.write_instruments([spec("BTC-USDT-SWAP", 1), spec("ETH-USDT-SWAP", 2, tick=0.01, state="suspend")])
+    now = time.time()
+    writer.write_prices({"BTC-USDT-SWAP": 65000.5, "UNKNOWN": 1.0}, now)
+    writer.beat()
+    reader = SharedMarketReader.attach(hub_name)
+    try:
+        specs = {s.inst_id: s for s in reader.specs()}
+        assert specs["BTC-USDT-SWAP"].as_tuple() == spec("BTC-USDT-SWAP", 1).as_tuple()
+        assert specs["ETH-USDT-SWAP"].state == "suspend" and specs["ETH-USDT-SWAP"].tickSz == 0.01
+        assert reader.quote("BTC-USDT-SWAP") == (65000.5, now)
+        assert reader.get_price("BTC-USDT-SWAP", max_age=5) == 65000.5
+        assert reader.get_price("BTC-USDT-SWAP", max_age=-1) is None
+        assert reader.quote("ETH-USDT-SWAP") is None  # цены ещё не было
+        assert reader.quote("UNKNOWN") is None
+        assert reader.alive(5)
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_read_retries_while_write_in_progress(hub_name, monkeypatch):
+    writer = SharedMarketWriter.create(hub_name, 4)
+    writer.write_instruments([spec("BTC-USDT-SWAP")])
+    writer.write_prices({"BTC-USDT-SWAP": 100.0})
+    reader = SharedMarketReader.attach(hub_name)
+    try:
+        seq = writer._begin(OFF_PRICE_SEQ)  # счётчик нечётный — запись идёт
+        writer.prices[0] = 200.0
+        yields = []
+
+        def finish_write():
+            yields.append(1)
+            writer.prices[1] = time.time()
+            writer._end(OFF_PRICE_SEQ, seq)
+        monkeypatch.setattr(c_market_hub.os, "sched_yield", finish_write)
+        assert reader.get_price("BTC-USDT-SWAP", max_age=5) == 200.0
+        assert yields == [1]
+
+        writer._begin(OFF_PRICE_SEQ)  # писатель «застрял»
+        monkeypatch.setattr(c_market_hub.os, "sched_yield", lambda: None)
+        monkeypatch.setattr(c_market_hub, "SEQLOCK_SPINS", 5)
+        with pytest.raises(TimeoutError):
+            reader.quote("BTC-USDT-SWAP")
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_instrument_table_growth_reindexes_reader(hub_name):
+    writer = SharedMarketWriter.create(hub_name, 3)
+    writer.write_instruments([spec("BTC-USDT-SWAP", 1)])
+    reader = SharedMarketReader.attach(hub_name)
+    try:
+        assert [s.inst_id for s in reader.specs()] == ["BTC-USDT-SWAP"]
+        writer.write_instruments([spec("BTC-USDT-SWAP", 1, tick=0.5), spec("ETH-USDT-SWAP", 2), spec("SOL-USDT-SWAP", 3)])
+        assert writer.write_instruments([spec("DOGE-USDT-SWAP", 4)]) == 3  # сверх capacity — не пишется
+        writer.write_prices({"SOL-USDT-SWAP": 150.0})
+        assert reader.get_price("SOL-USDT-SWAP", max_age=5) == 150.0  # индекс перестроен по seq таблицы
+        specs = reader.specs()
+        assert [s.inst_id for s in specs] == ["BTC-USDT-SWAP", "ETH-USDT-SWAP", "SOL-USDT-SWAP"]
+        assert specs[0].tickSz == 0.5  # слот за instId не меняется, запись обновлена на месте
+        assert reader.quote("DOGE-USDT-SWAP") is None
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_reattach_after_writer_recreated(hub_name):
+    writer = SharedMarketWriter.create(hub_name, 4)
+    writer.write_instruments([spec("BTC-USDT-SWAP")])
+    writer.write_prices({"BTC-USDT-SWAP": 100.0})
+    writer.beat()
+    old = SharedMarketReader.attach(hub_name)
+    writer.close()  # хаб упал: сегмент отвязан, старое отображение живо, но молчит
+    fresh_writer = SharedMarketWriter.create(hub_name, 4)
+    fresh_writer.write_instruments([spec("ETH-USDT-SWAP", 2)])
+    fresh_writer.write_prices({"ETH-USDT-SWAP": 2000.0})
+    fresh_writer.beat()
+    try:
+        assert old.get_price("BTC-USDT-SWAP", max_age=5) == 100.0
+        assert old.quote("ETH-USDT-SWAP") is None
+        fresh = SharedMarketReader.attach(hub_name)
+        try:
+            assert fresh.get_price("ETH-USDT-SWAP", max_age=5) == 2000.0
+            assert fresh.alive(5)
+        finally:
+            fresh.close()
+    finally:
+        old.close()
+        fresh_writer.close()
+
+
+def test_attach_rejects_foreign_layout(hub_name):
+    writer = SharedMarketWriter.create(hub_name, 2)
+    writer.buf[0:4] = b"XXXX"
+    try:
+        with pytest.raises(ValueError):
+            SharedMarketReader.attach(hub_name)
+    finally:
+        writer.close()
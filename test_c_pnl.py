@@ -0,0 +1,56 @@
+import asyncio
+from c_pnl import FillsPnlEngine
+
+SYMBOL = "BTC-USDT-SWAP"
+
+
+def fill(trade_id, side, px, sz, fee="-0.1", pnl="0"):
+    return {
+        "instId": SYMBOL, "posSide": "long", "side": side, "tradeId": trade_id,
+        "fillPx": str(px), "fillSz": str(sz), "fillFee": fee, "fillPnl": pnl, "fillTime": "1",
+    }
+
+
+def test_duplicate_trade_id_is_counted_once():
+    engine = FillsPnlEngine()
+    assert engine.on_order(fill("t1", "buy", 100, 2))
+    assert not engine.on_order(fill("t1", "buy", 100, 2))  # повтор пуша
+    assert engine.on_order(fill("t2", "sell", 110, 1, pnl="10"))
+    assert not engine.on_order(fill("t2", "sell", 110, 1, pnl="10"))
+    assert engine.on_order(fill("t3", "sell", 120, 1, pnl="20"))
+    report = engine.settle(SYMBOL, "LONG", ct_val=1, leverage=10)
+    assert report["pnl_usdt"] == round(30 - 0.3, 4)
+    assert report["entry_vwap"] == 100 and report["exit_vwap"] == 115
+    assert report["fee"] == -0.3
+    assert len(engine) == 0
+
+
+def test_fills_without_trade_id_or_size_are_ignored():
+    engine = FillsPnlEngine()
+    assert not engine.on_order(fill("", "buy", 100, 1))
+    assert not engine.on_order(fill("t1", "buy", 100, 0))
+    assert len(engine) == 0
+
+
+def test_gross_from_vwap_when_fill_pnl_missing_and_funding_added():
+    engine = FillsPnlEngine()
+    engine.on_order(fill("t1", "buy", 100, 1, fee="0"))
+    engine.on_position({"instId": SYMBOL, "posSide": "long", "fundingFee": "-0.5"})
+    engine.on_order(fill("t2", "sell", 104, 1, fee="0"))
+    report = engine.settle(SYMBOL, "LONG", ct_val=0.5, leverage=2)
+    assert report["pnl_usdt"] == 1.5
+    assert report["pnl_pct"] == 6.0
+
+
+def test_wait_flat_wakes_on_closing_fill():
+    async def scenario():
+        engine = FillsPnlEngine()
+        engine.on_order(fill("t1", "buy", 100, 1))
+        waiter = asyncio.create_task(engine.wait_flat(SYMBOL, "LONG", timeout=1))
+        await asyncio.sleep(0.01)
+        engine.on_order(fill("t2", "sell", 101, 1))
+        flat = await waiter
+        missing = await engine.wait_flat("ETH-USDT-SWAP", "LONG", timeout=0.01)
+        return flat, missing
+
+    assert asyncio.run(scenario()) == (True, False)
@@ -0,0 +1,122 @@
+import asyncio
+import multiprocessing as mp
+import time
+from b_context import BotContext
+from c_log import ErrorHandler
+from c_shards import (
+    ShardPool, ShardHandle, ShardWorkerLink, split_accounts,
+    MSG_SIGNAL, MSG_STOP, MSG_TEXTS, MSG_HEALTH,
+)
+
+
+def echo_worker(conn, shard_id, configs, tag):
+    """Процесс-шард для тестов: на сигнал отвечает текстом первому аккаунту, раз в 50 мс — здоровье."""
+    async def run():
+        link = ShardWorkerLink(conn, shard_id)
+        stop = asyncio.Event()
+
+        async def on_signal(item):
+            link.send(MSG_TEXTS, (next(iter(configs)), [f"{tag}:{shard_id}:{item[2]}"]))
+        link.on_signal = on_signal
+        link.on_stop = stop.set
+        link.start()
+        while not stop.is_set():
+            link.report_health({"accounts": len(configs), "in_position": True, "loop_lag_ms": 0})
+            try:
+                await asyncio.wait_for(stop.wait(), 0.05)
+            except asyncio.TimeoutError:
+                pass
+        link.close()
+    asyncio.run(run())
+
+
+def make_pool(workers=2):
+    context = BotContext()
+    context.users_configs = {chat_id: {"config": {}} for chat_id in ("a", "b", "c")}
+    texts = []
+    pool = ShardPool(
+        context, ErrorHandler(), echo_worker, workers, health_interval=0.05,
+        on_texts=lambda chat_id, *items: texts.extend((chat_id, text) for text in items)
+    )
+    return pool, context, texts
+
+
+async def wait_until(predicate, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    return predicate()
+
+
+def test_split_accounts_round_robin():
+    assert split_accounts(["a", "b", "c"], 2) == [["a", "c"], ["b"]]
+    assert split_accounts(["a"], 4) == [["a"]]
+
+
+def test_worker_link_envelope_protocol():
+    async def scenario():
+        parent, child = mp.Pipe(duplex=True)
+        link = ShardWorkerLink(child, 3)
+        received = []
+        stopped = asyncio.Event()
+
+        async def on_signal(item):
+            received.append(item)
+        link.on_signal = on_signal
+        link.on_stop = stopped.set
+        link.start()
+
+        parent.send((MSG_SIGNAL, (({"symbol": "X"}, 1, "k1"), time.time())))
+        await wait_until(lambda: received, timeout=2)
+        link.report_health({"in_position": False})
+        kind, health = await asyncio.to_thread(parent.recv)
+        parent.send((MSG_STOP, None))
+        await asyncio.wait_for(stopped.wait(), 2)
+        link.close()
+        parent.close()
+        return received, kind, health
+
+    received, kind, health = asyncio.run(scenario())
+    assert received == [({"symbol": "X"}, 1, "k1")]
+    assert kind == MSG_HEALTH
+    assert health["shard"] == 3 and health["signals"] == 1 and health["ipc"]["count"] == 1
+    assert health["in_position"] is False
+
+
+def test_dispatch_to_unreachable_shard_is_logged_not_raised():
+    pool, _, _ = make_pool()
+    errors = []
+    pool.info_handler.debug_error_notes = lambda data, is_print=True: errors.append(data)
+    pool.shards = [ShardHandle(0, ["a"])]  # процесса и писателя нет
+    pool.dispatch(({"symbol": "X"}, 1, "k1"))
+    assert len(errors) == 1 and "unreachable" in errors[0] and "k1" in errors[0]
+
+
+def test_spawned_shards_answer_restart_and_stop():
+    async def scenario():
+        pool, context, texts = make_pool()
+        pool.start(list(context.users_configs), "t")
+        try:
+            assert await wait_until(lambda: all(shard.health for shard in pool.shards))
+            pool.dispatch(({"symbol": "X"}, 1, "k1"))
+            assert await wait_until(lambda: len(texts) == 2)
+            answered = sorted(texts)
+            in_position = dict(context.shards_in_position)
+
+            dead = pool.shards[1]
+            dead.process.kill()
+            await asyncio.to_thread(dead.process.join, 5)
+            pool.check()
+            cleared = 1 not in context.shards_in_position
+            assert await wait_until(lambda: dead.process.is_alive() and dead.health)
+            restarts = [shard.restarts for shard in pool.shards]
+        finally:
+            await pool.stop(timeout=10)
+        return answered, in_position, cleared, restarts, pool.shards, dict(context.shards_in_position)
+
+    answered, in_position, cleared, restarts, shards, after_stop = asyncio.run(scenario())
+    assert answered == [("a", "t:0:k1"), ("b", "t:1:k1")]
+    assert in_position == {0: True, 1: True}
+    assert cleared
+    assert restarts == [0, 1]
+    assert shards == [] and after_stop == {}
@@ -0,0 +1,59 @@
+import json
+import time
+from c_instruments import InstrumentRegistry, InstrumentSpec
+from c_snapshot import SNAPSHOT_VERSION, load_snapshot, save_snapshot
+
+
+def make_registry():
+    return InstrumentRegistry.from_raw([
+        {"instId": "BTC-USDT-SWAP", "instIdCode": 1, "ctVal": "0.01", "lotSz": "0.01", "tickSz": "0.1",
+         "minSz": "0.01", "lever": "100", "state": "live"},
+    ])
+
+
+def rewrite(path, **fields):
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    payload.update(fields)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "market.json")
+    save_snapshot(path, make_registry(), {"BTC-USDT-SWAP": 65000.5})
+    registry, prices, saved_at = load_snapshot(path, ttl=60)
+    spec = registry.get("BTC-USDT-SWAP")
+    assert spec.as_tuple() == make_registry().get("BTC-USDT-SWAP").as_tuple()
+    assert registry.get_by_code(1) is spec
+    assert prices == {"BTC-USDT-SWAP": 65000.5}
+    assert time.time() - saved_at < 5
+    assert not (tmp_path / "market.json.tmp").exists()
+
+
+def test_other_version_is_rejected(tmp_path):
+    path = str(tmp_path / "market.json")
+    save_snapshot(path, make_registry(), {})
+    rewrite(path, version=SNAPSHOT_VERSION + 1)
+    assert load_snapshot(path, ttl=60) is None
+
+
+def test_other_field_layout_is_rejected(tmp_path):
+    path = str(tmp_path / "market.json")
+    save_snapshot(path, make_registry(), {})
+    rewrite(path, fields=list(reversed(InstrumentSpec.__slots__)))
+    assert load_snapshot(path, ttl=60) is None
+
+
+def test_stale_missing_and_broken_files_are_rejected(tmp_path):
+    path = str(tmp_path / "market.json")
+    assert load_snapshot(path, ttl=60) is None
+    save_snapshot(path, make_registry(), {})
+    rewrite(path, saved_at=time.time() - 120)
+    assert load_snapshot(path, ttl=60) is None
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{broken")
+    assert load_snapshot(path, ttl=60) is None
+    save_snapshot(path, make_registry(), {})
+    rewrite(path, specs=[[1, 2]])
+    assert load_snapshot(path, ttl=60) is None
@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+from c_log import ErrorHandler
+from c_startup import StartupOrchestrator
+
+
+def make_startup():
+    return StartupOrchestrator(info_handler=ErrorHandler())
+
+
+def test_steps_run_after_their_deps_and_independent_ones_in_parallel():
+    async def scenario():
+        startup = make_startup()
+        order = []
+
+        def step(name, delay=0.0):
+            async def run():
+                order.append(f"{name}:start")
+                await asyncio.sleep(delay)
+                order.append(f"{name}:end")
+            return run
+
+        startup.add("market", step("market", 0.02))
+        startup.add("users", step("users", 0.01))
+        startup.add("instruments", step("instruments"), deps=("market",))
+        startup.add("positions", step("positions"), deps=("users", "instruments"))
+        await startup.run()
+        return order, startup
+
+    order, startup = asyncio.run(scenario())
+    assert order[:2] == ["market:start", "users:start"]
+    assert order.index("instruments:start") > order.index("market:end")
+    assert order.index("positions:start") > order.index("instruments:end")
+    assert startup.ready.is_set() and set(startup.timings) == {"market", "users", "instruments", "positions"}
+
+
+def test_unknown_dependency_and_cycle_are_rejected():
+    async def noop():
+        pass
+
+    async def scenario():
+        unknown = make_startup()
+        unknown.add("a", noop, deps=("missing",))
+        with pytest.raises(ValueError, match="unknown"):
+            await unknown.run()
+
+        cycle = make_startup()
+        cycle.add("a", noop, deps=("b",))
+        cycle.add("b", noop, deps=("a",))
+        with pytest.raises(ValueError, match="cycle"):
+            await cycle.run()
+
+        duplicate = make_startup()
+        duplicate.add("a", noop)
+        with pytest.raises(ValueError):
+            duplicate.add("a", noop)
+        return unknown.ready.is_set(), cycle.ready.is_set()
+
+    assert asyncio.run(scenario()) == (False, False)
+
+
+def test_failed_step_is_recorded_and_dependents_still_run():
+    async def scenario():
+        startup = make_startup()
+        ran = []
+
+        async def broken():
+            raise RuntimeError("login failed")
+
+        async def dependent():
+            ran.append("dependent")
+
+        startup.add("private_ws", broken)
+        startup.add("positions", dependent, deps=("private_ws",))
+        await startup.run()
+        return startup, ran
+
+    startup, ran = asyncio.run(scenario())
+    assert startup.failed == {"private_ws": "login failed"}
+    assert ran == ["dependent"]
+    assert startup.ready.is_set()
+    assert "failed: private_ws" in startup.report()
+
+
+def test_ready_waits_for_all_steps_but_wait_only_for_named_ones():
+    async def scenario():
+        startup = make_startup()
+        hang = asyncio.Event()
+
+        async def quick():
+            pass
+
+        async def stuck():
+            await hang.wait()
+
+        startup.add("instruments", quick)
+        startup.add("private_ws", stuck)
+        runner = asyncio.create_task(startup.run())
+        got_instruments = await startup.wait(("instruments",), timeout=0.5)
+        got_private_ws = await startup.wait(("private_ws",), timeout=0.05)
+        ready_before = startup.ready.is_set()
+        hang.set()
+        await runner
+        return got_instruments, got_private_ws, ready_before, startup.ready.is_set()
+
+    assert asyncio.run(scenario()) == (True, False, False, True)
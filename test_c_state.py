@@ -0,0 +1,65 @@
+import pytest
+from c_state import (
+    PositionState, SymbolState, InvalidTransition, any_in_position,
+    POS_IDLE, POS_PENDING, POS_OPEN, POS_CLOSING, POS_CLOSED,
+)
+
+
+def test_full_lifecycle_transitions():
+    pos = PositionState("BTC-USDT-SWAP", "LONG")
+    assert pos.state == POS_IDLE and not pos.in_position
+    pos.transition(POS_PENDING)
+    assert pos.pending_open and not pos.in_position
+    pos.transition(POS_OPEN)
+    assert pos.in_position
+    pos.transition(POS_CLOSING)
+    assert pos.in_position
+    pos.transition(POS_OPEN)  # добор после частичного закрытия
+    pos.transition(POS_CLOSED)
+    assert not pos.in_position
+    pos.transition(POS_IDLE)
+    assert pos.state == POS_IDLE
+
+
+@pytest.mark.parametrize("path", [
+    (POS_CLOSED,),
+    (POS_CLOSING,),
+    (POS_PENDING, POS_CLOSED),
+    (POS_OPEN, POS_PENDING),
+    (POS_OPEN, POS_CLOSED, POS_OPEN),
+])
+def test_invalid_transitions_raise_and_keep_state(path):
+    pos = PositionState("BTC-USDT-SWAP", "SHORT")
+    *valid, bad = path
+    for state in valid:
+        pos.transition(state)
+    before = pos.state
+    assert not pos.can(bad)
+    with pytest.raises(InvalidTransition):
+        pos.transition(bad)
+    assert pos.state == before
+
+
+def test_snapshot_is_detached_copy():
+    pos = PositionState("ETH-USDT-SWAP", "LONG")
+    pos.transition(POS_OPEN)
+    pos.contracts = 2.0
+    pos.order.cl_ord_id = "cl1"
+    copy = pos.snapshot()
+    pos.order.clear()
+    pos.contracts = 0.0
+    assert copy.state == POS_OPEN and copy.contracts == 2.0
+    assert copy.order.cl_ord_id == "cl1" and copy.order is not pos.order
+
+
+def test_symbol_state_sides_and_any_in_position():
+    symbol_state = SymbolState("BTC-USDT-SWAP")
+    long_pos = symbol_state.reset_side("long")
+    symbol_state.reset_side("SHORT")
+    assert symbol_state.side("LONG") is long_pos
+    assert [p.pos_side for p in symbol_state.sides()] == ["LONG", "SHORT"]
+    assert not any_in_position({"BTC-USDT-SWAP": symbol_state})
+    long_pos.transition(POS_OPEN)
+    assert any_in_position({"BTC-USDT-SWAP": symbol_state})
+    with pytest.raises(ValueError):
+        symbol_state.reset_side("both")
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import time
+from aiohttp import web
+import c_sync
+from b_context import BotContext, AccountContext
+from b_constructor import PositionVarsSetup
+from c_log import ErrorHandler
+from c_sync import Synchronizer
+from API.OKX.okx_ws import OkxPrivateWs
+
+SYMBOL = "BTC-USDT-SWAP"
+
+
+class FakeLeverage:
+    def observe(self, positions):
+        pass
+
+
+class FakeClient:
+    def __init__(self):
+        self.leverage = FakeLeverage()
+
+
+def make_sync(context=None, positions_stream=None, pnl_report=None, client=None):
+    context = context or AccountContext(BotContext(), "1")
+    info_handler = ErrorHandler()
+    setup = PositionVarsSetup(context=context, info_handler=info_handler)
+    for pos_side in ("LONG", "SHORT"):
+        setup.set_pos_defaults(symbol=SYMBOL, pos_side=pos_side)
+    messages = []
+    sync = Synchronizer(
+        context, info_handler, setup.set_pos_defaults, pnl_report, client or FakeClient(),
+        lambda chat_id, marker, body, is_print=True: messages.append(marker),
+        1, "1", positions_stream=positions_stream
+    )
+    closes = []
+
+    async def record_closes(items):
+        closes.extend(items)
+    sync.submit_closes = record_closes
+    return context, sync, messages, closes
+
+
+def row(pos: str, u_time: int) -> dict:
+    return {"instId": SYMBOL, "posSide": "long", "pos": pos, "avgPx": "100", "uTime": str(u_time), "cTime": "1"}
+
+
+def long_pos(context):
+    return context.position_vars[SYMBOL].side("LONG")
+
+
+def test_rest_snapshot_requested_before_ws_fill_does_not_reset():
+    async def scenario():
+        context, sync, messages, closes = make_sync()
+        requested_at = time.monotonic()
+        await sync.on_ws_positions({}, [row("1", 200)])
+        # ответ REST без позиции: запрошен до fill-а
+        await sync.update_positions({SYMBOL}, [], requested_at)
+        return long_pos(context).in_position, messages, closes
+
+    in_position, messages, closes = asyncio.run(scenario())
+    assert in_position
+    assert messages == ["market_order_filled"]
+    assert closes == []
+
+
+def test_stale_rest_snapshot_after_ws_close_does_not_reopen():
+    async def scenario():
+        context, sync, messages, closes = make_sync()
+        await sync.on_ws_positions({}, [row("1", 100)])
+        await sync.on_ws_positions({}, [row("0", 300)])
+        await sync.update_positions({SYMBOL}, [row("1", 100)], time.monotonic())
+        return long_pos(context).in_position, messages, closes
+
+    in_position, messages, closes = asyncio.run(scenario())
+    assert not in_position
+    assert messages == ["market_order_filled"]
+    assert len(closes) == 1
+
+
+def test_fresh_rest_snapshot_applies():
+    async def scenario():
+        context, sync, messages, _ = make_sync()
+        await sync.on_ws_positions({}, [row("0", 100)])
+        await sync.update_positions({SYMBOL}, [row("2", 400)], time.monotonic())
+        return long_pos(context)
+
+    pos = asyncio.run(scenario())
+    assert pos.in_position and pos.contracts == 2.0
+
+
+def test_ws_stand_in_server_drives_positions():
+    async def handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for msg in ws:
+            if msg.data == "ping":
+                await ws.send_str("pong")
+                continue
+            data = json.loads(msg.data)
+            if data["op"] == "login":
+                await ws.send_str(json.dumps({"event": "login", "code": "0"}))
+            elif data["op"] == "subscribe":
+                for arg in data["args"]:
+                    await ws.send_str(json.dumps({"event": "subscribe", "arg": arg}))
+                    if arg["channel"] == "positions":
+                        await ws.send_str(json.dumps({"arg": arg, "data": [row("3", 500)]}))
+        return ws
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/ws", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+
+        context = AccountContext(BotContext(), "1")
+        stream = OkxPrivateWs(
+            "key", "secret", "pass", f"ws://127.0.0.1:{port}/ws", context, ErrorHandler(),
+            ping_interval=0.5, reconnect_delay=0.1
+        )
+        context, sync, messages, _ = make_sync(context, positions_stream=stream)
+        await stream.subscribe([{"channel": "positions", "instType": "SWAP"}, {"channel": "orders", "instType": "SWAP"}])
+        stream.start()
+        try:
+            deadline = time.monotonic() + 5
+            while not long_pos(context).in_position and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            return long_pos(context), messages
+        finally:
+            await stream.stop()
+            await runner.cleanup()
+
+    pos, messages = asyncio.run(scenario())
+    assert pos.in_position and pos.contracts == 3.0
+    assert messages == ["market_order_filled"]
+
+
+class HistoryClient(FakeClient):
+    def __init__(self):
+        super().__init__()
+        self.many_calls = []
+        self.single_calls = []
+
+    async def get_realized_pnl_many(self, closes):
+        self.many_calls.append([close["symbol"] for close in closes])
+        return [{"pnl_usdt": -2.0, "pnl_pct": -1.0} for _ in closes]
+
+    async def get_realized_pnl(self, **kwargs):
+        self.single_calls.append(kwargs["symbol"])
+        return {"pnl_usdt": 4.9, "pnl_pct": 2.45}
+
+
+def test_report_closes_batches_history_lookup(monkeypatch):
+    monkeypatch.setattr(c_sync, "PNL_RECONCILE_DELAY", 0)
+    other = "ETH-USDT-SWAP"
+
+    async def scenario():
+        reports = []
+
+        async def pnl_report(symbol, pos_side, pos, get_realized_pnl, format_message, chat_id, realized):
+            reports.append((symbol, realized["pnl_usdt"]))
+
+        client = HistoryClient()
+        context, sync, _, _ = make_sync(pnl_report=pnl_report, client=client)
+        # BTC закрыт fill-ами, которые видел канал orders; по ETH fill-ов нет — только история
+        for trade_id, side, px in (("t1", "buy", "100"), ("t2", "sell", "105")):
+            sync.pnl_engine.on_order({
+                "instId": SYMBOL, "posSide": "long", "side": side, "tradeId": trade_id,
+                "fillPx": px, "fillSz": "1", "fillFee": "0", "fillPnl": "0", "fillTime": "1",
+            })
+        btc = long_pos(context).snapshot()
+        eth = btc.snapshot()
+        eth.symbol = other
+        await sync.report_closes([(SYMBOL, "LONG", btc), (other, "LONG", eth)])
+        await asyncio.gather(*sync._reconcile_tasks)
+        return reports, client
+
+    reports, client = asyncio.run(scenario())
+    assert client.many_calls == [[other]]            # один проход по истории — только за ETH
+    assert sorted(reports) == [(SYMBOL, 5.0), (other, -2.0)]  # BTC: (105 - 100) * 1 из fill-ов
+    assert client.single_calls == [SYMBOL]           # ленивая сверка — только для посчитанного из fill-ов
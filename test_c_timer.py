@@ -0,0 +1,72 @@
+import asyncio
+from c_log import ErrorHandler
+from c_timer import TimerWheel
+
+
+def test_arm_expires_and_disarm_cancels():
+    async def scenario():
+        expired = []
+
+        async def on_expire(batch):
+            expired.extend(batch)
+
+        wheel = TimerWheel(ErrorHandler(), on_expire, tick=0.01, slots=8)
+        wheel.arm("a", 0.03, "pa")
+        wheel.arm("b", 0.03, "pb")
+        wheel.arm("long", 0.2, "pl")  # больше одного оборота колеса
+        assert wheel.disarm("b") == "pb"
+        assert wheel.disarm("b") is None
+        assert "a" in wheel and len(wheel) == 2
+        wheel.start()
+        await asyncio.sleep(0.1)
+        assert expired == [("a", "pa")]
+        await asyncio.sleep(0.2)
+        await wheel.stop()
+        return expired
+
+    assert asyncio.run(scenario()) == [("a", "pa"), ("long", "pl")]
+
+
+def test_rearm_moves_timer():
+    async def scenario():
+        expired = []
+
+        async def on_expire(batch):
+            expired.extend(key for key, _ in batch)
+
+        wheel = TimerWheel(ErrorHandler(), on_expire, tick=0.01, slots=16)
+        wheel.arm("a", 0.02)
+        wheel.arm("a", 0.1)
+        wheel.start()
+        await asyncio.sleep(0.05)
+        early = list(expired)
+        await asyncio.sleep(0.1)
+        await wheel.stop()
+        return early, expired
+
+    early, expired = asyncio.run(scenario())
+    assert early == [] and expired == ["a"]
+
+
+def test_failing_callback_does_not_stop_later_expiries():
+    async def scenario():
+        seen = []
+
+        async def on_expire(batch):
+            seen.extend(key for key, _ in batch)
+            if "boom" in seen and len(seen) == 1:
+                raise RuntimeError("cancel failed")
+
+        wheel = TimerWheel(ErrorHandler(), on_expire, tick=0.01, slots=8)
+        wheel.start()
+        wheel.arm("boom", 0.01)
+        await asyncio.sleep(0.05)
+        wheel.arm("next", 0.01)
+        await asyncio.sleep(0.05)
+        alive = wheel._task is not None and not wheel._task.done()
+        await wheel.stop()
+        return seen, alive
+
+    seen, alive = asyncio.run(scenario())
+    assert seen == ["boom", "next"]
+    assert alive
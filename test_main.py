@@ -0,0 +1,105 @@
+import asyncio
+import time
+from b_context import BotContext
+from c_instruments import InstrumentRegistry
+from c_log import ErrorHandler
+from c_pipeline import SignalPipeline
+from c_startup import StartupOrchestrator
+from main import Core
+
+
+class FakeAccount:
+    def __init__(self, chat_id):
+        self.chat_id = chat_id
+        self.jobs = []
+
+    def fin_settings(self):
+        return {"order_timeout": 60}
+
+    def dispatch(self, job):
+        self.jobs.append(job)
+        return True
+
+
+def make_core():
+    core = Core.__new__(Core)
+    core.context = BotContext()
+    core.info_handler = ErrorHandler()
+    core.accounts = {}
+    core.shards = None
+    core.instruments = InstrumentRegistry()
+    return core
+
+
+def test_backlog_signal_waits_for_accounts():
+    async def scenario():
+        core = make_core()
+        core.startup = StartupOrchestrator(info_handler=core.info_handler)
+        pipeline = SignalPipeline(info_handler=core.info_handler, stages=[("route", core._stage_route, 1)], queue_size=10)
+        pipeline.start()
+        # как в _run_iteration: бэклог уходит в конвейер до старта шагов
+        await pipeline.submit(({"symbol": "BTC-USDT-SWAP", "pos_side": "LONG"}, time.time() * 1000, "k1"))
+
+        account = FakeAccount("1")
+
+        async def users():
+            await asyncio.sleep(0.05)
+            core.accounts["1"] = account
+
+        async def shards():
+            pass
+
+        core.startup.add("users", users)
+        core.startup.add("shards", shards, deps=("users",))
+        await core.startup.run()
+        await pipeline.drain(timeout=1)
+        await pipeline.stop()
+        return account.jobs
+
+    jobs = asyncio.run(scenario())
+    assert len(jobs) == 1
+    assert jobs[0]["msg_key"] == "k1" and jobs[0]["symbol"] == "BTC-USDT-SWAP"
+
+
+def test_signal_dropped_when_startup_hangs(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "SIGNAL_STARTUP_TIMEOUT", 0.05)
+
+    async def scenario():
+        core = make_core()
+        core.startup = StartupOrchestrator(info_handler=core.info_handler)
+        hang = asyncio.Event()
+
+        async def positions():
+            await hang.wait()  # первая сверка позиций так и не прошла
+
+        core.startup.add("positions", positions)
+        runner = asyncio.create_task(core.startup.run())
+        lock = asyncio.Lock()
+        await asyncio.wait_for(
+            core.handle_signal(FakeAccount("1"), {}, "BTC-USDT-SWAP", "LONG", "0", "k1", lock), timeout=1
+        )
+        await core.startup.cancel()
+        runner.cancel()
+        return lock.locked()
+
+    assert asyncio.run(scenario()) is False
+
+
+def test_hub_seqlock_timeout_falls_back_to_rest():
+    class StuckHub:
+        def alive(self, max_silence):
+            return True
+
+        def get_price(self, inst_id, max_age):
+            raise TimeoutError("market hub: seqlock read did not settle")
+
+    class RestClient:
+        async def get_current_price(self, inst_id):
+            return 101.5
+
+    core = make_core()
+    core.market_hub = StuckHub()
+    core.ticker_stream = None
+    core.okx_client = RestClient()
+    assert asyncio.run(core._current_price("BTC-USDT-SWAP")) == 101.5
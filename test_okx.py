@@ -0,0 +1,218 @@
+import asyncio
+import time
+import pytest
+from b_context import BotContext
+from c_limits import CircuitBreaker
+from c_log import ErrorHandler
+from API.OKX.okx import OkxFuturesClient
+
+PATH = "/api/v5/market/ticker"
+
+
+class StuckLimiter:
+    """Лимитер, который никогда не выдаёт токен."""
+
+    async def acquire(self, account, path, priority=None):
+        await asyncio.Event().wait()
+
+
+def make_client() -> OkxFuturesClient:
+    return OkxFuturesClient(
+        api_key=None, api_secret=None, api_passphrase=None,
+        context=BotContext(), info_handler=ErrorHandler(), rate_limiter=StuckLimiter()
+    )
+
+
+def test_limiter_deadline_does_not_trip_breaker():
+    async def scenario():
+        client = make_client()
+        results = [await client._request(None, "GET", PATH, budget=0.05) for _ in range(6)]
+        return results, client._breaker(PATH)
+
+    results, breaker = asyncio.run(scenario())
+    assert results == [None] * 6
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_cancelled_probe_does_not_close_breaker():
+    async def scenario():
+        client = make_client()
+        breaker = client._breaker(PATH)
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        breaker._opened_at -= breaker.reset_timeout
+        task = asyncio.create_task(client._request(None, "GET", PATH, budget=5))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return breaker
+
+    breaker = asyncio.run(scenario())
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()  # пробный слот освобождён
+
+
+class FreeLimiter:
+    async def acquire(self, account, path, priority=None):
+        return None
+
+    def is_rate_limited(self, status, code):
+        return False
+
+
+class SlowWs:
+    def __init__(self):
+        self.calls = 0
+
+    def is_alive(self):
+        return True
+
+    async def request(self, op, args, timeout):
+        self.calls += 1
+        await asyncio.sleep(timeout)
+        return None
+
+
+def test_hedge_leg_goes_over_rest_on_second_session():
+    async def scenario():
+        client = OkxFuturesClient(
+            api_key=None, api_secret=None, api_passphrase=None,
+            context=BotContext(), info_handler=ErrorHandler(), rate_limiter=FreeLimiter()
+        )
+        client.ws_trade = SlowWs()
+        rest_sessions = []
+
+        async def fake_request(session, method, path, **kwargs):
+            rest_sessions.append(session)
+            return {"code": "0", "data": [{"sCode": "0", "ordId": "1"}]}
+        client._request = fake_request
+        primary, hedge = object(), object()
+        data = await client.place_order_idempotent(
+            [primary, hedge], "cl1", hedge_delay=0.05,
+            instId="BTC-USDT-SWAP", sz=1, side="buy", tdMode="isolated", posSide="long",
+            reduceOnly=False, ordType="market"
+        )
+        return data, rest_sessions == [hedge], client.ws_trade.calls
+
+    data, hedged_over_rest, ws_calls = asyncio.run(scenario())
+    assert data[0]["ordId"] == "1"
+    assert ws_calls == 1                 # основной — через WS
+    assert hedged_over_rest              # хедж — REST по второй сессии
+
+
+def test_trade_request_limiter_wait_is_bounded():
+    async def scenario():
+        client = make_client()
+        client.ws_trade = SlowWs()
+        fallbacks = []
+
+        async def fake_request(session, method, path, **kwargs):
+            fallbacks.append(path)
+            return None
+        client._request = fake_request
+        started = time.monotonic()
+        await client._trade_request(None, "order", "/api/v5/trade/order", {"instId": "X"}, deadline=time.time() + 0.1)
+        return time.monotonic() - started, fallbacks, client.ws_trade.calls
+
+    elapsed, fallbacks, ws_calls = asyncio.run(scenario())
+    assert elapsed < 1.0
+    assert fallbacks == ["/api/v5/trade/order"] and ws_calls == 0
+
+
+def history_row(u_time: int) -> dict:
+    return {
+        "instId": "BTC-USDT-SWAP", "posSide": "long", "posId": str(u_time), "cTime": str(u_time - 10),
+        "uTime": str(u_time), "realizedPnl": "1", "pnlRatio": "0.01",
+    }
+
+
+def test_positions_history_sync_uses_before_cursor_after_backfill():
+    async def scenario():
+        client = make_client()
+        rows = [history_row(u) for u in range(1000, 1251)]
+        calls = []
+
+        async def fake_history(symbol=None, start_time=None, end_time=None, session=None, limit=None):
+            calls.append((start_time, end_time))
+            data = [r for r in rows if (start_time is None or int(r["uTime"]) < start_time)
+                    and (end_time is None or int(r["uTime"]) > end_time)]
+            data.sort(key=lambda r: int(r["uTime"]))
+            data = data[:limit] if end_time is not None and start_time is None else data[-limit:]
+            return {"code": "0", "data": list(reversed(data))}
+        client.get_historical_orders_report = fake_history
+
+        backfilled = await client.sync_positions_history(since_ms=0)
+        backfill_calls = list(calls)
+        calls.clear()
+        rows.extend(history_row(u) for u in range(1251, 1254))
+        incremental = await client.sync_positions_history()
+        return backfilled, backfill_calls, incremental, list(calls), client.ledger.cursor()
+
+    backfilled, backfill_calls, incremental, calls, cursor = asyncio.run(scenario())
+    assert backfilled == 251
+    assert [after for after, _ in backfill_calls] == [None, 1151, 1051]
+    assert incremental == 3
+    assert calls == [(None, 1250)]   # одна страница, только новее курсора
+    assert cursor == 1253
+
+
+def test_filtered_sync_keeps_its_own_cursor_and_pnl_lookups_share_the_global_one():
+    async def scenario():
+        client = make_client()
+        rows = [dict(history_row(u), instId="BTC-USDT-SWAP" if u % 2 else "ETH-USDT-SWAP") for u in range(1000, 1010)]
+        calls = []
+
+        async def fake_history(symbol=None, start_time=None, end_time=None, session=None, limit=None):
+            calls.append((symbol, start_time, end_time))
+            data = [r for r in rows if (symbol is None or r["instId"] == symbol)
+                    and (start_time is None or int(r["uTime"]) < start_time)
+                    and (end_time is None or int(r["uTime"]) > end_time)]
+            data.sort(key=lambda r: -int(r["uTime"]))
+            return {"code": "0", "data": data[:limit]}
+        client.get_historical_orders_report = fake_history
+
+        await client.sync_positions_history(inst_id="BTC-USDT-SWAP", since_ms=0)
+        cursors = (client.ledger.cursor(), client.ledger.cursor("BTC-USDT-SWAP"))
+        await client.sync_positions_history(since_ms=0)  # ETH ещё не грузили — общий курсор честно с нуля
+        await client.sync_positions_history(inst_id="BTC-USDT-SWAP")
+        filtered_after_global = calls[-1]
+        rows.append(dict(history_row(1011), instId="BTC-USDT-SWAP"))
+        calls.clear()
+        pnl = await client.get_realized_pnl("BTC-USDT-SWAP", 1000, None, direction="LONG", pos_id="1011")
+        return cursors, filtered_after_global, calls, pnl, client.ledger.cursor(), len(client.ledger)
+
+    cursors, filtered_after_global, calls, pnl, cursor, size = asyncio.run(scenario())
+    assert cursors == (0, 1009)             # фильтр по BTC не двигает общий курсор
+    assert filtered_after_global == ("BTC-USDT-SWAP", None, 1009)  # после общей загрузки — только новее курсора
+    assert calls == [(None, None, 1009)]    # поиск PnL — одна догрузка без фильтра, только новее курсора
+    assert pnl["pnl_usdt"] == 1.0
+    assert cursor == 1011 and size == 11
+
+
+def test_duplicate_cl_ord_id_recovers_existing_order():
+    async def scenario():
+        client = make_client()
+        trade_calls = []
+        lookups = []
+
+        async def fake_trade_request(session, op, path, data=None, deadline=None, via_ws=True):
+            trade_calls.append(data["clOrdId"])
+            return {"code": "1", "data": [{"sCode": "51016", "sMsg": "Duplicated clOrdId", "clOrdId": data["clOrdId"]}]}
+
+        async def fake_get_order(session, instId, ordId=None, clOrdId=None):
+            lookups.append((instId, clOrdId))
+            return [{"ordId": "777", "clOrdId": clOrdId, "cTime": "1700000000000", "state": "live"}]
+        client._trade_request = fake_trade_request
+        client.get_order = fake_get_order
+        data = await client.place_order_idempotent(
+            [None], "cl1",
+            instId="BTC-USDT-SWAP", sz=1, side="buy", tdMode="isolated", posSide="long",
+            reduceOnly=False, ordType="limit", px="100"
+        )
+        return data, trade_calls, lookups
+
+    data, trade_calls, lookups = asyncio.run(scenario())
+    assert trade_calls == ["cl1"]
+    assert lookups == [("BTC-USDT-SWAP", "cl1")]
+    assert data == [{"ordId": "777", "clOrdId": "cl1", "sCode": "0", "sMsg": "recovered by clOrdId", "ts": "1700000000000"}]
@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from b_context import BotContext
+from c_log import ErrorHandler
+from API.OKX.okx import OkxFuturesClient
+from API.OKX.okx_leverage import LeverageCache, leverage_key
+
+SYMBOL = "BTC-USDT-SWAP"
+
+
+def make_client(response):
+    client = OkxFuturesClient(
+        api_key=None, api_secret=None, api_passphrase=None, context=BotContext(), info_handler=ErrorHandler()
+    )
+    calls = []
+
+    async def fake_request(session, method, path, data=None, **kwargs):
+        calls.append(data)
+        if isinstance(response, BaseException):
+            raise response
+        return response
+    client._request = fake_request
+    return client, calls
+
+
+def test_key_has_pos_side_only_in_isolated():
+    assert leverage_key("btc-usdt-swap", "ISOLATED", "LONG") == (SYMBOL, "isolated", "long")
+    assert leverage_key(SYMBOL, "cross", "long") == (SYMBOL, "cross", "")
+    cache = LeverageCache()
+    cache.put(SYMBOL, "cross", "long", "10")
+    assert cache.get(SYMBOL, "cross", "short") == 10  # в cross плечо общее
+    cache.put(SYMBOL, "isolated", "long", 5)
+    assert cache.get(SYMBOL, "isolated", "short") is None
+    assert len(cache) == 2
+
+
+def test_is_set_skips_only_on_matching_value():
+    cache = LeverageCache()
+    cache.observe([{"instId": SYMBOL, "mgnMode": "isolated", "posSide": "long", "lever": "20"}, {"instId": SYMBOL}])
+    assert cache.is_set(SYMBOL, "isolated", "long", 20.0)
+    assert not cache.is_set(SYMBOL, "isolated", "long", 10)
+    assert not cache.is_set(SYMBOL, "isolated", "short", 20)
+    assert not cache.is_set(SYMBOL, "isolated", "long", None)
+    assert (cache.hits, cache.misses) == (1, 2)  # некорректное плечо не считается
+
+
+def test_successful_set_leverage_is_cached():
+    data = [{"instId": SYMBOL, "mgnMode": "isolated", "posSide": "long", "lever": "15"}]
+    client, calls = make_client({"code": "0", "data": data})
+    assert asyncio.run(client.set_leverage(None, instId=SYMBOL, lever=15, mgnMode="isolated", posSide="LONG")) == data
+    assert calls == [{"lever": "15", "instId": SYMBOL, "mgnMode": "isolated", "posSide": "long"}]
+    assert client.leverage.is_set(SYMBOL, "isolated", "long", 15)
+
+
+@pytest.mark.parametrize("response", [None, {"code": "59000", "msg": "error", "data": []}, asyncio.CancelledError()])
+def test_failed_set_leverage_invalidates_cached_value(response):
+    client, _ = make_client(response)
+    client.leverage.put(SYMBOL, "isolated", "long", 10)
+
+    async def scenario():
+        try:
+            await client.set_leverage(None, instId=SYMBOL, lever=20, mgnMode="isolated", posSide="long")
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(scenario())
+    assert client.leverage.get(SYMBOL, "isolated", "long") is None
+    assert not client.leverage.is_set(SYMBOL, "isolated", "long", 10)
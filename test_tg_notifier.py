@@ -0,0 +1,48 @@
+import asyncio
+from b_context import BotContext
+from c_log import ErrorHandler
+from TG.tg_notifier import TelegramNotifier
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append((text, parse_mode))
+
+
+def test_coalesce_joins_head_up_to_limit():
+    text, count = TelegramNotifier.coalesce(["aaa", "bbb", "ccc"], limit=8)
+    assert (text, count) == ("aaa\n\nbbb", 2)
+    assert TelegramNotifier.coalesce(["aaa"], limit=8) == ("aaa", 1)
+
+
+def test_coalesce_cuts_oversize_on_newline():
+    first = "<b>line one</b>\n<b>line two</b>\nrest"
+    text, count = TelegramNotifier.coalesce([first, "next"], limit=20)
+    assert (text, count) == ("<b>line one</b>\n", 0)
+
+
+def test_coalesce_cuts_oversize_without_newline_at_limit():
+    assert TelegramNotifier.coalesce(["x" * 30], limit=10) == ("x" * 10, 0)
+
+
+def test_sender_sends_cut_message_as_plain_text():
+    long_text = "\n".join(f"<b>row {i}</b>" for i in range(600))
+
+    async def scenario():
+        bot = FakeBot()
+        notifier = TelegramNotifier(bot, BotContext(), ErrorHandler())
+        notifier.enqueue(1, "<i>before</i>", long_text, "<i>after</i>")
+        await notifier.stop(timeout=10)
+        return bot.sent
+
+    sent = asyncio.run(scenario())
+    assert sent[0] == ("<i>before</i>", "HTML")
+    assert sent[-1] == ("<i>after</i>", "HTML")
+    chunks = sent[1:-1]
+    assert len(chunks) > 1
+    assert all(mode is None and len(text) <= 4096 for text, mode in chunks)
+    assert all(text.endswith("</b>\n") for text, _ in chunks[:-1])
+    assert "".join(text for text, _ in chunks) == long_text